@@ -0,0 +1,52 @@
+# bench_dispatch.py
+# Measures the cost of dispatching one command, per verb.
+
+import argparse
+import timeit
+
+from classes import GameSession
+from output import NullSink
+from data import WORLD
+import main
+
+# Commands that leave the session unchanged, so they can be repeated
+SAMPLE_COMMANDS = [
+    "quit", "look", "inv", "go up", "take nothing", "drop nothing", "swipe nothing",
+    "upload nothing", "wear nothing", "use nothing", "read nothing", "talk",
+    "examine nothing", "help", "score", "dance",
+]
+
+# The verb groups in the order the old if/elif chain tested them
+IF_ELIF_CHAIN = [
+    ("quit", "exit"), ("look", "explore"), ("with", "inventory", "inv"), ("go",), ("take",),
+    ("drop",), ("swipe",), ("upload",), ("wear",), ("use",), ("read",), ("talk",),
+    ("examine",), ("help",), ("score",),
+]
+
+def chain_lookup(verb: str):
+    for position, verbs in enumerate(IF_ELIF_CHAIN):
+        if verb in verbs:
+            return position
+    return None
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Per-verb command dispatch cost.")
+    parser.add_argument("--number", type=int, default=20_000)
+    args = parser.parse_args()
+
+    session = GameSession(WORLD, output=NullSink())
+    commands = getattr(main, "COMMANDS", None)
+
+    print(f"{'command':<16}{'if/elif lookup':>16}{'table lookup':>14}{'handle_command':>16}")
+    for text in SAMPLE_COMMANDS:
+        verb = text.split()[0]
+        chain = timeit.timeit(lambda: chain_lookup(verb), number=args.number) / args.number
+        table = "n/a"
+        if commands is not None:
+            table_time = timeit.timeit(lambda: commands.get(verb), number=args.number) / args.number
+            table = f"{table_time * 1e9:.0f} ns"
+        full = timeit.timeit(lambda: main.handle_command(session, text), number=args.number) / args.number
+        print(f"{text:<16}{chain * 1e9:>13.0f} ns{table:>14}{full * 1e9:>13.0f} ns")
+
+if __name__ == "__main__":
+    main_benchmark()
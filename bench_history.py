@@ -0,0 +1,99 @@
+# bench_history.py
+# Measures the memory of 1,000 turns of session history: the persistent turn
+# states of GameSession.state() against copying the player and the item
+# overrides after every turn. A session that has moved items in many locations
+# shows the difference: a copy holds all of them every turn, a persistent
+# state only the path to the location that changed.
+
+import argparse
+import time
+import tracemalloc
+
+from classes import GameSession
+from output import NullSink
+from data import WORLD
+from main import handle_command
+from world import compile_world
+from worldgen import generate_world
+
+# Built-in world: the walkthrough up to the Server Room with the Wire, then
+# dropping and taking the Wire in two rooms
+WALK_TO_SERVER_ROOM = 14
+BUILT_IN_LOOP = ["drop wire", "take wire", "go north", "drop wire", "take wire", "go south"]
+
+def copied_state(session: GameSession) -> tuple:
+    # What copying the state after a turn keeps: every override as a new list
+    player = session.player
+    return (player.current_location, player.score, player.has_worn_suit, session.server_activated,
+            session.outcome, session.turns, list(player.inventory),
+            {location: list(items) for location, items in session.item_overrides.items()})
+
+def history_memory(session: GameSession, loop: list, turns: int, copy: bool) -> tuple:
+    # (bytes per 1,000 turns of history, seconds per turn) for the turns of the loop played over and over
+    for text in loop: # The first time creates the location lines and other caches
+        handle_command(session, text)
+    session.history = None
+    if copy:
+        session.max_history = 0 # Only the copies are measured
+    copies = []
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    for number in range(turns):
+        handle_command(session, loop[number % len(loop)])
+        if copy:
+            copies.append(copied_state(session))
+    elapsed = time.perf_counter() - started
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / turns * 1000, elapsed / turns
+
+def built_in_session(turns: int) -> GameSession:
+    session = GameSession(WORLD, output=NullSink(), max_history=turns)
+    with open("walkthrough.txt", encoding="utf-8") as script:
+        for text in [line.strip() for line in script if line.strip()][:WALK_TO_SERVER_ROOM]:
+            handle_command(session, text)
+    return session
+
+def generated_session(world, moved: int, turns: int) -> tuple:
+    # A session at the start that has moved items in `moved` locations, carrying one item, and its loop
+    session = GameSession(world, output=NullSink(), max_history=turns)
+    changed = [location for location, items in enumerate(world.start_items) if items][:moved]
+    for location in changed:
+        session.set_items(location, tuple(reversed(world.start_items[location])) + world.start_items[location])
+    item = world.start_items[changed[0]][0]
+    session.player.inventory.append(item)
+    name = item.name.lower()
+    start = world.location_names[world.start_location]
+    east = world.location_names[world.exit(world.start_location, world.direction_ids["east"])]
+    return session, [f"drop {name}", f"take {name}", f"travel {east}", f"drop {name}", f"take {name}",
+                     f"travel {start}"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory of the session history per 1,000 turns.")
+    parser.add_argument("--turns", type=int, default=6_000)
+    parser.add_argument("--rooms", type=int, default=20_000)
+    parser.add_argument("--moved", type=int, nargs="+", default=[100, 1_000], help="locations with moved items")
+    args = parser.parse_args()
+
+    generated = compile_world(*generate_world(args.rooms))
+    cases = [("built-in world", lambda: (built_in_session(args.turns), BUILT_IN_LOOP))]
+    cases += [(f"{args.rooms} rooms, {moved} changed",
+               lambda moved=moved: generated_session(generated, moved, args.turns)) for moved in args.moved]
+
+    print(f"{'':<28}{'persistent':>14}{'copied':>14}{'turn (persistent)':>20}{'turn (copied)':>16}")
+    for name, make in cases:
+        persistent, persistent_turn = history_memory(*make(), args.turns, copy=False)
+        copied, copied_turn = history_memory(*make(), args.turns, copy=True)
+        print(f"{name:<28}{persistent / 1024:>10.0f}KiB{copied / 1024:>10.0f}KiB"
+              f"{persistent_turn * 1e6:>18.1f}us{copied_turn * 1e6:>14.1f}us")
+
+    session, loop = built_in_session(args.turns), BUILT_IN_LOOP
+    for number in range(args.turns):
+        handle_command(session, loop[number % len(loop)])
+    started = time.perf_counter()
+    handle_command(session, f"rewind {args.turns // 2}")
+    print(f"\nrewind {args.turns // 2} turns: {(time.perf_counter() - started) * 1e6:.0f}us")
+
+if __name__ == "__main__":
+    main()
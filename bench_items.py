@@ -0,0 +1,91 @@
+# bench_items.py
+# Compares the old linear item name scan with ItemIndex on synthetic catalogs.
+
+import argparse
+import random
+import time
+
+from classes import Item, Inventory
+from item_index import ItemIndex
+
+WORDS = ["blue", "red", "green", "key", "card", "flash", "drive", "code", "wire", "manual",
+         "server", "report", "accident", "water", "canister", "suit", "hazmat", "sample",
+         "vial", "badge", "log", "tape", "panel", "fuse", "valve", "filter", "mask", "torch"]
+
+def make_catalog(size: int, rng: random.Random) -> list:
+    names = set()
+    while len(names) < size:
+        words = rng.sample(WORDS, rng.randint(1, 3))
+        names.add(" ".join(word.capitalize() for word in words) + f" {len(names)}")
+    return [Item(name, "Synthetic item.") for name in sorted(names)]
+
+def linear_first_match(item_name_part: str, inventory: list, location_items) -> Item:
+    # The lookup get_item_by_name used before the index
+    items_list = inventory[:]
+    items_list += location_items
+    item_name_part = item_name_part.lower().strip()
+    for item in items_list:
+        if item_name_part in item.name.lower():
+            return item
+    return None
+
+def make_queries(catalog: list, count: int, rng: random.Random) -> list:
+    # Whole words, prefixes, inner substrings and names that match nothing
+    queries = []
+    for _ in range(count):
+        name = rng.choice(catalog).name.lower()
+        kind = rng.randrange(4)
+        if kind == 0:
+            queries.append(rng.choice(name.split()))
+        elif kind == 1:
+            queries.append(name[:rng.randint(2, len(name))])
+        elif kind == 2:
+            start = rng.randrange(len(name) - 1)
+            queries.append(name[start:start + rng.randint(2, 8)])
+        else:
+            queries.append(rng.choice(WORDS) + " missing")
+    return queries
+
+def run(size: int, inventory_size: int, location_size: int, query_count: int, seed: int):
+    rng = random.Random(seed)
+    catalog = make_catalog(size, rng)
+    carried = rng.sample(catalog, inventory_size)
+    location_items = tuple(rng.sample(catalog, location_size))
+    queries = make_queries(catalog, query_count, rng)
+
+    started = time.perf_counter()
+    index = ItemIndex(catalog, cache_size=query_count)
+    build_time = time.perf_counter() - started
+    inventory = Inventory(carried)
+
+    started = time.perf_counter()
+    expected = [linear_first_match(query, carried, location_items) for query in queries]
+    linear_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    cold = [index.first_match(query, inventory, location_items) for query in queries]
+    cold_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    warm = [index.first_match(query, inventory, location_items) for query in queries]
+    warm_time = time.perf_counter() - started
+
+    assert cold == expected and warm == expected, "index results differ from the linear scan"
+    print(f"{size:>8} items (inventory {inventory_size}, location {location_size}): "
+          f"build {build_time * 1000:7.1f} ms | linear {linear_time / query_count * 1e6:8.1f} us/query | "
+          f"index {cold_time / query_count * 1e6:6.1f} us/query, cached {warm_time / query_count * 1e6:5.1f} us/query")
+
+def main():
+    parser = argparse.ArgumentParser(description="Item name resolution benchmark.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000, 100_000])
+    parser.add_argument("--inventory", type=int, default=200)
+    parser.add_argument("--location", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        run(size, args.inventory, args.location, args.queries, args.seed)
+
+if __name__ == "__main__":
+    main()
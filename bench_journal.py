@@ -0,0 +1,78 @@
+# bench_journal.py
+# Measures commands per second of many concurrent sessions with the journal
+# off, with group commit, and with one fsync per command; then the recovery time.
+
+import argparse
+import asyncio
+import tempfile
+import time
+
+from classes import GameSession
+from output import NullSink
+from data import WORLD
+from journal import Journal, JournalSink
+from main import handle_command
+from snapshot import save_session
+
+def load_script(path: str) -> list:
+    with open(path, encoding="utf-8") as script:
+        return [line.strip() for line in script if line.strip()]
+
+async def play(session_id: int, commands: list, journal: Journal, mode: str, sessions: dict):
+    session = GameSession(WORLD, output=JournalSink() if journal else NullSink())
+    sessions[session_id] = session
+    if journal is not None:
+        journal.log_open(session_id, session)
+    for command in commands:
+        running = handle_command(session, command)
+        session.output.flush()
+        if journal is not None:
+            journal.log_turn(session_id, command, session.output.take_changes())
+            if mode == "group":
+                await journal.commit()
+            else:
+                journal.sync() # One fsync per command, blocking the loop like a naive implementation
+        await asyncio.sleep(0) # Let the other sessions run, as socket reads would
+        if not running:
+            break
+
+async def run(sessions: int, commands: list, journal: Journal, mode: str) -> tuple:
+    live = {}
+    started = time.perf_counter()
+    await asyncio.gather(*(play(session_id, commands, journal, mode, live)
+                           for session_id in range(1, sessions + 1)))
+    return time.perf_counter() - started, live
+
+def main():
+    parser = argparse.ArgumentParser(description="Journal throughput and recovery benchmark.")
+    parser.add_argument("--sessions", type=int, default=500, help="concurrent sessions")
+    parser.add_argument("--script", default="walkthrough.txt")
+    parser.add_argument("--turns", type=int, default=20, help="commands played by every session")
+    args = parser.parse_args()
+
+    commands = load_script(args.script)[:args.turns]
+    total = args.sessions * len(commands)
+    print(f"{args.sessions} sessions x {len(commands)} commands")
+
+    elapsed, _ = asyncio.run(run(args.sessions, commands, None, "off"))
+    print(f"{'journal off':<18}{total / elapsed:>12.0f} commands/s")
+
+    for mode in ("group", "fsync"):
+        with tempfile.TemporaryDirectory() as directory:
+            journal = Journal(directory)
+            elapsed, live = asyncio.run(run(args.sessions, commands, journal, mode))
+            journal.close()
+            print(f"{'journal ' + mode:<18}{total / elapsed:>12.0f} commands/s "
+                  f"({journal.syncs} fsyncs, {journal.records / max(journal.syncs, 1):.1f} records per fsync)")
+
+            if mode == "group":
+                started = time.perf_counter()
+                recovered = Journal(directory).recover()
+                recovery = time.perf_counter() - started
+                same = all(save_session(recovered[session_id]) == save_session(session)
+                           for session_id, session in live.items())
+                print(f"{'recovery':<18}{len(recovered):>12} sessions in {recovery * 1e3:.1f} ms "
+                      f"({'identical' if same else 'DIFFERENT'} to the live sessions)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# bench_leaderboard.py
+# Measures leaderboard ingest rate with queries in between, the size of its
+# state as the number of results grows, and ingesting in several worker
+# processes whose leaderboards are merged.
+
+import argparse
+import json
+import random
+import time
+from multiprocessing import Pool
+
+from data import WORLD
+from leaderboard import Leaderboard, OUTCOMES
+
+def synthetic_results(count: int, seed: int) -> list:
+    # (score, outcome, turns, max score reached, location, label) resembling real games
+    rng = random.Random(seed)
+    names = WORLD.location_names
+    results = []
+    for number in range(count):
+        outcome = rng.choices(OUTCOMES, weights=(3, 2, 5))[0]
+        score = int(rng.gauss(150 if outcome == "victory" else 60, 30))
+        turns = max(1, int(rng.lognormvariate(4, 0.5)))
+        results.append((score, outcome, turns, score >= 150, rng.choice(names), f"{seed}/{number}"))
+    return results
+
+def ingest(results: list, query_every: int) -> tuple:
+    # (seconds, leaderboard), with a ranking and quantile query every query_every results
+    board = Leaderboard()
+    add = board.add
+    started = time.perf_counter()
+    for number, result in enumerate(results, 1):
+        add(*result)
+        if number % query_every == 0:
+            board.ranking()[:10]
+            board.scores.quantile(0.99)
+    return time.perf_counter() - started, board
+
+def worker(arguments: tuple) -> dict:
+    count, seed, query_every = arguments
+    elapsed, board = ingest(synthetic_results(count, seed), query_every)
+    return {"elapsed": elapsed, "board": board.to_data()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Leaderboard ingest rate, state size and merging.")
+    parser.add_argument("--results", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--query-every", type=int, default=1_000, help="results between two queries")
+    args = parser.parse_args()
+
+    results = synthetic_results(args.results, 0)
+    print(f"{'results':>10}{'ingest':>14}{'state (JSON)':>14}")
+    for count in (10_000, 100_000, args.results):
+        elapsed, board = ingest(results[:count], args.query_every)
+        size = len(json.dumps(board.to_data()))
+        print(f"{count:>10}{count / elapsed:>10,.0f}/s{size / 1024:>11.1f}KiB")
+
+    per_worker = args.results // args.workers
+    started = time.perf_counter()
+    with Pool(args.workers) as pool:
+        outputs = pool.map(worker, [(per_worker, seed, args.query_every) for seed in range(1, args.workers + 1)])
+    merge_started = time.perf_counter()
+    board = Leaderboard()
+    for output in outputs:
+        board.merge(Leaderboard.from_data(output["board"]))
+    merged = time.perf_counter()
+    ingest_rate = per_worker / max(output["elapsed"] for output in outputs) * args.workers
+    print(f"\n{args.workers} workers: {ingest_rate:,.0f} results/s while ingesting, "
+          f"merge {(merged - merge_started) * 1e3:.1f} ms, {merged - started:.1f}s in total "
+          f"(including generating the results)")
+    print(board.report(5))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# bench_memory.py
+# Measures how many bytes one live GameSession costs.
+
+import argparse
+import copy
+import gc
+import tracemalloc
+
+from classes import GameSession
+from output import NullSink
+from data import GAME_WORLD, WORLD
+from main import handle_command
+
+# A few commands so every session has moved at least one item
+WARMUP_COMMANDS = ["go east", "take blue key card", "go east"]
+
+def make_sessions(count: int, deep_copy_world: bool = False) -> list:
+    # With deep_copy_world every session also keeps its own copy of all the
+    # locations, as it would without the shared world
+    sessions = []
+    for _ in range(count):
+        session = GameSession(WORLD, output=NullSink())
+        for command in WARMUP_COMMANDS:
+            handle_command(session, command)
+        sessions.append((session, copy.deepcopy(GAME_WORLD)) if deep_copy_world else session)
+    return sessions
+
+def bytes_per_session(count: int, deep_copy_world: bool = False) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sessions = make_sessions(count, deep_copy_world)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del sessions
+    return (after - before) / count
+
+def main():
+    parser = argparse.ArgumentParser(description="Report bytes per live game session.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--baseline", type=int, default=1_000,
+                        help="sessions measured with a deep-copied world for comparison (0 to skip)")
+    args = parser.parse_args()
+
+    for count in args.sizes:
+        print(f"{count:>8} sessions, shared world + overlay: {bytes_per_session(count):8.0f} bytes/session")
+    if args.baseline:
+        print(f"{args.baseline:>8} sessions, deep-copied world:      "
+              f"{bytes_per_session(args.baseline, deep_copy_world=True):8.0f} bytes/session")
+
+if __name__ == "__main__":
+    main()
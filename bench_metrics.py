@@ -0,0 +1,58 @@
+# bench_metrics.py
+# Measures what the metrics cost a turn: the walkthrough (and a few failing
+# commands) played over and over, with recording on and off, and the time to
+# export everything in the Prometheus format.
+
+import argparse
+import time
+
+from classes import GameSession
+from output import TextSink
+from data import WORLD
+from main import handle_command
+from metrics import METRICS
+
+FAILING = ["dance", "take", "drop nothing", "go up"]
+
+def play(commands: list, turns: int) -> float:
+    # Seconds per turn, including joining the output of the turn
+    session = None
+    started = time.perf_counter()
+    for number in range(turns):
+        position = number % len(commands)
+        if position == 0 or session.outcome is not None:
+            session = GameSession(WORLD, output=TextSink())
+        handle_command(session, commands[position])
+        session.output.flush()
+    return (time.perf_counter() - started) / turns
+
+def main():
+    parser = argparse.ArgumentParser(description="Turn cost with metrics on and off.")
+    parser.add_argument("--turns", type=int, default=5_000, help="turns per measurement")
+    parser.add_argument("--repeat", type=int, default=40)
+    parser.add_argument("--walkthrough", default="walkthrough.txt")
+    args = parser.parse_args()
+
+    with open(args.walkthrough, encoding="utf-8") as script:
+        commands = [line.strip() for line in script if line.strip()]
+    commands = FAILING + commands
+
+    results = {}
+    for _ in range(args.repeat): # Alternated, so both see the same machine state
+        for enabled in (False, True):
+            METRICS.enabled = enabled
+            results.setdefault(enabled, []).append(play(commands, args.turns))
+
+    off = min(results[False])
+    on = min(results[True])
+    print(f"metrics off {off * 1e9:>8.0f} ns/turn")
+    print(f"metrics on  {on * 1e9:>8.0f} ns/turn  ({(on - off) * 1e9:+.0f} ns, {(on / off - 1) * 100:+.1f}%)")
+
+    started = time.perf_counter()
+    text = METRICS.prometheus_text()
+    print(f"export      {(time.perf_counter() - started) * 1e6:>8.0f} us  ({len(text)} bytes)")
+    for name, histogram in (("parse", METRICS.parse), ("dispatch", METRICS.dispatch), ("render", METRICS.render)):
+        print(f"{name:<10} p50 {histogram.quantile(0.5):>7} ns  p99 {histogram.quantile(0.99):>7} ns")
+
+if __name__ == "__main__":
+    main()
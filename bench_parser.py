@@ -0,0 +1,101 @@
+# bench_parser.py
+# Measures command parsing: exact commands, synonyms and misspelled verbs,
+# the first time a text is seen and when it repeats, and correcting
+# misspelled item names in synthetic catalogs whose names use thousands of
+# distinct English words (taken from Python's own documentation).
+
+import argparse
+import random
+import re
+import time
+
+from pydoc_data.topics import topics
+
+from classes import Item
+from item_index import ItemIndex
+from main import normalized_words, verb_vocabulary
+
+COMMAND_KINDS = {
+    "exact": ["go north", "take blue key card", "look", "inventory", "swipe red key card", "read accident report"],
+    "synonym": ["n", "grab wire", "pick up the server manual", "look at the manual", "i", "go to server room"],
+    "typo": ["tkae blue key card", "go nroth", "swpie red key card", "invetory", "examin manual", "pikc up wire"],
+}
+
+def make_words(count: int, rng: random.Random) -> list:
+    words = sorted({word for word in re.findall("[a-z]+", " ".join(topics.values()).lower()) if len(word) >= 3})
+    return rng.sample(words, min(count, len(words)))
+
+def misspell(word: str, rng: random.Random) -> str:
+    # One swap, deletion or substitution inside the word
+    position = rng.randrange(1, len(word) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+    if kind == 1:
+        return word[:position] + word[position + 1:]
+    return word[:position] + rng.choice("aeiourst") + word[position + 1:]
+
+def per_call(function, inputs: list, clear=None) -> float:
+    # Mean seconds per call; clear() runs before every call, outside the measurement
+    total = 0
+    for value in inputs:
+        if clear is not None:
+            clear()
+        started = time.perf_counter_ns()
+        function(value)
+        total += time.perf_counter_ns() - started
+    return total / len(inputs) / 1e9
+
+def commands(repeat: int):
+    vocabulary = verb_vocabulary()
+    def clear():
+        normalized_words.cache_clear()
+        vocabulary.correct.cache_clear()
+
+    print(f"{'commands':<10}{'first time':>14}{'repeated':>12}")
+    for kind, texts in COMMAND_KINDS.items():
+        inputs = texts * repeat
+        cold = per_call(normalized_words, inputs, clear)
+        for text in texts:
+            normalized_words(text)
+        warm = per_call(normalized_words, inputs)
+        print(f"{kind:<10}{cold * 1e6:>12.2f}us{warm * 1e6:>10.2f}us")
+
+def items(sizes: list, vocabulary_size: int, query_count: int, seed: int):
+    rng = random.Random(seed)
+    words = make_words(vocabulary_size, rng)
+    print(f"\n{'items':>8}{'words':>8}{'build':>11}{'correct':>12}{'repeated':>12}{'fixed':>8}")
+    for size in sizes:
+        names = [" ".join(rng.sample(words, rng.randint(1, 3))) + f" {number}" for number in range(size)]
+        started = time.perf_counter()
+        index = ItemIndex([Item(name.title(), "Synthetic item.") for name in names], cache_size=4 * query_count)
+        build = time.perf_counter() - started
+
+        queries = []
+        for _ in range(query_count):
+            name_words = rng.choice(names).split()[:-1]
+            position = rng.randrange(len(name_words))
+            if len(name_words[position]) < 4:
+                continue
+            name_words[position] = misspell(name_words[position], rng)
+            queries.append(" ".join(name_words))
+        cold = per_call(index.corrected, queries, index.words.correct.cache_clear)
+        fixed = sum(index.corrected(query) is not None for query in queries) / len(queries)
+        warm = per_call(index.corrected, queries)
+        print(f"{size:>8}{len(index.words.words):>8}{build * 1e3:>9.0f}ms{cold * 1e6:>10.2f}us{warm * 1e6:>10.2f}us"
+              f"{fixed:>8.0%}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Command parsing and typo correction latency.")
+    parser.add_argument("--repeat", type=int, default=2_000, help="times each command is parsed")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--words", type=int, default=3_000, help="distinct words in the item names")
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    commands(args.repeat)
+    items(args.sizes, args.words, args.queries, args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# bench_rules.py
+# Measures the cost of a turn as the number of game rules grows. The extra
+# rules are spread over the other locations and over events of their own, as
+# in a big world where most rules are about places the player is not in.
+
+import argparse
+import timeit
+
+from classes import GameSession
+from output import NullSink
+from data import GAME_WORLD, ALL_ITEMS, GAME_RULES
+from main import handle_command
+from rules import Rule
+from world import compile_world
+
+# A walk back and forth between two locations that both have a gas rule
+TURNS = ["go south", "go north"]
+START = "B-1 Corridor" # South of it is Guard Post B, both have gas
+WALKED = (START, "Guard Post B")
+
+def extra_rules(count: int) -> list:
+    names = [name for name in GAME_WORLD if name not in WALKED]
+    events = ("enter", "item_acquired", "talk", "custom_event")
+    return [Rule(events[number % len(events)], names[number % len(names)],
+                 conditions=[("has_item", "Wire"), ("server", True)],
+                 actions=[("say", f"Rule {number}"), ("add_score", 1)])
+            for number in range(count)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Turn cost against the number of game rules.")
+    parser.add_argument("--counts", type=int, nargs="+", default=[0, 100, 1_000, 10_000])
+    parser.add_argument("--number", type=int, default=50_000)
+    args = parser.parse_args()
+
+    print(f"{'rules':>8}{'turn':>12}")
+    for count in args.counts:
+        world = compile_world(GAME_WORLD, ALL_ITEMS, "Reception Area", GAME_RULES + extra_rules(count))
+        session = GameSession(world, world.location_ids[START], NullSink())
+        session.player.has_worn_suit = True # Keeps the score (and the output) the same every turn
+        turns = iter(TURNS * (args.number // len(TURNS) + 1))
+        elapsed = timeit.timeit(lambda: handle_command(session, next(turns)), number=args.number)
+        print(f"{len(GAME_RULES) + count:>8}{elapsed / args.number * 1e9:>9.0f} ns")
+
+if __name__ == "__main__":
+    main()
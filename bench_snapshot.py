@@ -0,0 +1,98 @@
+# bench_snapshot.py
+# Snapshot size and serialize/deserialize latency against JSON and pickle,
+# and put/get throughput of the memory-mapped snapshot store.
+
+import argparse
+import json
+import os
+import pickle
+import tempfile
+import time
+
+from classes import GameSession
+from data import WORLD
+from main import handle_command
+from output import NullSink
+from snapshot import SnapshotStore, save_session, load_session
+
+# Plays part of the walkthrough so the session carries items and a world delta
+SETUP_COMMANDS = ["go east", "take blue key card", "go east", "go north", "swipe blue key card", "talk",
+                  "go east", "go north", "take flash drive"]
+
+def as_dict(session: GameSession) -> dict:
+    # The same state in the shape JSON or pickle would store it
+    player = session.player
+    return {
+        "location": player.current_location,
+        "score": player.score,
+        "has_worn_suit": player.has_worn_suit,
+        "server_activated": session.server_activated,
+        "inventory": [item.name for item in player.inventory],
+        "item_overrides": {str(location): [item.name for item in items]
+                           for location, items in session.item_overrides.items()},
+    }
+
+def from_dict(state: dict) -> GameSession:
+    session = GameSession(WORLD, state["location"], NullSink())
+    items = WORLD.items_by_name
+    session.player.score = state["score"]
+    session.player.has_worn_suit = state["has_worn_suit"]
+    session.server_activated = state["server_activated"]
+    for name in state["inventory"]:
+        session.player.inventory.append(items[name])
+    for location, names in state["item_overrides"].items():
+        session.set_items(int(location), tuple(items[name] for name in names))
+    return session
+
+def per_call(function, number: int) -> float:
+    started = time.perf_counter()
+    for _ in range(number):
+        function()
+    return (time.perf_counter() - started) / number
+
+def main():
+    parser = argparse.ArgumentParser(description="Session snapshot benchmark.")
+    parser.add_argument("--number", type=int, default=20_000)
+    parser.add_argument("--sessions", type=int, default=200_000, help="sessions parked in the store")
+    args = parser.parse_args()
+
+    session = GameSession(WORLD, output=NullSink())
+    for command in SETUP_COMMANDS:
+        handle_command(session, command)
+
+    binary = save_session(session)
+    text = json.dumps(as_dict(session)).encode("utf-8")
+    pickled = pickle.dumps(as_dict(session), protocol=pickle.HIGHEST_PROTOCOL)
+
+    print(f"{'format':<8}{'bytes':>7}{'serialize':>13}{'deserialize':>14}")
+    rows = [
+        ("binary", binary, lambda: save_session(session), lambda: load_session(binary, WORLD, NullSink())),
+        ("json", text, lambda: json.dumps(as_dict(session)).encode("utf-8"),
+         lambda: from_dict(json.loads(text))),
+        ("pickle", pickled, lambda: pickle.dumps(as_dict(session), protocol=pickle.HIGHEST_PROTOCOL),
+         lambda: from_dict(pickle.loads(pickled))),
+    ]
+    for name, data, dump, load in rows:
+        print(f"{name:<8}{len(data):>7}{per_call(dump, args.number) * 1e6:>10.2f} us"
+              f"{per_call(load, args.number) * 1e6:>11.2f} us")
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = SnapshotStore(os.path.join(directory, "sessions.snap"), WORLD)
+        started = time.perf_counter()
+        for session_id in range(args.sessions):
+            store.put(session_id, binary)
+        put_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for session_id in range(0, args.sessions, 7):
+            store.load(session_id, NullSink())
+        loads = len(range(0, args.sessions, 7))
+        load_time = time.perf_counter() - started
+        file_size = store.size
+        store.close()
+
+    print(f"store: {args.sessions} sessions in {file_size / 2**20:.1f} MiB ({store.slot_size}-byte slots), "
+          f"put {put_time / args.sessions * 1e6:.2f} us, load {load_time / loads * 1e6:.2f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+# bench_solver.py
+# Time and states explored of the solver on the built-in world and on
+# generated worlds of growing size, with the number of items kept in the
+# packed state and of the bonus items kept next to the score.
+
+import argparse
+import time
+
+from data import WORLD
+from solver import Solver
+from world import compile_world
+from worldgen import generate_world
+
+def main():
+    parser = argparse.ArgumentParser(description="Solver time and states explored against world size.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[150, 400, 2_000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-moves", type=int, default=400)
+    args = parser.parse_args()
+
+    worlds = [("built-in", WORLD)]
+    worlds += [(str(rooms), compile_world(*generate_world(rooms, args.seed))) for rooms in args.sizes]
+
+    print(f"{'rooms':>9}{'items':>7}{'bonus':>7}{'commands':>10}{'score':>7}{'states':>10}{'memoized':>10}{'time':>9}")
+    for name, world in worlds:
+        solver = Solver(world)
+        started = time.perf_counter()
+        solution = solver.solve(args.max_moves)
+        elapsed = time.perf_counter() - started
+        commands = "-" if solution.commands is None else len(solution.commands)
+        score = "-" if solution.score is None else solution.score
+        print(f"{name:>9}{len(world.items):>7}{len(solver.bonus_bits):>7}{commands:>10}{score:>7}"
+              f"{solution.states_explored:>10}{solution.states_memoized:>10}{elapsed:>8.2f}s")
+
+if __name__ == "__main__":
+    main()
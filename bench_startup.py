@@ -0,0 +1,74 @@
+# bench_startup.py
+# Measures the wall-clock time of one-command runs (python main.py --session ID
+# COMMAND) against a bare interpreter start, with the world cache ready and with
+# the cache rebuilt every run, and lists the slowest imports of a run as
+# reported by python -X importtime.
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+def timed_runs(command: list, environment: dict, runs: int, before_run=None) -> list:
+    times = []
+    for _ in range(runs):
+        if before_run:
+            before_run()
+        started = time.perf_counter()
+        subprocess.run(command, env=environment, check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - started)
+    return times
+
+def clear_directory(directory: str):
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+
+def import_times(command: list, environment: dict) -> list:
+    # [(cumulative microseconds, module)] of the top-level imports, from stderr
+    result = subprocess.run([command[0], "-X", "importtime"] + command[1:], env=environment, check=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        if not module.startswith("  "): # Nested imports are indented further
+            rows.append((int(cumulative), module.strip()))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time of one-command runs of main.py.")
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = os.path.join(directory, "cache")
+        environment = dict(os.environ, XDG_CACHE_HOME=cache, XDG_STATE_HOME=os.path.join(directory, "state"))
+        one_command = [sys.executable, MAIN, "--session", "bench", "look"]
+
+        subprocess.run(one_command, env=environment, check=True, stdout=subprocess.DEVNULL) # Builds the cache
+        cache_files = os.path.join(cache, "project-omega")
+        cases = [
+            ("python -c pass", timed_runs([sys.executable, "-c", "pass"], environment, args.runs)),
+            ("one command, cached world", timed_runs(one_command, environment, args.runs)),
+            ("one command, cache rebuilt", timed_runs(one_command, environment, args.runs,
+                                                      lambda: clear_directory(cache_files))),
+        ]
+        imports = import_times(one_command, environment)
+
+    print(f"{'':<28}{'median':>10}{'min':>10}")
+    for name, times in cases:
+        print(f"{name:<28}{statistics.median(times) * 1e3:>8.1f}ms{min(times) * 1e3:>8.1f}ms")
+
+    print("\nSlowest imports of a cached run (cumulative):")
+    for cumulative, module in sorted(imports, reverse=True)[:args.top]:
+        print(f"{cumulative / 1e3:>8.2f}ms  {module}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# bench_world.py
+# Measures startup time and memory against world size: building every
+# Location in memory (as data.py does) against opening a world file, where
+# locations are only read when they are visited.
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+def peak_rss_mib() -> float:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024 # Bytes on macOS, KiB elsewhere
+
+def measure(mode: str, rooms: int, path: str, visits: int) -> str:
+    # Runs in a fresh process, so the memory is only that of one world
+    started = time.perf_counter()
+    if mode == "eager":
+        from worldgen import generate_world
+        from world import compile_world
+        world = compile_world(*generate_world(rooms))
+    else:
+        from worldfile import load_world
+        world = load_world(path)
+    startup = time.perf_counter() - started
+    startup_rss = peak_rss_mib()
+
+    rng = random.Random(1)
+    started = time.perf_counter()
+    for _ in range(visits):
+        world.locations[rng.randrange(world.location_count)].description
+    visit_time = (time.perf_counter() - started) / visits
+    return f"{startup} {startup_rss} {visit_time} {peak_rss_mib()}"
+
+def main():
+    parser = argparse.ArgumentParser(description="World startup time and memory against world size.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--visits", type=int, default=20_000, help="random locations displayed after startup")
+    parser.add_argument("--measure", nargs=3, metavar=("MODE", "ROOMS", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        mode, rooms, path = args.measure
+        print(measure(mode, int(rooms), path, args.visits))
+        return
+
+    print(f"{'rooms':>8} {'mode':<6}{'startup':>10}{'RSS':>10}{'visit':>10}{'RSS after visits':>18}")
+    with tempfile.TemporaryDirectory() as directory:
+        for rooms in args.sizes:
+            path = os.path.join(directory, f"world-{rooms}.db")
+            subprocess.run([sys.executable, "worldgen.py", path, "--rooms", str(rooms)],
+                           check=True, stdout=subprocess.DEVNULL)
+            for mode in ("eager", "file"):
+                result = subprocess.run([sys.executable, __file__, "--visits", str(args.visits),
+                                         "--measure", mode, str(rooms), path],
+                                        check=True, capture_output=True, text=True)
+                startup, startup_rss, visit, rss = map(float, result.stdout.split())
+                print(f"{rooms:>8} {mode:<6}{startup * 1e3:>8.0f}ms{startup_rss:>7.0f}MiB"
+                      f"{visit * 1e6:>8.1f}us{rss:>15.0f}MiB")
+
+if __name__ == "__main__":
+    main()
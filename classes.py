@@ -1,7 +1,14 @@
 # classes.py
 
+from output import OutputSink, terminal_sink
+from persistent import EMPTY_MAP
+
+MAX_SCORE = 150 # A game is only won with at least this score
+
 class Item:
     # Represents an item in the game
+    __slots__ = ("name", "description", "usage", "points")
+
     def __init__(self, name: str, description: str, usage: str = None, points: int = 0):
         self.name = name
         self.description = description
@@ -9,7 +16,12 @@ class Item:
         self.points = points # Points gained for finding/using the item
 
 class Location:
-    # Represents a location (room) in the game
+    # Represents a location (room) in the game.
+    # Locations are shared by all sessions and never change during play:
+    # each session keeps its own item placement in GameSession.
+    __slots__ = ("name", "description", "exits", "items", "npc", "required_key",
+                 "exits_with_key", "special_action")
+
     def __init__(self, name: str, description: str, exits: dict, items: list = None,
                  npc: str = None, required_key: dict = None, exits_with_key: dict = None,
                  special_action: str = None):
@@ -17,22 +29,133 @@ class Location:
         self.name = name
         self.description = description
         self.exits = exits          # What direction user can go
-        self.items = items if items is not None else []
+        self.items = tuple(items) if items is not None else () # Items placed at the start of the game
         self.npc = npc # non-playable character
         self.required_key = required_key # {'direction': 'Required Key Name'}
         self.exits_with_key = exits_with_key # {'direction': 'Target Location Name'}
         self.special_action = special_action # e.g., 'server_terminal', 'gas_hazard'
 
+class Inventory:
+    # The items carried by the player, in the order they were picked up.
+    # Backed by a dict (item -> pick-up number) for O(1) membership checks and removal.
+    # frozen() is the inventory as a tuple, kept until the inventory changes, so the
+    # turns in between share one tuple in the session history.
+    __slots__ = ("_items", "_picked", "_frozen")
+
+    def __init__(self, items=()):
+        self._items = {}
+        self._picked = 0
+        self._frozen = None
+        for item in items:
+            self.append(item)
+
+    @classmethod
+    def thaw(cls, frozen: tuple) -> "Inventory":
+        # The inventory of a frozen() tuple, sharing the tuple
+        inventory = cls(frozen)
+        inventory._frozen = frozen
+        return inventory
+
+    def frozen(self) -> tuple:
+        if self._frozen is None:
+            self._frozen = tuple(self._items)
+        return self._frozen
+
+    def append(self, item: Item):
+        if item not in self._items:
+            self._picked += 1
+            self._items[item] = self._picked
+            self._frozen = None
+
+    def remove(self, item: Item):
+        del self._items[item]
+        self._frozen = None
+
+    def position(self, item: Item) -> int:
+        # Smaller numbers were picked up earlier
+        return self._items[item]
+
+    def __contains__(self, item) -> bool:
+        return item in self._items
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
 class Player:
     # Represents the player and her state
-    def __init__(self, start_location_name: str):
-        self.current_location = start_location_name
-        self.inventory = []
+    __slots__ = ("current_location", "inventory", "score", "max_score", "has_worn_suit", "output")
+
+    def __init__(self, start_location: int, output: OutputSink = None):
+        self.current_location = start_location # Location id in the compiled world
+        self.inventory = Inventory()
         self.score = 0
-        self.max_score = 150
+        self.max_score = MAX_SCORE
         self.has_worn_suit = False
+        self.output = output if output is not None else terminal_sink() # Where the game messages are written to
 
     def add_score(self, points: int):
         # Adds points to the score and provides feedback
         self.score += points
-        print(f"\n 💎 You gained {points} points! Current score: {self.score}\n")
\ No newline at end of file
+        self.output.event("score_changed", points=points, score=self.score)
+        self.output.write(f"\n 💎 You gained {points} points! Current score: {self.score}\n")
+
+class GameSession:
+    # Represents one game in progress: the player, the server flag and the items
+    # placed in each location. Several sessions share the same (compiled) world;
+    # a session only stores the item tuples of the locations where it moved items
+    # (copy-on-write), all other locations use the shared start items.
+    # item_overrides is a PersistentMap, so the state of a turn (state()) shares
+    # everything that did not change with the turn before; history keeps the
+    # state after each of the last max_history turns, for undo and rewind. It is
+    # off (max_history 0) unless a player can take turns back, as in the
+    # interactive game and the server.
+    __slots__ = ("world", "player", "server_activated", "item_overrides", "outcome", "turns", "history",
+                 "max_history", "output")
+
+    def __init__(self, world, start_location: int = None, output: OutputSink = None, max_history: int = 0):
+        self.world = world # CompiledWorld
+        self.player = Player(world.start_location if start_location is None else start_location, output)
+        self.server_activated = False
+        self.item_overrides = EMPTY_MAP # {location id: (items in this session)}
+        self.outcome = None # 'victory' or 'defeat' once the game rules ended the game
+        self.turns = 0 # Commands played
+        self.history = None # deque of (command, state()), from the state before the first command kept
+        self.max_history = max_history # Turns undo and rewind can take back
+        self.output = self.player.output # Shared by the player and the game
+
+    def items_at(self, location: int):
+        # Items currently lying in the given location for this session (do not modify)
+        items = self.item_overrides.get(location)
+        if items is None:
+            return self.world.start_items[location]
+        return items
+
+    def set_items(self, location: int, items: tuple):
+        self.item_overrides = self.item_overrides.set(location, items)
+
+    def remove_item(self, location: int, item: Item):
+        items = list(self.items_at(location))
+        items.remove(item)
+        self.set_items(location, tuple(items))
+
+    def add_item(self, location: int, item: Item):
+        self.set_items(location, tuple(self.items_at(location)) + (item,))
+
+    def state(self) -> tuple:
+        """
+        The state of the session as immutable values: (location, score, suit worn,
+        server activated, outcome, turns, inventory tuple, item overrides map).
+        """
+        player = self.player
+        return (player.current_location, player.score, player.has_worn_suit, self.server_activated,
+                self.outcome, self.turns, player.inventory.frozen(), self.item_overrides)
+
+    def restore(self, state: tuple):
+        """Puts the session back into a state() it had."""
+        player = self.player
+        (player.current_location, player.score, player.has_worn_suit, self.server_activated,
+         self.outcome, self.turns, inventory, self.item_overrides) = state
+        player.inventory = Inventory.thaw(inventory)
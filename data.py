@@ -1,6 +1,8 @@
 # data.py
 
 from classes import Item, Location
+from rules import Rule
+from world import compile_world
 
 # Initialization of items
 
@@ -92,4 +94,58 @@ loc_20 = Location("Technical Access", "A service area leading nowhere important.
 GAME_WORLD = {loc.name: loc for loc in [
     loc_1, loc_2, loc_3, loc_4, loc_5, loc_6, loc_7, loc_8, loc_9, loc_10,
     loc_11, loc_12, loc_13, loc_14, loc_15, loc_16, loc_17, loc_18, loc_19, loc_20
-]}
\ No newline at end of file
+]}
+
+# Game rules (see rules.py): when the event happens in the location and all
+# conditions hold, the actions run in order
+
+EXIT_EVENTS = ("enter", "item_acquired") # Arriving at the exit, or taking the Antidote there
+
+def gas_hazard_rule(location_name: str) -> Rule:
+    # Toxic gas costs points without the suit, on arriving and on every look around
+    return Rule(("enter", "look"), location_name, conditions=[("suit", False)],
+                actions=[("say", "\n❗️ DANGER: Toxic gas in the air. You lose points without protection.\n"),
+                         ("add_score", -5)])
+
+GAME_RULES = [
+    *[gas_hazard_rule(loc.name) for loc in GAME_WORLD.values() if loc.special_action == "gas_hazard"],
+
+    # The Main Server Terminal
+    Rule("upload", "Server Room",
+         actions=[("activate_server",), ("consume_item",), ("add_score", 15),
+                  ("say", "✅ {item} connected. Server reactivated! Emergency Exit unlocked."),
+                  ("say", "Note: The server has opened a new way.")]),
+
+    Rule("use", "Server Room", conditions=[("item", "Wire")],
+         actions=[("say", "You connect the Wire to the server. It buzzes, but nothing happens. You still need the Flash Drive."),
+                  ("add_score", 1)]),
+
+    # The guard has the Red Key Card
+    Rule("talk", "C-2 Laboratory", conditions=[("lacks_item", "Red Key Card")],
+         actions=[("give_item", "Red Key Card"), ("add_score", 5),
+                  ("say", "Guard: 'They... they took... the Red Key Card, it must be somewhere... oh wait, it's on me! Take it!'"),
+                  ("say", "✅ You received: Red Key Card")]),
+    Rule("talk", "C-2 Laboratory", conditions=[("has_item", "Red Key Card")],
+         actions=[("say", "Guard: 'I need medical help... just leave me...'")]),
+
+    # The Emergency Exit: the victory conditions
+    Rule(EXIT_EVENTS, "Emergency Exit", conditions=[("server", False)],
+         actions=[("say", "❌ The emergency exit is still locked. You must activate the Server to disable the security system.")]),
+    Rule(EXIT_EVENTS, "Emergency Exit", conditions=[("server", True), ("lacks_item", "Antidote")],
+         actions=[("say", "⚠️ The exit is open, but the toxic gas is spreading. You must find the Antidote first!")]),
+    Rule(EXIT_EVENTS, "Emergency Exit", conditions=[("server", True), ("has_item", "Antidote")],
+         actions=[("add_score", 50), ("trigger", "escaped")]),
+    Rule("escaped", "Emergency Exit", conditions=[("winning_score", True)],
+         actions=[("say", "\n\n*** VICTORY! ***"),
+                  ("say", "You successfully reactivated the server, disabled the security, and escaped the complex."),
+                  ("say", "You took the Antidote and are safe! Your final score: {score}/{max_score}"),
+                  ("finish", "victory")]),
+    Rule("escaped", "Emergency Exit", conditions=[("winning_score", False)],
+         actions=[("say", "\n\n*** DEFEAT! ***"),
+                  ("say", "You reached the Emergency Exit and have the Antidote, but you failed to collect enough data and evidence."),
+                  ("say", "You must achieve a score of at least {max_score} to be considered successful. Your score: {score}"),
+                  ("finish", "defeat")]),
+]
+
+# Integer-indexed form the game runs on (checks the exits and rules when the game starts)
+WORLD = compile_world(GAME_WORLD, ALL_ITEMS, start_location_name="Reception Area", rules=GAME_RULES)
@@ -0,0 +1,117 @@
+# fuzzy.py
+
+from collections import Counter
+from functools import lru_cache
+from itertools import chain
+
+def edit_distance(first: str, second: str, limit: int) -> int:
+    """
+    Returns the number of single-character insertions, deletions, substitutions
+    and swaps of two adjacent characters that turn first into second (the
+    optimal string alignment distance), or limit + 1 as soon as it is known to
+    be larger than limit.
+    """
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    # Letters shared at the start and at the end cost nothing; a typo usually
+    # leaves a letter or two between them
+    shortest = min(len(first), len(second))
+    start = 0
+    while start < shortest and first[start] == second[start]:
+        start += 1
+    end = 0
+    while end < shortest - start and first[-1 - end] == second[-1 - end]:
+        end += 1
+    first = first[start:len(first) - end]
+    second = second[start:len(second) - end]
+    if not first or not second:
+        return min(len(first) + len(second), limit + 1)
+    if len(first) == len(second) == 1 or (len(first) == len(second) == 2 and first == second[::-1]):
+        return min(1, limit + 1)
+    if limit < 2:
+        return limit + 1 # Anything else left over takes two edits or more
+
+    before_previous = None
+    previous = list(range(len(second) + 1))
+    for row, char in enumerate(first, 1):
+        current = [row]
+        for column, other in enumerate(second, 1):
+            distance = min(previous[column] + 1, current[column - 1] + 1, previous[column - 1] + (char != other))
+            if (row > 1 and column > 1 and char != other and char == second[column - 2]
+                    and first[row - 2] == other):
+                distance = min(distance, before_previous[column - 2] + 1)
+            current.append(distance)
+        if min(current) > limit:
+            return limit + 1
+        before_previous, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+def _bigrams(word: str) -> set:
+    # Character pairs of the word with its start and end marked: 'take' -> ^t ta ak ke e$
+    marked = f"^{word}$"
+    return {marked[start:start + 2] for start in range(len(marked) - 1)}
+
+class Vocabulary:
+    # Corrects a misspelled word to the closest word of a fixed set. Words are
+    # indexed by their bigrams and their length. One edit changes at most three
+    # bigrams (swapping two letters: tkae -> take loses tk ka ae), so a word
+    # within `limit` edits of a typo has a length within `limit` of it and lacks
+    # at most 3 * limit of the typo's bigrams. It then holds at least two of the
+    # typo's 3 * limit + 2 rarest bigrams: only those posting lists are read, and
+    # the words found in two of them are compared by edit distance, the words
+    # sharing the most bigrams with the typo first.
+    MIN_LENGTH = 3 # Shorter words are too close to too many others to be corrected
+    LONG_WORD = 7 # From this length on, two edits are allowed instead of one
+
+    def __init__(self, words, cache_size: int = 4096):
+        self.words = {word: frozenset(_bigrams(word)) for word in words}
+        self.grams = {} # {('bigram', word length): [words]}
+        self.gram_counts = Counter() # {'bigram': words containing it}, to find the rarest
+        for word, grams in self.words.items():
+            for gram in grams:
+                self.grams.setdefault((gram, len(word)), []).append(word)
+            self.gram_counts.update(grams)
+        self.correct = lru_cache(maxsize=cache_size)(self._correct)
+
+    def _correct(self, word: str):
+        """
+        Returns the word itself if it is known, otherwise the known word with the
+        fewest edits from it. Returns None if no word is close enough or if two
+        words are equally close.
+        """
+        if word in self.words:
+            return word
+        if len(word) < self.MIN_LENGTH:
+            return None
+        # Most typos are one edit, and looking for those reads far fewer words
+        closest = self._closest(word, 1)
+        if closest is None and len(word) >= self.LONG_WORD:
+            closest = self._closest(word, 2)
+        return closest if closest is not _TIED else None
+
+    def _closest(self, word: str, limit: int):
+        # The word within limit edits with the fewest, None if there is none, _TIED if there are two
+        grams = _bigrams(word)
+        needed = len(grams) - 3 * limit # Bigrams a close word shares with the typo
+        rarest = sorted(grams, key=self.gram_counts.__getitem__)[:3 * limit + 2]
+        required = max(1, len(rarest) - 3 * limit)
+        postings = self.grams
+        lengths = range(len(word) - limit, len(word) + limit + 1)
+        counts = Counter(chain.from_iterable(postings.get((gram, length), ()) for gram in rarest for length in lengths))
+
+        words = self.words
+        ranked = sorted(((len(grams & words[candidate]), candidate)
+                         for candidate, count in counts.items() if count >= required), reverse=True)
+        best = None
+        best_distance = limit + 1
+        for shared, candidate in ranked:
+            if shared < needed or (len(grams) - shared + 2) // 3 > best_distance:
+                break # Too few bigrams in common for this or any later word to be as close
+            distance = edit_distance(word, candidate, best_distance)
+            if distance < best_distance:
+                best, best_distance = candidate, distance
+            elif distance == best_distance and best is not None:
+                best = _TIED
+        return best
+
+_TIED = object()
@@ -0,0 +1,133 @@
+# item_index.py
+
+from functools import lru_cache
+
+from fuzzy import Vocabulary
+
+class ItemIndex:
+    # Finds the items whose name contains a partial name typed by the player
+    # (case-insensitive), the same rule as a linear scan over the names.
+    # Names are indexed by their character n-grams up to length 3. Whole words and
+    # prefixes are substrings too, so every query goes the same way: the smallest
+    # posting set among the query's n-grams gives the candidates, and a substring
+    # test on the pre-lowered names confirms them.
+    # A partial name that is no substring can still be the name's words shortened
+    # ('blue card', 'blu card' for Blue Key Card), after correcting its typos
+    # against the Vocabulary of the words of the names: see word_match.
+    GRAM_SIZE = 3
+
+    def __init__(self, items, cache_size: int = 4096):
+        self.items = list(items)
+        self.lower_names = {item: item.name.lower() for item in self.items}
+        self.name_words = {item: tuple(name.split()) for item, name in self.lower_names.items()}
+        self.grams = {} # {'n-gram': set of items whose lower-case name contains it}
+        for item, name in self.lower_names.items():
+            for size in range(1, self.GRAM_SIZE + 1):
+                for start in range(len(name) - size + 1):
+                    self.grams.setdefault(name[start:start + size], set()).add(item)
+        self.words = Vocabulary((word for name in self.lower_names.values() for word in name.split()
+                                 if word.isalpha()), cache_size)
+        self.candidates = lru_cache(maxsize=cache_size)(self._candidates)
+        self.matches = lru_cache(maxsize=cache_size)(self._matches)
+
+    def _candidates(self, name_part: str):
+        # Smallest posting set of the query's n-grams, None if one of them is unknown
+        size = min(len(name_part), self.GRAM_SIZE)
+        smallest = None
+        for start in range(len(name_part) - size + 1):
+            posting = self.grams.get(name_part[start:start + size])
+            if posting is None:
+                return None
+            if smallest is None or len(posting) < len(smallest):
+                smallest = posting
+        return smallest
+
+    def _matches(self, name_part: str) -> frozenset:
+        """Returns the set of items whose name contains name_part (already lower-case)."""
+        candidates = self.candidates(name_part)
+        if not candidates:
+            return frozenset()
+        if len(name_part) <= self.GRAM_SIZE:
+            return frozenset(candidates)
+        lower_names = self.lower_names
+        return frozenset(item for item in candidates if name_part in lower_names[item])
+
+    def corrected(self, name_part: str):
+        """
+        Returns name_part (lower-case) with its misspelled words replaced by the
+        closest words of the item names, or None if no word was corrected.
+        """
+        words = name_part.lower().split()
+        correct = self.words.correct
+        corrected = [correct(word) or word for word in words]
+        return " ".join(corrected) if corrected != words else None
+
+    def word_match(self, name_part: str, inventory, location_items=()):
+        """
+        Returns the first item whose name has words starting with the words of
+        name_part, in the same order ('blu card' matches Blue Key Card), looking
+        in the inventory first and then in location_items. Returns None if
+        nothing matches.
+        """
+        words = name_part.lower().split()
+        if not words:
+            return None
+        name_words = self.name_words
+        for items in (inventory, location_items):
+            for item in items:
+                if _has_word_prefixes(name_words.get(item, ()), words):
+                    return item
+        return None
+
+    def first_match(self, name_part: str, inventory, location_items=()):
+        """
+        Returns the first item matching name_part, looking in the inventory first
+        and then in location_items, in their order. Returns None if nothing matches.
+        Only items known to the index can be found.
+        """
+        name_part = name_part.lower().strip()
+        if not name_part:
+            return None
+        candidates = self.candidates(name_part)
+        if not candidates:
+            return None
+
+        if len(candidates) > len(inventory) + len(location_items):
+            # A common n-gram: checking the visible items is cheaper than the match set
+            lower_names = self.lower_names
+            for items in (inventory, location_items):
+                for item in items:
+                    if item in candidates and name_part in lower_names[item]:
+                        return item
+            return None
+
+        matches = self.matches(name_part)
+        if not matches:
+            return None
+
+        if inventory:
+            if len(matches) < len(inventory):
+                # Fewer matches than carried items: compare their inventory positions
+                found = [item for item in matches if item in inventory]
+                if found:
+                    return min(found, key=inventory.position)
+            else:
+                for item in inventory:
+                    if item in matches:
+                        return item
+
+        for item in location_items:
+            if item in matches:
+                return item
+        return None
+
+def _has_word_prefixes(name_words: tuple, words: list) -> bool:
+    # True if each word starts one of name_words, in order (greedy matching is enough)
+    position = 0
+    for word in words:
+        while position < len(name_words) and not name_words[position].startswith(word):
+            position += 1
+        if position == len(name_words):
+            return False
+        position += 1
+    return True
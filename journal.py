@@ -0,0 +1,324 @@
+# journal.py
+
+import asyncio
+import os
+import secrets
+import struct
+import zlib
+
+from output import TextSink, NullSink
+from data import WORLD
+from snapshot import save_session, load_session
+
+# Append-only journal of one server process (a shard). Every accepted command is
+# written together with the state changes it caused, so the sessions of a
+# crashed process can be rebuilt: take the last snapshot of each session and
+# apply the changes of the turns after it.
+#
+# The journal is a series of segment files journal-<shard>-<segment>.log. When a
+# segment is full, the next one starts with a snapshot of every live session
+# (a checkpoint) and the older segments are deleted.
+#
+# Record (little-endian): payload length u32, crc32 of the payload u32, then the
+# payload: session id u32, kind u8 and the body of the kind
+#   OPEN   resume token of the session (TOKEN_SIZE ASCII characters), then a
+#          snapshot of the session (snapshot.py)
+#   TURN   command length u16, command (utf-8), changes
+#   CLOSE  nothing: the game ended, the session is not recovered
+# Change: op u8, value i32 (location, points, item id or outcome), location u32
+RECORD = struct.Struct("<II")
+PAYLOAD = struct.Struct("<IB")
+COMMAND = struct.Struct("<H")
+CHANGE = struct.Struct("<BiI")
+
+OPEN, TURN, CLOSE = 1, 2, 3
+# Commands whose TURN record is not a game turn: resuming, and undo and rewind
+# (those are only TURN records when they failed; otherwise the state is an OPEN)
+UNCOUNTED = (b"resume", b"undo", b"rewind")
+TOKEN_SIZE = 16
+MOVE, SCORE, TAKE, DROP, RECEIVE, SERVER, SUIT, FINISH, CONSUME = range(1, 10)
+OUTCOMES = ("victory", "defeat", "quit")
+
+# Output events that change the state of a session, and their change op
+CHANGE_OPS = {
+    "moved": MOVE,
+    "score_changed": SCORE,
+    "item_taken": TAKE,
+    "item_dropped": DROP,
+    "item_received": RECEIVE,
+    "server_activated": SERVER,
+    "item_consumed": CONSUME,
+    "suit_worn": SUIT,
+    "game_finished": FINISH,
+}
+
+def new_resume_token() -> str:
+    """An unguessable token a player enters to resume their game (96 random bits)."""
+    return secrets.token_urlsafe(TOKEN_SIZE * 3 // 4)
+
+class JournalSink(TextSink):
+    # A TextSink that also keeps the state-change events of a turn for the journal
+    __slots__ = ("changes",)
+
+    def __init__(self, stream=None):
+        super().__init__(stream)
+        self.changes = []
+
+    def event(self, kind: str, **data):
+        if kind in CHANGE_OPS or kind == "state_restored":
+            self.changes.append((kind, data))
+
+    def take_changes(self) -> list:
+        changes = self.changes
+        self.changes = []
+        return changes
+
+class Journal:
+    # Records are collected in a buffer and written by group commit: commit()
+    # waits for the next fsync, and every record appended while an fsync is
+    # running goes to disk with the following one. Under load, one fsync makes
+    # the turns of many sessions durable. commit_delay (seconds) waits a little
+    # longer before each fsync to gather bigger batches.
+    def __init__(self, directory: str, shard: int = 0, world=WORLD, sessions: dict = None,
+                 segment_size: int = 64 << 20, commit_delay: float = 0.0):
+        self.directory = directory
+        self.shard = shard
+        self.world = world
+        self.sessions = sessions # {session id: GameSession} written to every new segment
+        self.tokens = {} # {session id: resume token} of the open sessions
+        self.skipped = {} # {session id: reason} of the sessions recover() could not rebuild
+        self.segment_size = segment_size
+        self.commit_delay = commit_delay
+        self.item_numbers = {item.name: number for number, item in enumerate(world.items)}
+
+        self.buffer = bytearray()
+        self.records = 0
+        self.syncs = 0
+        self.waiter = None # Future of the next group commit
+        self.syncing = False
+
+        os.makedirs(directory, exist_ok=True)
+        segments = self.segments()
+        self.segment = segments[-1] if segments else 0
+        self.file = open(self.path(self.segment), "ab")
+        self.segment_bytes = self.file.tell()
+
+    def path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"journal-{self.shard:03d}-{segment:08d}.log")
+
+    def segments(self) -> list:
+        prefix = f"journal-{self.shard:03d}-"
+        return sorted(int(name[len(prefix):-4]) for name in os.listdir(self.directory)
+                      if name.startswith(prefix) and name.endswith(".log"))
+
+    @staticmethod
+    def _record(session_id: int, kind: int, body: bytes = b"") -> bytes:
+        payload = PAYLOAD.pack(session_id, kind) + body
+        return RECORD.pack(len(payload), zlib.crc32(payload)) + payload
+
+    def _append(self, session_id: int, kind: int, body: bytes = b""):
+        self.buffer += self._record(session_id, kind, body)
+        self.records += 1
+
+    def log_open(self, session_id: int, session, token: str = None):
+        """Appends a snapshot of a session. A session logged again keeps its resume token unless given a new one."""
+        if token is not None:
+            self.tokens[session_id] = token
+        elif session_id not in self.tokens:
+            self.tokens[session_id] = new_resume_token()
+        self._append(session_id, OPEN, self._open_body(session_id, session))
+
+    def _open_body(self, session_id: int, session) -> bytes:
+        return self.tokens[session_id].encode("ascii") + save_session(session)
+
+    def log_turn(self, session_id: int, command: str, changes: list):
+        """Appends a command and the (kind, data) change events it caused."""
+        world = self.world
+        item_numbers = self.item_numbers
+        location_ids = world.location_ids
+        text = command.encode("utf-8")[:0xFFFF]
+        parts = [COMMAND.pack(len(text)), text]
+        for kind, data in changes:
+            op = CHANGE_OPS[kind]
+            if op == MOVE:
+                parts.append(CHANGE.pack(op, location_ids[data["target"]], 0))
+            elif op == SCORE:
+                parts.append(CHANGE.pack(op, data["points"], 0))
+            elif op == FINISH:
+                parts.append(CHANGE.pack(op, OUTCOMES.index(data["outcome"]), 0))
+            elif op in (TAKE, DROP, SERVER):
+                parts.append(CHANGE.pack(op, item_numbers[data["item"]], location_ids[data["location"]]))
+            else:
+                parts.append(CHANGE.pack(op, item_numbers[data["item"]], 0))
+        self._append(session_id, TURN, b"".join(parts))
+
+    def log_close(self, session_id: int):
+        self.tokens.pop(session_id, None)
+        self._append(session_id, CLOSE)
+
+    def _prepare(self) -> tuple:
+        # Takes the buffered records and, if the segment is full, the snapshots
+        # that start the next one. Both are taken together on the caller's thread,
+        # so no record is written both before and inside a snapshot.
+        data = self.buffer
+        self.buffer = bytearray()
+        checkpoint = None
+        if self.sessions is not None and self.segment_bytes + len(data) >= self.segment_size:
+            checkpoint = b"".join(self._record(session_id, OPEN, self._open_body(session_id, session))
+                                  for session_id, session in self.sessions.items())
+        return data, checkpoint
+
+    def _write(self, data: bytes, checkpoint: bytes = None):
+        if data:
+            self.file.write(data)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.segment_bytes += len(data)
+            self.syncs += 1
+        if checkpoint is not None:
+            self._start_segment(checkpoint)
+
+    def _start_segment(self, checkpoint: bytes):
+        old_segments = self.segments()
+        segment = self.segment + 1
+        new_file = open(self.path(segment), "xb")
+        new_file.write(checkpoint)
+        new_file.flush()
+        os.fsync(new_file.fileno())
+        self._sync_directory()
+
+        self.file.close()
+        self.file = new_file
+        self.segment = segment
+        self.segment_bytes = len(checkpoint)
+        for old in old_segments:
+            os.remove(self.path(old))
+
+    def _sync_directory(self):
+        # Makes a new file name durable (not possible on Windows)
+        try:
+            descriptor = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(descriptor)
+        except OSError:
+            pass
+        finally:
+            os.close(descriptor)
+
+    def sync(self):
+        """Writes the buffered records and waits until they are on disk (blocking)."""
+        self._write(*self._prepare())
+
+    async def commit(self):
+        """Waits until every record appended so far is on disk."""
+        if self.waiter is None:
+            self.waiter = asyncio.get_running_loop().create_future()
+            if not self.syncing:
+                self.syncing = True
+                asyncio.ensure_future(self._sync_loop())
+        await asyncio.shield(self.waiter)
+
+    async def _sync_loop(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while self.waiter is not None:
+                if self.commit_delay:
+                    await asyncio.sleep(self.commit_delay)
+                waiter, self.waiter = self.waiter, None
+                try:
+                    await loop.run_in_executor(None, self._write, *self._prepare())
+                except OSError as error:
+                    waiter.set_exception(error)
+                else:
+                    waiter.set_result(None)
+        finally:
+            self.syncing = False
+
+    def recover(self, output_factory=NullSink) -> dict:
+        """
+        Rebuilds the sessions that were live when the journal was last written,
+        as {session id: GameSession} with an output_factory() sink each. Their
+        resume tokens are in tokens. A session whose snapshot or turns do not fit
+        the world (another world, a damaged record) is left out, with the reason
+        in skipped. Must be called before anything is appended.
+        """
+        sessions = {}
+        for segment in self.segments():
+            with open(self.path(segment), "rb") as file:
+                data = file.read()
+            end = self._replay_segment(data, sessions, output_factory)
+            if end < len(data) and segment == self.segment:
+                # A record cut off by the crash: new records go after the last complete one
+                self.file.truncate(end)
+                self.segment_bytes = end
+        return sessions
+
+    def _replay_segment(self, data: bytes, sessions: dict, output_factory) -> int:
+        # Applies the complete records of a segment and returns where they end
+        view = memoryview(data)
+        offset = 0
+        while offset + RECORD.size <= len(data):
+            length, crc = RECORD.unpack_from(data, offset)
+            start = offset + RECORD.size
+            payload = view[start:start + length]
+            if length < PAYLOAD.size or len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            session_id, kind = PAYLOAD.unpack_from(payload)
+            body = payload[PAYLOAD.size:]
+            try:
+                if kind == OPEN:
+                    self.tokens[session_id] = bytes(body[:TOKEN_SIZE]).decode("ascii")
+                    sessions[session_id] = load_session(bytes(body[TOKEN_SIZE:]), self.world, output_factory())
+                    self.skipped.pop(session_id, None)
+                elif kind == TURN:
+                    session = sessions.get(session_id)
+                    if session is not None:
+                        self.apply_turn(session, body)
+                elif kind == CLOSE:
+                    sessions.pop(session_id, None)
+                    self.tokens.pop(session_id, None)
+                    self.skipped.pop(session_id, None)
+            except (ValueError, LookupError) as error:
+                # The session alone is lost (its later turns are ignored), not the others
+                sessions.pop(session_id, None)
+                self.tokens.pop(session_id, None)
+                self.skipped[session_id] = str(error) or repr(error)
+            offset = start + length
+        return offset
+
+    def apply_turn(self, session, body):
+        # Replays the changes of a TURN record on a session, without running the command
+        length, = COMMAND.unpack_from(body)
+        words = bytes(body[COMMAND.size:COMMAND.size + length]).lower().split(maxsplit=1)
+        if words and words[0] not in UNCOUNTED:
+            session.turns += 1
+        items = self.world.items
+        player = session.player
+        for op, value, location in CHANGE.iter_unpack(body[COMMAND.size + length:]):
+            if op == MOVE:
+                player.current_location = value
+            elif op == SCORE:
+                player.score += value
+            elif op == TAKE:
+                session.remove_item(location, items[value])
+                player.inventory.append(items[value])
+            elif op == DROP:
+                player.inventory.remove(items[value])
+                session.add_item(location, items[value])
+            elif op == RECEIVE:
+                player.inventory.append(items[value])
+            elif op == SERVER:
+                session.server_activated = True
+            elif op == CONSUME:
+                player.inventory.remove(items[value])
+            elif op == SUIT:
+                player.has_worn_suit = True
+                player.inventory.remove(items[value])
+            elif op == FINISH:
+                session.outcome = OUTCOMES[value]
+
+    def close(self):
+        self.sync()
+        self.file.close()
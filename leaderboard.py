@@ -0,0 +1,222 @@
+# leaderboard.py
+
+import argparse
+import heapq
+import json
+import os
+
+# Final results of finished games, in memory that does not grow with the
+# number of games:
+#   top       the best `size` results: victories first, then by score, then by
+#             fewer turns (a min-heap, so a result that does not make it in
+#             costs one comparison)
+#   scores, turns   ValueSketch quantile sketches
+#   outcomes  games per outcome ('victory', 'defeat', 'quit'), and the number
+#             that reached the max score
+#   defeats, quits  {location name: games that ended there that way}; bounded
+#             by the size of the world
+# Every part merges by adding up (the top by keeping the best of both), so each
+# server process keeps its own leaderboard and the files are merged for
+# reporting: python leaderboard.py leaderboard-*.json
+OUTCOMES = ("victory", "defeat", "quit")
+
+class ValueSketch:
+    # Counts of integer values in log-linear buckets: values below 256 in
+    # magnitude are counted exactly, larger ones are rounded down to 8
+    # significant bits (less than 0.8% off). 64-bit values fall into fewer than
+    # 15k buckets, however many are added.
+    __slots__ = ("buckets", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.buckets = {} # {rounded value: count}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value: int):
+        # count, total, min and max are exact
+        bucket = value
+        magnitude = value if value >= 0 else -value
+        shift = magnitude.bit_length() - 8
+        if shift > 0:
+            magnitude = magnitude >> shift << shift
+            bucket = magnitude if value >= 0 else -magnitude
+        buckets = self.buckets
+        buckets[bucket] = buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def quantile(self, fraction: float):
+        """The value below which the given fraction of the values lie (None if empty)."""
+        if not self.count:
+            return None
+        rank = max(1, round(fraction * self.count))
+        seen = 0
+        for value in sorted(self.buckets):
+            seen += self.buckets[value]
+            if seen >= rank:
+                return value
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def merge(self, other: "ValueSketch"):
+        buckets = self.buckets
+        for value, count in other.buckets.items():
+            buckets[value] = buckets.get(value, 0) + count
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def to_data(self) -> dict:
+        # JSON keys are strings, so the buckets are a list of pairs
+        return {"buckets": sorted(self.buckets.items()), "count": self.count, "total": self.total,
+                "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_data(cls, data: dict) -> "ValueSketch":
+        sketch = cls()
+        sketch.buckets = {value: count for value, count in data["buckets"]}
+        sketch.count = data["count"]
+        sketch.total = data["total"]
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        return sketch
+
+class Leaderboard:
+    def __init__(self, size: int = 100):
+        self.size = size
+        self.top = [] # Min-heap of (victory, score, -turns, label, outcome)
+        self.scores = ValueSketch()
+        self.turns = ValueSketch()
+        self.outcomes = dict.fromkeys(OUTCOMES, 0)
+        self.max_score_reached = 0
+        self.defeats = {}
+        self.quits = {}
+
+    def add(self, score: int, outcome: str, turns: int, max_score_reached: bool, location: str, label: str = ""):
+        """Takes the final result of one game."""
+        entry = (outcome == "victory", score, -turns, label, outcome)
+        top = self.top
+        if len(top) < self.size:
+            heapq.heappush(top, entry)
+        elif entry > top[0]:
+            heapq.heapreplace(top, entry)
+
+        self.scores.add(score)
+        self.turns.add(turns)
+        self.outcomes[outcome] += 1
+        if max_score_reached:
+            self.max_score_reached += 1
+        if outcome != "victory":
+            counters = self.defeats if outcome == "defeat" else self.quits
+            counters[location] = counters.get(location, 0) + 1
+
+    def add_session(self, session, label: str = ""):
+        """Takes the result of a finished GameSession; a game without an outcome was quit."""
+        player = session.player
+        self.add(player.score, session.outcome or "quit", session.turns, player.score >= player.max_score,
+                 session.world.location_names[player.current_location], label)
+
+    def ranking(self) -> list:
+        # [(label, outcome, score, turns)], best first
+        return [(label, outcome, score, -negative_turns)
+                for _, score, negative_turns, label, outcome in sorted(self.top, reverse=True)]
+
+    def merge(self, other: "Leaderboard"):
+        for entry in other.top:
+            if len(self.top) < self.size:
+                heapq.heappush(self.top, entry)
+            elif entry > self.top[0]:
+                heapq.heapreplace(self.top, entry)
+        self.scores.merge(other.scores)
+        self.turns.merge(other.turns)
+        for outcome, count in other.outcomes.items():
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + count
+        self.max_score_reached += other.max_score_reached
+        for mine, theirs in ((self.defeats, other.defeats), (self.quits, other.quits)):
+            for location, count in theirs.items():
+                mine[location] = mine.get(location, 0) + count
+
+    def to_data(self) -> dict:
+        return {"size": self.size, "top": [list(entry) for entry in self.top],
+                "scores": self.scores.to_data(), "turns": self.turns.to_data(),
+                "outcomes": self.outcomes, "max_score_reached": self.max_score_reached,
+                "defeats": self.defeats, "quits": self.quits}
+
+    @classmethod
+    def from_data(cls, data: dict) -> "Leaderboard":
+        board = cls(data["size"])
+        board.top = [tuple(entry) for entry in data["top"]]
+        heapq.heapify(board.top)
+        board.scores = ValueSketch.from_data(data["scores"])
+        board.turns = ValueSketch.from_data(data["turns"])
+        board.outcomes.update(data["outcomes"])
+        board.max_score_reached = data["max_score_reached"]
+        board.defeats = data["defeats"]
+        board.quits = data["quits"]
+        return board
+
+    def save(self, path: str):
+        # Written to a temporary file first, so a reader never sees half a file
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(self.to_data(), file)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str, size: int = 100) -> "Leaderboard":
+        """
+        Reads a saved leaderboard; an empty one if the file does not exist.
+        Raises ValueError if the file is not a saved leaderboard.
+        """
+        try:
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return cls(size)
+        try:
+            return cls.from_data(data)
+        except (KeyError, TypeError, AttributeError) as error:
+            raise ValueError(f"{path} is not a saved leaderboard ({error!r}).") from error
+
+    def report(self, top: int = 10) -> str:
+        games = sum(self.outcomes.values())
+        lines = [f"Games: {games}  " + "  ".join(f"{outcome}: {count}" for outcome, count in self.outcomes.items())
+                 + f"  max score reached: {self.max_score_reached}"]
+        if not games:
+            return lines[0]
+        for name, sketch in (("Score", self.scores), ("Turns", self.turns)):
+            lines.append(f"{name}: mean {sketch.mean():.1f}  p50 {sketch.quantile(0.5)}  p90 {sketch.quantile(0.9)}"
+                         f"  p99 {sketch.quantile(0.99)}  min {sketch.min}  max {sketch.max}")
+        lines.append(f"\n{'#':>3}  {'player':<16}{'outcome':<9}{'score':>6}{'turns':>7}")
+        for rank, (label, outcome, score, turns) in enumerate(self.ranking()[:top], 1):
+            lines.append(f"{rank:>3}  {label:<16}{outcome:<9}{score:>6}{turns:>7}")
+        for title, counters in (("Defeats", self.defeats), ("Quits", self.quits)):
+            if counters:
+                places = sorted(counters.items(), key=lambda pair: -pair[1])[:5]
+                lines.append(f"\n{title} by location: " + ", ".join(f"{name} {count}" for name, count in places))
+        return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge saved leaderboards and print the standings.")
+    parser.add_argument("paths", nargs="+", help="leaderboard files, e.g. one per server process")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    board = Leaderboard()
+    for path in args.paths:
+        board.merge(Leaderboard.load(path))
+    print(board.report(args.top))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# loadgen.py
+
+import argparse
+import asyncio
+import time
+
+from server import PROMPT, ENCODING, raise_open_file_limit
+
+PROMPT_BYTES = PROMPT.encode(ENCODING)
+
+def load_script(path: str) -> list:
+    # One command per line, empty lines are ignored
+    with open(path, encoding="utf-8") as script:
+        return [line.strip() for line in script if line.strip()]
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+async def run_session(host: str, port: int, commands: list, connected: asyncio.Event,
+                      start: asyncio.Event, latencies: list, connect_slots: asyncio.Semaphore):
+    # Opens one session, waits until every session is open, then plays the script
+    async with connect_slots:
+        reader, writer = await asyncio.open_connection(host, port)
+        await reader.readuntil(PROMPT_BYTES)
+    connected.set()
+    await start.wait()
+
+    try:
+        for command in commands:
+            sent = time.perf_counter()
+            writer.write((command + "\n").encode(ENCODING))
+            try:
+                await reader.readuntil(PROMPT_BYTES)
+            except asyncio.IncompleteReadError:
+                # The game ended and the server closed the session
+                latencies.append(time.perf_counter() - sent)
+                break
+            latencies.append(time.perf_counter() - sent)
+    finally:
+        writer.close()
+
+async def run_load(host: str, port: int, commands: list, sessions: int, connect_concurrency: int):
+    latencies = []
+    start = asyncio.Event()
+    connect_slots = asyncio.Semaphore(connect_concurrency)
+    events = [asyncio.Event() for _ in range(sessions)]
+
+    connect_started = time.perf_counter()
+    tasks = [asyncio.create_task(run_session(host, port, commands, event, start, latencies, connect_slots))
+             for event in events]
+
+    # Wait until all sessions are open (or failed) so they are all live at the same time
+    pending = {asyncio.create_task(event.wait()) for event in events}
+    while pending:
+        done, pending = await asyncio.wait(pending, timeout=0.5)
+        if all(task.done() for task in tasks):
+            break
+    live = sum(event.is_set() for event in events)
+    connect_time = time.perf_counter() - connect_started
+    for waiter in pending:
+        waiter.cancel()
+
+    run_started = time.perf_counter()
+    start.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    run_time = time.perf_counter() - run_started
+
+    failed = sum(isinstance(result, BaseException) for result in results)
+    return live, failed, connect_time, run_time, sorted(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for the Project Omega server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--sessions", type=int, default=1000, help="number of concurrent sessions")
+    parser.add_argument("--script", default="walkthrough.txt", help="commands played by every session")
+    parser.add_argument("--connect-concurrency", type=int, default=256)
+    args = parser.parse_args()
+
+    raise_open_file_limit()
+    commands = load_script(args.script)
+    live, failed, connect_time, run_time, latencies = asyncio.run(
+        run_load(args.host, args.port, commands, args.sessions, args.connect_concurrency))
+
+    print(f"Sessions live at once: {live}/{args.sessions} (opened in {connect_time:.2f}s), failed: {failed}")
+    print(f"Commands: {len(latencies)} in {run_time:.2f}s ({len(latencies) / max(run_time, 1e-9):.0f} commands/s)")
+    print(f"Latency p50: {percentile(latencies, 0.50) * 1000:.2f} ms, "
+          f"p99: {percentile(latencies, 0.99) * 1000:.2f} ms, "
+          f"max: {percentile(latencies, 1.0) * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    main()
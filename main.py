@@ -1,381 +1,823 @@
 # main.py
 
-from classes import Player
-from data import GAME_WORLD, ALL_ITEMS
+import os
+import sys
+from collections import deque
+from functools import lru_cache
+from time import perf_counter_ns
 
-# Global game state
-PLAYER = Player("Reception Area")
-SERVER_ACTIVATED = False
+from classes import GameSession
+from fuzzy import Vocabulary
+from metrics import METRICS
+from routes import KEY_CARD_USAGES, route_tables
+from world import NO_EXIT
+
+# All the game state lives in a GameSession, so one process can run many games.
+# The functions below receive the session they work on explicitly.
 
 # helper functions
 
-def get_current_location():
-    return GAME_WORLD[PLAYER.current_location]
+def get_current_location(session: GameSession):
+    # The Location object of the player's location, for names and descriptions
+    return session.world.locations[session.player.current_location]
 
-def get_item_by_name(item_name_part: str, inventory_only: bool = False):
+def get_item_by_name(session: GameSession, item_name_part: str, inventory_only: bool = False):
     """
     Searches for an item by partial name in inventory or current location.
     Returns the Item object if found, otherwise None.
     """
-    items_list = PLAYER.inventory[:]
-    if not inventory_only:
-        items_list += get_current_location().items
-
     if not item_name_part:
         return None
 
-    item_name_part = item_name_part.lower().strip()
-
-    for item in items_list:
-        if item_name_part in item.name.lower():
-            return item
+    location_items = () if inventory_only else session.items_at(session.player.current_location)
+    index = session.world.item_index
+    inventory = session.player.inventory
+    item = index.first_match(item_name_part, inventory, location_items)
+    if item is None:
+        # Words of the name left out or misspelled, e.g. 'blue card' or 'blu crad'
+        item = index.word_match(index.corrected(item_name_part) or item_name_part, inventory, location_items)
+    return item
+
+# Rendered location text. Locations never change during play, so their lines
+# are built once and shared by all sessions. They are cached by (world, location
+# id) rather than by the Location: a world loaded from a file (worldfile.py)
+# drops Location objects it no longer needs, and the cache must not keep them.
+# The items line depends on what lies in the location for a session, so it is
+# cached by the items themselves: a session that moves items gets a new line,
+# all others keep sharing theirs.
+@lru_cache(maxsize=4096)
+def location_lines(world, location_id: int) -> tuple:
+    # (title, description, character line or None, exits line) of a location
+    location = world.locations[location_id]
+    locked = location.required_key or {}
+    exits_list = list(location.exits)
+    exits_list.extend(f"{direction} (locked)" for direction in locked if direction not in location.exits)
+    return (f"\n--- You are in: {location.name} ---",
+            location.description,
+            f"Character: {location.npc} is here." if location.npc else None,
+            f"You can go: {', '.join(exits_list)}")
+
+@lru_cache(maxsize=4096)
+def items_line(items: tuple) -> str:
+    return f"Items here: {', '.join(item.name for item in items)}"
+
+def display_location_info(session: GameSession):
+    player = session.player
+    output = session.output.write
+    world = session.world
+    location_id = player.current_location
+    location_items = session.items_at(location_id)
+    title, description, character, exits = location_lines(world, location_id)
+
+    session.output.event("location_described", location=world.location_names[location_id])
+    output(title)
+    output(description)
+
+    if location_items:
+        output(items_line(tuple(location_items)))
+
+    if character:
+        output(character)
+
+    output(exits)
+
+# Points the commands give; the game rules (data.py) give the others
+MOVE_POINTS = 1 # Every step through an open exit
+SWIPE_POINTS = 5 # Passing a locked door with a key card
+WEAR_POINTS = 5 # Putting on the suit
+
+def take_points(item) -> int:
+    return item.points or 1
+
+def item_use(item):
+    """
+    The (message, points) of using an item anywhere, or None if it has no use of
+    its own. Uses that depend on the location are game rules (the 'use' event).
+    """
+    usage = item.usage
+    if usage == "antidote":
+        return "✅ You used the Antidote. This will save you from the gas upon exit.", 0
+    if usage == "drink" and item.name == "Water Canister":
+        return "💧 You take a sip from the Water Canister. You feel refreshed.", 1
     return None
 
-def display_location_info():
-    location = get_current_location()
+def item_reading(item):
+    """The (message, points) of reading an item, or None if it cannot be read."""
+    if item.usage != "read":
+        return None
+    if item.name == "Accident Report":
+        return (f"Reading the {item.name}: 'The log details a controlled breach during testing of the Antidote on "
+                "a new strain of airborne toxin. The server was locked down as a fail-safe.'", 2)
+    return f"You read the {item.name}. It contains only technical jargon.", 0
 
-    print(f"\n--- You are in: {location.name} ---")
-    print(location.description)
+# Command interpretation
 
-    if location.items:
-        items_names = [item.name for item in location.items]
-        print(f"Items here: {', '.join(items_names)}")
+class Command:
+    # User input split into words once: the verb and the noun (the rest of the words).
+    # corrected is True if a typo in the verb or the direction was corrected.
+    __slots__ = ("text", "parts", "verb", "noun", "corrected")
+
+    def __init__(self, text: str, parts: list, corrected: bool = False):
+        self.text = text
+        self.parts = parts
+        self.verb = parts[0]
+        self.noun = " ".join(parts[1:]) if len(parts) > 1 else None
+        self.corrected = corrected
+
+# Other ways of saying a command. A verb synonym or a two-word phrasing is
+# replaced by the verb it means; a direction or its abbreviation alone means
+# going there.
+VERB_SYNONYMS = {"grab": "take", "get": "take", "walk": "go", "move": "go", "run": "go", "l": "look",
+                 "i": "inventory", "x": "examine", "inspect": "examine", "speak": "talk", "unlock": "swipe"}
+PHRASES = {("pick", "up"): "take", ("put", "down"): "drop", ("put", "on"): "wear", ("look", "at"): "examine",
+           ("talk", "to"): "talk", ("speak", "to"): "talk", ("go", "to"): "travel", ("walk", "to"): "travel"}
+DIRECTION_ABBREVIATIONS = {"n": "north", "s": "south", "e": "east", "w": "west", "u": "up", "d": "down"}
+DIRECTION_NAMES = frozenset(DIRECTION_ABBREVIATIONS.values())
+ARTICLES = frozenset(("the", "a", "an"))
+# Never the correction of a typo: these end the game or take turns back
+UNGUESSED_VERBS = frozenset(("quit", "exit", "undo", "rewind"))
+
+def parse_command(text: str):
+    """Tokenizes the user input. Returns a Command, or None for an empty input."""
+    normalized = normalized_words(text)
+    if normalized is None:
+        return None
+    return Command(text, *normalized)
+
+@lru_cache(maxsize=4096)
+def normalized_words(text: str):
+    # (words of the input as a command, True if a typo was corrected): synonyms
+    # replaced by their verb, a misspelled verb, or the misspelled direction
+    # after 'go', corrected, and a leading article dropped from the noun. A
+    # first word is only taken for a direction if it is one exactly ('rest' is
+    # not 'west'). The same text always gives the same words, so they are cached.
+    words = text.lower().split()
+    if not words:
+        return None
+    verb = words[0]
+    corrected = False
+    if verb in DIRECTION_ABBREVIATIONS:
+        verb = DIRECTION_ABBREVIATIONS[verb]
+    elif verb not in COMMANDS and verb not in VERB_SYNONYMS and verb not in DIRECTION_NAMES:
+        known = verb_vocabulary().correct(verb)
+        if known is not None and known != verb:
+            verb, corrected = known, True
+
+    rest = words[1:]
+    if rest and (verb, rest[0]) in PHRASES:
+        verb = PHRASES[verb, rest[0]]
+        rest = rest[1:]
+    elif verb in DIRECTION_NAMES:
+        verb, rest = "go", [verb] + rest
+    verb = VERB_SYNONYMS.get(verb, verb)
+
+    if verb == "go" and len(rest) == 1:
+        direction = DIRECTION_ABBREVIATIONS.get(rest[0], rest[0])
+        if direction not in DIRECTION_NAMES:
+            known = direction_vocabulary().correct(direction)
+            if known is not None:
+                direction, corrected = known, True
+        if direction in DIRECTION_NAMES:
+            rest = [direction]
+    elif len(rest) > 1 and rest[0] in ARTICLES:
+        rest = rest[1:]
+    return (verb, *rest), corrected
+
+@lru_cache(maxsize=1)
+def verb_vocabulary() -> Vocabulary:
+    # The verbs a typo can be corrected to, built once all the commands are registered
+    words = {*COMMANDS, *VERB_SYNONYMS, *(first for first, _ in PHRASES)}
+    return Vocabulary(words - UNGUESSED_VERBS)
+
+@lru_cache(maxsize=1)
+def direction_vocabulary() -> Vocabulary:
+    return Vocabulary(DIRECTION_NAMES)
+
+# Verb (and alias) -> handler(session, command). A handler returns False to end the game.
+COMMANDS = {}
+
+def command(*verbs: str):
+    """Registers the decorated function as the handler of the given verbs."""
+    def register(handler):
+        for verb in verbs:
+            COMMANDS[verb] = handler
+        return handler
+    return register
+
+def handle_command(session: GameSession, text: str):
+    """Interprets the user input command"""
+    metrics = METRICS
+    if metrics.enabled and next(metrics.command_samples):
+        return timed_handle_command(session, text, metrics)
+
+    command = parse_command(text)
+    if command is None:
+        return True
+
+    handler = COMMANDS.get(command.verb)
+    if handler is None:
+        handler = unknown_command # Counted as an error: typed verbs are not metric labels
+    elif metrics.enabled:
+        metrics.commands[command.verb] += 1
+    return run_command(session, handler, command)
+
+def timed_handle_command(session: GameSession, text: str, metrics):
+    # handle_command for the commands whose latency goes into the metrics
+    started = perf_counter_ns()
+    command = parse_command(text)
+    parsed = perf_counter_ns()
+    metrics.parse.record(parsed - started)
+    if command is None:
+        return True
 
-    if location.npc:
-        print(f"Character: {location.npc} is here.")
+    handler = COMMANDS.get(command.verb)
+    if handler is None:
+        handler = unknown_command
+    else:
+        metrics.commands[command.verb] += 1
+    running = run_command(session, handler, command)
+    metrics.dispatch.record(perf_counter_ns() - parsed)
+    return running
+
+def run_command(session: GameSession, handler, command: Command):
+    # Plays a turn and adds its state to the session history. Undo and rewind are
+    # not turns: they restore the turn count and history of an earlier turn.
+    takes_back = handler is undo_command or handler is rewind_command
+    history = session.history
+    if history is None and session.max_history:
+        history = session.history = deque([(None, session.state())], maxlen=session.max_history + 1)
+    if not takes_back:
+        session.turns += 1
+    if command.corrected:
+        session.output.write(f"({' '.join(command.parts)})") # What a typo was taken for
+    running = handler(session, command)
+    if history is not None and not takes_back:
+        history.append((command.text, session.state()))
+    return running
+
+def unknown_command(session: GameSession, command: Command):
+    METRICS.count_error("unknown_command")
+    if len(command.parts) > 2:
+        session.output.write("❌ Too many words. Enter a one or two-word command (e.g., 'go north' or 'look').")
+    else:
+        session.output.write(f"❌ Unknown command: '{command.text}'. Try 'help'.")
+    return True
 
-    exits_list = []
-    for direction in location.exits.items():
-        if location.required_key and direction in location.required_key:
-            exits_list.append(f"{direction} (locked)")
+@command("quit", "exit")
+def quit_command(session: GameSession, command: Command):
+    session.output.write("Quitting the game...")
+    session.output.event("game_finished", outcome="quit", score=session.player.score)
+    return False
+
+@command("look", "explore")
+def look_command(session: GameSession, command: Command):
+    display_location_info(session)
+    session.world.rules.fire(session, "look", session.player.current_location)
+    return True
+
+@command("with", "inventory", "inv")
+def inventory_command(session: GameSession, command: Command):
+    player = session.player
+    output = session.output.write
+
+    if player.inventory:
+        output("--- Your inventory: ---")
+        for item in player.inventory:
+            output(f"- {item.name} ({item.description})")
+        if player.has_worn_suit:
+            output("- Hazmat Suit (Worn)")
+    else:
+        output("Your inventory is empty.")
+    output(f"Current score: {player.score}")
+    return True
+
+@command("go")
+def go_command(session: GameSession, command: Command):
+    player = session.player
+    output = session.output.write
+    noun = command.noun
+
+    if not noun:
+        METRICS.count_error("missing_noun")
+        output("❌ Go where? Specify a direction (e.g., 'go north').")
+        return True
+
+    world = session.world
+    location = player.current_location
+    direction = world.direction_ids.get(noun)
+    target = world.exit(location, direction) if direction is not None else NO_EXIT
+    key_id = world.gate(location, direction)[0] if direction is not None else NO_EXIT
+
+    if key_id != NO_EXIT:
+        # A door with a card reader, passed with 'swipe'
+        required_key = world.items[key_id]
+
+        if required_key in player.inventory:
+            output(f"Hint: The door is locked by a card reader. Try to 'swipe {required_key.name}' to open it.")
         else:
-            exits_list.append(f"{direction}")
+            output(f"❌ The passage {noun} is locked. You need the {required_key.name}.")
+
+    elif target != NO_EXIT:
+        player.current_location = target
+        session.output.event("moved", source=world.location_names[location], target=world.location_names[target])
+        player.add_score(MOVE_POINTS)
+        display_location_info(session)
+        world.rules.fire(session, "enter", target)
+    else:
+        output(f"Cannot go in that direction, or '{noun}' is not a valid exit.")
+    return True
+
+@command("travel")
+def travel_command(session: GameSession, command: Command):
+    """Walks a shortest route to a location, one 'go' or 'swipe' per step."""
+    player = session.player
+    output = session.output.write
+    noun = command.noun
+
+    if not noun:
+        METRICS.count_error("missing_noun")
+        output("❌ Travel where? Specify a location name (e.g., 'travel server room').")
+        return True
 
-    print(f"You can go: {', '.join(exits_list)}")
+    world = session.world
+    routes = route_tables(world)
+    target = routes.location_ids.get(noun)
+    if target is None:
+        output(f"❌ Unknown location: '{noun}'.")
+        return True
 
-    # Gas hazard check and score penalty
-    if location.special_action == "gas_hazard" and not PLAYER.has_worn_suit:
-        print("\n❗️ DANGER: Toxic gas in the air. You lose points without protection.\n")
-        PLAYER.add_score(-5)
+    target_name = world.location_names[target]
+    location = player.current_location
+    if target == location:
+        output(f"You are already in {target_name}.")
+        return True
 
-def check_win_condition():
-    """Checks the victory conditions (Emergency Exit, Antidote, Server Activated)."""
-    global SERVER_ACTIVATED
-    location = get_current_location()
+    keys = routes.key_mask(player.inventory)
+    route = routes.route(location, target, keys, player.has_worn_suit)
+    if route is None:
+        if not player.has_worn_suit and routes.route(location, target, keys, True) is not None:
+            output(f"❌ Every way to {target_name} leads through toxic gas. Put on a protective suit first.")
+        else:
+            output(f"❌ You cannot get to {target_name} from here.")
+        return True
 
-    antidote = get_item_by_name("Antidote", inventory_only=True)
+    output(f"You travel to {target_name} ({len(route)} steps).")
+    for next_location in route:
+        verb, direction_or_key = routes.step(location, next_location, keys)
+        running = COMMANDS[verb](session, Command(f"{verb} {direction_or_key}", [verb, *direction_or_key.split()]))
+        if not running or session.outcome is not None or player.current_location != next_location:
+            return running # The game ended, or a rule stopped the journey
+        location = next_location
+    return True
 
-    if location.name == "Emergency Exit":
+@command("take")
+def take_command(session: GameSession, command: Command):
+    player = session.player
+    output = session.output.write
+    noun = command.noun
 
-        if antidote and SERVER_ACTIVATED:
-            PLAYER.add_score(50)
+    if not noun:
+        METRICS.count_error("missing_noun")
+        output("❌ Take what? Specify an item name.")
+        return True
 
-            if PLAYER.score >= PLAYER.max_score:
-                print("\n\n*** VICTORY! ***")
-                print("You successfully reactivated the server, disabled the security, and escaped the complex.")
-                print(f"You took the Antidote and are safe! Your final score: {PLAYER.score}/{PLAYER.max_score}")
-                return True
-            else:
-                print(f"\n\n*** DEFEAT! ***")
-                print(f"You reached the Emergency Exit and have the Antidote, but you failed to collect enough data and evidence.")
-                print(f"You must achieve a score of at least {PLAYER.max_score} to be considered successful. Your score: {PLAYER.score}")
-                return True
+    location = player.current_location
+    item_to_take = get_item_by_name(session, noun)
+    if item_to_take and item_to_take in session.items_at(location):
+        session.remove_item(location, item_to_take)
+        player.inventory.append(item_to_take)
+        session.output.event("item_taken", item=item_to_take.name, location=session.world.location_names[location])
+        player.add_score(take_points(item_to_take))
+        output(f"✅ You took: {item_to_take.name}")
+        session.world.rules.fire(session, "item_acquired", location, item_to_take)
+    else:
+        METRICS.count_error("item_not_found")
+        output(f"❌ Item '{noun}' is not here or cannot be taken.")
+    return True
 
-        elif not SERVER_ACTIVATED:
-            print("❌ The emergency exit is still locked. You must activate the Server to disable the security system.")
-        elif not antidote:
-            print("⚠️ The exit is open, but the toxic gas is spreading. You must find the Antidote first!")
+@command("drop")
+def drop_command(session: GameSession, command: Command):
+    player = session.player
+    output = session.output.write
+    noun = command.noun
 
-    return False
+    if not noun:
+        METRICS.count_error("missing_noun")
+        output("❌ Drop what? Specify an item name.")
+        return True
 
-# Command interpretation
+    item_to_drop = get_item_by_name(session, noun, inventory_only=True)
+    if item_to_drop:
+        player.inventory.remove(item_to_drop)
+        session.add_item(player.current_location, item_to_drop)
+        session.output.event("item_dropped", item=item_to_drop.name,
+                             location=session.world.location_names[player.current_location])
+        output(f"✅ You dropped: {item_to_drop.name}")
+    else:
+        METRICS.count_error("item_not_found")
+        output(f"❌ Item '{noun}' is not in your inventory.")
+    return True
 
-def handle_command(command: str):
-    """Interprets the user input command"""
-    global SERVER_ACTIVATED
+@command("swipe")
+def swipe_command(session: GameSession, command: Command):
+    """Swipes a key card to pass a locked door."""
+    player = session.player
+    output = session.output.write
+    noun = command.noun
 
-    parts = command.lower().split()
-    if not parts:
+    if not noun:
+        METRICS.count_error("missing_noun")
+        output("❌ Swipe what? Usage: swipe [key card name]")
         return True
 
-    verb = parts[0]
-    noun = " ".join(parts[1:]) if len(parts) > 1 else None
-    location = get_current_location()
+    item_to_swipe = get_item_by_name(session, noun, inventory_only=True)
+    if not item_to_swipe:
+        METRICS.count_error("item_not_found")
+        output(f"❌ Item '{noun}' is not in your inventory.")
+        return True
 
-    if verb in ["quit", "exit"]:
-        print("Quitting the game...")
-        return False
+    if item_to_swipe.usage not in KEY_CARD_USAGES:
+        output(f"❌ {item_to_swipe.name} is not a Key Card and cannot be swiped.")
+        return True
 
-    elif verb in ["look", "explore"]:
-        display_location_info()
+    world = session.world
+    location = player.current_location
+    target = world.key_target(location, world.item_ids[item_to_swipe])
+
+    if target != NO_EXIT:
+        target_location_name = world.location_names[target]
+        player.current_location = target
+        session.output.event("moved", source=world.location_names[location], target=target_location_name)
+        player.add_score(SWIPE_POINTS)
+        output(f"✅ You successfully swiped the {item_to_swipe.name} and moved to {target_location_name}.")
+        display_location_info(session)
+        world.rules.fire(session, "enter", target)
+    else:
+        output(f"❌ The {item_to_swipe.name} does not open any locked doors here.")
+    return True
 
-    elif verb in ["with", "inventory", "inv"]:
-        if PLAYER.inventory:
-            print("--- Your inventory: ---")
-            for item in PLAYER.inventory:
-                print(f"- {item.name} ({item.description})")
-            if PLAYER.has_worn_suit:
-                print("- Hazmat Suit (Worn)")
-        else:
-            print("Your inventory is empty.")
-        print(f"Current score: {PLAYER.score}")
+@command("upload")
+def upload_command(session: GameSession, command: Command):
+    player = session.player
+    output = session.output.write
+    noun = command.noun
 
-    # Command GO
-    elif verb == "go":
-        if not noun:
-            print("❌ Go where? Specify a direction (e.g., 'go north').")
-            return True
+    location = player.current_location
+    if not session.world.rules.has_rules("upload", location):
+        output("❌ You can only upload data at the Main Server Terminal in the Server Room.")
+        return True
 
-        if noun in location.exits:
-            target_direction = noun
+    if not noun:
+        METRICS.count_error("missing_noun")
+        output("❌ Upload what? Usage: upload [flash drive name]")
+        return True
 
-            if location.required_key and target_direction in location.required_key:
-                required_key_name = location.required_key[target_direction]
-                key_item = get_item_by_name(required_key_name, inventory_only=True)
+    item_to_upload = get_item_by_name(session, noun, inventory_only=True)
+    if not item_to_upload:
+        METRICS.count_error("item_not_found")
+        output(f"❌ Item '{noun}' is not in your inventory.")
+        return True
 
-                if key_item:
-                    print(f"Hint: The door is locked by a card reader. Try to 'swipe {key_item.name}' to open it.")
-                else:
-                    print(f"❌ The passage {target_direction} is locked. You need the {required_key_name}.")
+    if item_to_upload.usage != "upload":
+        output(f"❌ {item_to_upload.name} is not a valid data source for the server.")
+        return True
 
-            else:
-                PLAYER.current_location = location.exits[target_direction]
-                PLAYER.add_score(1)
-                display_location_info()
-        else:
-            print(f"Cannot go in that direction, or '{noun}' is not a valid exit.")
-
-    # take
-    elif verb == "take":
-        if not noun:
-            print("❌ Take what? Specify an item name.")
-            return True
-
-        item_to_take = get_item_by_name(noun)
-        if item_to_take and item_to_take in location.items:
-            location.items.remove(item_to_take)
-            PLAYER.inventory.append(item_to_take)
-            PLAYER.add_score(item_to_take.points or 1)
-            print(f"✅ You took: {item_to_take.name}")
-        else:
-            print(f"❌ Item '{noun}' is not here or cannot be taken.")
-
-    # drop
-    elif verb == "drop":
-        if not noun:
-            print("❌ Drop what? Specify an item name.")
-            return True
-
-        item_to_drop = get_item_by_name(noun, inventory_only=True)
-        if item_to_drop:
-            PLAYER.inventory.remove(item_to_drop)
-            location.items.append(item_to_drop)
-            print(f"✅ You dropped: {item_to_drop.name}")
-        else:
-            print(f"❌ Item '{noun}' is not in your inventory.")
-
-    # swipe (key card)
-    elif verb == "swipe":
-        if not noun:
-            print("❌ Swipe what? Usage: swipe [key card name]")
-            return True
-
-        item_to_swipe = get_item_by_name(noun, inventory_only=True)
-        if not item_to_swipe:
-            print(f"❌ Item '{noun}' is not in your inventory.")
-            return True
-
-        if item_to_swipe.usage not in ["key_blue", "key_red"]:
-            print(f"❌ {item_to_swipe.name} is not a Key Card and cannot be swiped.")
-            return True
-
-        target_direction = None
-        for direction, required_key in location.required_key.items() if location.required_key else {}.items():
-            if required_key.lower() == item_to_swipe.name.lower():
-                target_direction = direction
-                break
-
-        if target_direction and location.exits_with_key and target_direction in location.exits_with_key:
-            target_location_name = location.exits_with_key[target_direction]
-            PLAYER.current_location = target_location_name
-            PLAYER.add_score(5)
-            print(f"✅ You successfully swiped the {item_to_swipe.name} and moved to {target_location_name}.")
-            display_location_info()
-        else:
-            print(f"❌ The {item_to_swipe.name} does not open any locked doors here.")
-
-    # upload
-    elif verb == "upload":
-        if location.special_action != "server_terminal":
-            print("❌ You can only upload data at the Main Server Terminal in the Server Room.")
-            return True
-
-        if not noun:
-            print("❌ Upload what? Usage: upload [flash drive name]")
-            return True
-
-        item_to_upload = get_item_by_name(noun, inventory_only=True)
-        if not item_to_upload:
-            print(f"❌ Item '{noun}' is not in your inventory.")
-            return True
-
-        if item_to_upload.usage != "upload":
-            print(f"❌ {item_to_upload.name} is not a valid data source for the server.")
-            return True
-
-        global SERVER_ACTIVATED
-        SERVER_ACTIVATED = True
-        PLAYER.inventory.remove(item_to_upload)
-        PLAYER.add_score(15)
-        print(f"✅ {item_to_upload.name} connected. Server reactivated! Emergency Exit unlocked.")
-        print("Note: The server has opened a new way.")
-
-    # wear (Hazmat Suit)
-    elif verb == "wear":
-        if not noun:
-            print("❌ Wear what? Usage: wear [suit name]")
-            return True
-
-        item_to_wear = get_item_by_name(noun, inventory_only=True)
-
-        if not item_to_wear:
-            print(f"❌ Item '{noun}' is not in your inventory.")
-            return True
-
-        if item_to_wear.usage != "wear":
-            print(f"❌ You cannot wear '{item_to_wear.name}'.")
-            return True
-
-        if PLAYER.has_worn_suit:
-            print("You are already wearing a protective suit.")
-            return True
-
-        PLAYER.has_worn_suit = True
-        PLAYER.add_score(5)
-        PLAYER.inventory.remove(item_to_wear) # It's worn, not in the inventory list
-        print("✅ You put on the Hazmat Suit. You can now safely enter hazardous zones.")
-
-    # use (generic command)
-    elif verb == "use":
-        if not noun:
-            print("❌ Use what? Specify an item name.")
-            return True
-
-        item_to_use = get_item_by_name(noun, inventory_only=True)
-        if not item_to_use:
-            print(f"❌ You don't have item '{noun}'.")
-            return True
-
-        if item_to_use.usage == "antidote":
-            print("✅ You used the Antidote. This will save you from the gas upon exit.")
-        elif item_to_use.usage == "drink" and item_to_use.name == "Water Canister":
-            print("💧 You take a sip from the Water Canister. You feel refreshed.")
-            PLAYER.add_score(1)
-        elif item_to_use.usage == "connect" and item_to_use.name == "Wire" and location.special_action == "server_terminal":
-            print("You connect the Wire to the server. It buzzes, but nothing happens. You still need the Flash Drive.")
-            PLAYER.add_score(1)
-        else:
-            print(f"❌ Cannot use '{item_to_use.name}' here in this way.")
+    session.world.rules.fire(session, "upload", location, item_to_upload)
+    return True
 
-    # read
-    elif verb == "read":
-        if not noun:
-            print("❌ Read what? Specify an item name.")
-            return True
+@command("wear")
+def wear_command(session: GameSession, command: Command):
+    """Puts on the Hazmat Suit."""
+    player = session.player
+    output = session.output.write
+    noun = command.noun
 
-        item_to_read = get_item_by_name(noun, inventory_only=True)
+    if not noun:
+        METRICS.count_error("missing_noun")
+        output("❌ Wear what? Usage: wear [suit name]")
+        return True
 
-        if item_to_read and item_to_read.usage == "read":
-            if item_to_read.name == "Accident Report":
-                 print(f"Reading the {item_to_read.name}: 'The log details a controlled breach during testing of the Antidote on a new strain of airborne toxin. The server was locked down as a fail-safe.'")
-                 PLAYER.add_score(2)
-            else:
-                print(f"You read the {item_to_read.name}. It contains only technical jargon.")
-        else:
-             print(f"❌ You cannot read '{noun}'.")
-
-    # talk
-    elif verb == "talk":
-        if location.npc == "Injured Guard":
-            red_card = ALL_ITEMS["Red Key Card"]
-            if red_card not in PLAYER.inventory:
-                PLAYER.inventory.append(red_card)
-                PLAYER.add_score(5)
-                print("Guard: 'They... they took... the Red Key Card, it must be somewhere... oh wait, it's on me! Take it!'")
-                print(f"✅ You received: {red_card.name}")
-            else:
-                 print("Guard: 'I need medical help... just leave me...'")
-        else:
-            print("There is no one here to talk to.")
+    item_to_wear = get_item_by_name(session, noun, inventory_only=True)
 
-    # examine
-    elif verb == "examine":
-        if not noun:
-            print("❌ Examine what? Specify an item name.")
-            return True
+    if not item_to_wear:
+        METRICS.count_error("item_not_found")
+        output(f"❌ Item '{noun}' is not in your inventory.")
+        return True
 
-        item_to_examine = get_item_by_name(noun, inventory_only=True)
-        if item_to_examine:
-            print(f"Examining {item_to_examine.name}: {item_to_examine.description}")
-        else:
-            print(f"❌ Item '{noun}' is not available to examine.")
-
-    # help
-    elif verb == "help":
-        print("\n--- Available commands ---")
-        print()
-        print("Movement: go [north/south/east/west]")
-        print("Interaction: take [item], drop [item], talk [npc], examine [item], read [item]")
-        print("Special Actions:")
-        print("  swipe [card name] (Use key cards on locked doors)")
-        print("  upload [flash drive name] (Use at Server Room to activate server)")
-        print("  wear [suit name] (Use Hazmat Suit)")
-        print("Status: look/explore, inventory/with/inv, score, quit/exit")
-        print()
-        print("Command should contain one verb.")
-        print("The item after verb can consist of one, two or three words, e.g. 'blue key card'.")
-
-    # score
-    elif verb == "score":
-        print(f"Your current score: {PLAYER.score}/{PLAYER.max_score}")
+    if item_to_wear.usage != "wear":
+        output(f"❌ You cannot wear '{item_to_wear.name}'.")
+        return True
+
+    if player.has_worn_suit:
+        output("You are already wearing a protective suit.")
+        return True
 
+    player.has_worn_suit = True
+    session.output.event("suit_worn", item=item_to_wear.name)
+    player.add_score(WEAR_POINTS)
+    player.inventory.remove(item_to_wear) # It's worn, not in the inventory list
+    output("✅ You put on the Hazmat Suit. You can now safely enter hazardous zones.")
+    return True
+
+@command("use")
+def use_command(session: GameSession, command: Command):
+    """Generic command for items with a special use."""
+    player = session.player
+    output = session.output.write
+    noun = command.noun
+
+    if not noun:
+        METRICS.count_error("missing_noun")
+        output("❌ Use what? Specify an item name.")
+        return True
+
+    item_to_use = get_item_by_name(session, noun, inventory_only=True)
+    if not item_to_use:
+        METRICS.count_error("item_not_found")
+        output(f"❌ You don't have item '{noun}'.")
+        return True
+
+    effect = item_use(item_to_use)
+    if effect is None:
+        if not session.world.rules.fire(session, "use", player.current_location, item_to_use):
+            output(f"❌ Cannot use '{item_to_use.name}' here in this way.")
+        return True
+    message, points = effect
+    output(message)
+    if points:
+        player.add_score(points)
+    return True
+
+@command("read")
+def read_command(session: GameSession, command: Command):
+    player = session.player
+    output = session.output.write
+    noun = command.noun
+
+    if not noun:
+        METRICS.count_error("missing_noun")
+        output("❌ Read what? Specify an item name.")
+        return True
+
+    item_to_read = get_item_by_name(session, noun, inventory_only=True)
+    reading = item_reading(item_to_read) if item_to_read else None
+    if reading is None:
+        output(f"❌ You cannot read '{noun}'.")
+        return True
+    message, points = reading
+    output(message)
+    if points:
+        player.add_score(points)
+    return True
+
+@command("talk")
+def talk_command(session: GameSession, command: Command):
+    # What the characters say and give is in the game rules
+    if not session.world.rules.fire(session, "talk", session.player.current_location):
+        session.output.write("There is no one here to talk to.")
+    return True
+
+@command("examine")
+def examine_command(session: GameSession, command: Command):
+    output = session.output.write
+    noun = command.noun
+
+    if not noun:
+        METRICS.count_error("missing_noun")
+        output("❌ Examine what? Specify an item name.")
+        return True
+
+    item_to_examine = get_item_by_name(session, noun, inventory_only=True)
+    if item_to_examine:
+        output(f"Examining {item_to_examine.name}: {item_to_examine.description}")
     else:
-        if len(parts) > 2:
-            print("❌ Too many words. Enter a one or two-word command (e.g., 'go north' or 'look').")
-        else:
-            print(f"❌ Unknown command: '{command}'. Try 'help'.")
+        METRICS.count_error("item_not_found")
+        output(f"❌ Item '{noun}' is not available to examine.")
+    return True
+
+@command("undo")
+def undo_command(session: GameSession, command: Command):
+    return go_back(session, 1)
 
+@command("rewind")
+def rewind_command(session: GameSession, command: Command):
+    output = session.output.write
+    noun = command.noun
+
+    if not noun:
+        METRICS.count_error("missing_noun")
+        output("❌ Rewind how many turns? Specify a number (e.g., 'rewind 3').")
+        return True
+
+    if not noun.isdigit() or int(noun) < 1:
+        output(f"❌ '{noun}' is not a number of turns.")
+        return True
+    return go_back(session, int(noun))
+
+def go_back(session: GameSession, turns: int):
+    """Puts the session back to its state the given number of turns ago."""
+    output = session.output.write
+    history = session.history
+    if history is None:
+        output("❌ Turns cannot be taken back in this game.")
+        return True
+    available = len(history) - 1
+    if not available:
+        output("There is nothing to undo.")
+        return True
+    if turns > available:
+        output(f"❌ You can only go back {available} turns.")
+        return True
+
+    target = available - turns
+    first = history[target + 1][0]
+    session.restore(history[target][1])
+    for _ in range(turns):
+        history.pop()
+    session.output.event("state_restored", turns=turns)
+    output(f"↩ Took back '{first}'." if turns == 1 else f"↩ Took back {turns} turns, back to before '{first}'.")
+    display_location_info(session)
+    return True
+
+@command("help")
+def help_command(session: GameSession, command: Command):
+    output = session.output.write
+    output("\n--- Available commands ---")
+    output()
+    output("Movement: go [north/south/east/west], travel [location name]")
+    output("Interaction: take [item], drop [item], talk [npc], examine [item], read [item]")
+    output("Special Actions:")
+    output("  swipe [card name] (Use key cards on locked doors)")
+    output("  upload [flash drive name] (Use at Server Room to activate server)")
+    output("  wear [suit name] (Use Hazmat Suit)")
+    output("Status: look/explore, inventory/with/inv, score, quit/exit")
+    output("Time: undo (take back the last command), rewind [number of commands]")
+    output()
+    output("Command should contain one verb. Short forms work too, e.g. 'n' for 'go north', 'i' for 'inventory',")
+    output("'grab' or 'pick up' for 'take', and small typos are corrected.")
+    output("The item after verb can consist of one, two or three words, e.g. 'blue key card'.")
+    return True
+
+@command("score")
+def score_command(session: GameSession, command: Command):
+    player = session.player
+    session.output.write(f"Your current score: {player.score}/{player.max_score}")
     return True
 
 # Main game loop
 
-def play_game():
-    print("=========================================")
-    print(" | SECRET LABORATORY 'PROJECT OMEGA' |")
-    print("=========================================")
-    print("Goal: Activate the Server and escape with the Antidote via the Emergency Exit.")
-    print(f"❗ Additional Goal: You must also achieve a **minimum score of {PLAYER.max_score}** to be considered successful.")
-    print("If you reach the exit with the Antidote but a lower score, you will lose.")
+def display_intro(session: GameSession):
+    player = session.player
+    output = session.output.write
+    output("=========================================")
+    output(" | SECRET LABORATORY 'PROJECT OMEGA' |")
+    output("=========================================")
+    output("Goal: Activate the Server and escape with the Antidote via the Emergency Exit.")
+    output(f"❗ Additional Goal: You must also achieve a **minimum score of {player.max_score}** to be considered successful.")
+    output("If you reach the exit with the Antidote but a lower score, you will lose.")
+
+def record_result(session: GameSession, state_directory: str, label: str):
+    # Adds a finished game to the leaderboard file of the state directory.
+    # One-command runs of different sessions can finish at the same time, so the
+    # file is read and rewritten while holding a lock on leaderboard.json.lock
+    from leaderboard import Leaderboard
+    path = os.path.join(state_directory, "leaderboard.json")
+    try:
+        os.makedirs(state_directory, exist_ok=True)
+        with open(f"{path}.lock", "a") as lock:
+            lock_file(lock)
+            try:
+                leaderboard = Leaderboard.load(path)
+            except ValueError:
+                # A damaged file is set aside rather than losing every later result
+                os.replace(path, f"{path}.damaged")
+                leaderboard = Leaderboard()
+            leaderboard.add_session(session, label)
+            leaderboard.save(path)
+    except OSError:
+        pass # The game result is not worth failing over
+
+def lock_file(file):
+    # Blocks until this process holds an exclusive lock on the open file; the
+    # lock goes with the file when it is closed. No locking where fcntl is missing
+    try:
+        import fcntl
+    except ImportError:
+        return
+    fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+
+MAX_HISTORY = 100 # Turns a player can take back with undo and rewind
+
+def play_game(world):
+    session = GameSession(world, max_history=MAX_HISTORY)
 
-    display_location_info()
+    display_intro(session)
+    display_location_info(session)
 
+    # Everything a turn prints reaches the terminal in one write, before the prompt
+    # The game rules set session.outcome when the game is won or lost
     running = True
-    while running:
-        if check_win_condition():
-            break
+    while running and session.outcome is None:
+        session.output.flush()
 
         command = input("\n> Enter command: ").strip()
         if not command:
             continue
 
-        running = handle_command(command)
+        running = handle_command(session, command)
 
-    print("\nGame over. Thank you for playing!")
+    session.output.write("\nGame over. Thank you for playing!")
+    session.output.flush()
+    record_result(session, default_state_directory(), "terminal")
+
+# One command per process: python main.py --session ID "go north"
+# The session is kept between runs as a snapshot (snapshot.py) in the state
+# directory, and the world comes from the prebuilt cache (worldcache.py), so a
+# run only reads two small files before it plays the command.
+
+USAGE = "usage: python main.py [--session ID [--state-dir DIR] COMMAND...]"
+
+def default_state_directory() -> str:
+    base = os.environ.get("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state")
+    return os.path.join(base, "project-omega")
+
+def session_path(state_directory: str, session_id: str) -> str:
+    if not session_id or not all(character.isascii() and (character.isalnum() or character in "-_")
+                                 for character in session_id):
+        raise ValueError(f"Invalid session id '{session_id}': use letters, digits, '-' and '_'.")
+    return os.path.join(state_directory, "sessions", f"{session_id}.session")
+
+def play_one_command(world, path: str, text: str, state_directory: str, session_id: str):
+    """
+    Plays one command in the session saved at path (a new game if there is
+    none) and saves the session again, or deletes it when the game is over.
+    """
+    from output import TextSink
+    from snapshot import SnapshotError, save_session, load_session
+
+    output = TextSink(sys.stdout)
+    try:
+        with open(path, "rb") as saved:
+            session = load_session(saved.read(), world, output)
+    except (FileNotFoundError, SnapshotError) as error:
+        if isinstance(error, SnapshotError):
+            output.write(f"The saved game cannot be continued ({error}). Starting a new game.")
+        session = GameSession(world, output=output)
+        display_intro(session)
+        display_location_info(session)
+
+    running = handle_command(session, text) if text.strip() else True
+    if running and session.outcome is None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as saved:
+            saved.write(save_session(session))
+        os.replace(temporary, path)
+    else:
+        output.write("\nGame over. Thank you for playing!")
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        record_result(session, state_directory, session_id)
+    output.flush()
+
+def main(arguments: list):
+    # Parsed by hand: argparse would be the largest import of a one-command run
+    session_id = None
+    state_directory = None
+    words = []
+    arguments = iter(arguments)
+    for argument in arguments:
+        if argument in ("--session", "--state-dir"):
+            value = next(arguments, None)
+            if value is None:
+                sys.exit(f"{argument} needs a value\n{USAGE}")
+            if argument == "--session":
+                session_id = value
+            else:
+                state_directory = value
+        elif argument in ("-h", "--help"):
+            print(USAGE)
+            return
+        else:
+            words.append(argument)
+
+    from worldcache import cached_world
+    world = cached_world()
+    if session_id is None:
+        if words or state_directory:
+            sys.exit(f"A command needs --session\n{USAGE}")
+        play_game(world)
+        return
+
+    state_directory = state_directory or default_state_directory()
+    try:
+        path = session_path(state_directory, session_id)
+    except ValueError as error:
+        sys.exit(str(error))
+    play_one_command(world, path, " ".join(words), state_directory, session_id)
 
 # Execution
 if __name__ == "__main__":
-    try:
-        play_game()
-    except KeyError as e:
-        print("\n--- FATAL ERROR ---")
-        print(f"A location key error occurred. Check if '{e.args[0]}' exists in GAME_WORLD or if it's the correct starting location.")
\ No newline at end of file
+    main(sys.argv[1:])
\ No newline at end of file
@@ -0,0 +1,122 @@
+# metrics.py
+
+from collections import defaultdict
+from itertools import cycle
+
+# Process-wide counters and latency histograms of the game, exported in the
+# Prometheus text format. They stay on in production; METRICS.enabled = False
+# turns them off (bench_metrics.py measures the difference).
+#   commands    calls per command, after synonyms and abbreviations are mapped
+#               to it ('n' and 'go north' both count as 'go')
+#   errors      unknown_command, missing_noun, item_not_found
+#   parse, dispatch, render   latency in ns: splitting the input into a
+#               Command, running its handler, joining the text of a turn
+#   sessions    sessions with a connection (set by the server)
+# The counters are exact. Reading the clock and filling a histogram costs more
+# than a whole parse, so only every sample_every-th command and output are
+# timed: the histograms hold a uniform sample, which keeps their quantiles.
+
+class LatencyHistogram:
+    # HDR-style histogram of nanosecond values: below 32 every value has its own
+    # bucket, above that every power of two is split into 16 buckets, so a bucket
+    # is at most 1/16 (6%) wider than its lower bound. The buckets cover every
+    # value below 2**64.
+    BUCKETS = 976
+
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.sum = 0
+
+    def record(self, value: int):
+        shift = value.bit_length() - 5
+        self.counts[(shift << 4) + (value >> shift) if shift > 0 else value] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    @staticmethod
+    def upper_bound(index: int) -> int:
+        # Largest value that falls into a bucket
+        if index < 32:
+            return index
+        shift = (index >> 4) - 1
+        return (((index & 15) + 16 + 1) << shift) - 1
+
+    def quantile(self, fraction: float) -> int:
+        """Upper bound of the bucket that holds the given fraction of the values (0 if empty)."""
+        total = self.count
+        if not total:
+            return 0
+        rank = max(1, round(fraction * total))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.upper_bound(index)
+        return self.upper_bound(self.BUCKETS - 1)
+
+    def cumulative(self, bounds: list) -> list:
+        # Count of the values up to each bound (ascending); a bucket counts under a bound it does not cross
+        result = []
+        seen = 0
+        index = 0
+        for bound in bounds:
+            while index < self.BUCKETS and self.upper_bound(index) <= bound:
+                seen += self.counts[index]
+                index += 1
+            result.append(seen)
+        return result
+
+# Bucket bounds of the exported histograms: powers of two from 1 µs to about 67 s
+EXPORT_BOUNDS = [1 << exponent for exponent in range(10, 37)]
+
+ERROR_KINDS = ("unknown_command", "missing_noun", "item_not_found")
+
+class Metrics:
+    def __init__(self, sample_every: int = 16):
+        self.enabled = True
+        self.commands = defaultdict(int) # {verb: calls}
+        self.errors = dict.fromkeys(ERROR_KINDS, 0)
+        self.parse = LatencyHistogram()
+        self.dispatch = LatencyHistogram()
+        self.render = LatencyHistogram()
+        self.sessions = 0
+        # next() of these is True for every sample_every-th command / output
+        self.command_samples = cycle([False] * (sample_every - 1) + [True])
+        self.render_samples = cycle([False] * (sample_every - 1) + [True])
+
+    def count_error(self, kind: str):
+        if self.enabled:
+            self.errors[kind] += 1
+
+    def prometheus_text(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = ["# HELP omega_commands_total Commands handled, by verb.",
+                 "# TYPE omega_commands_total counter"]
+        lines += [f'omega_commands_total{{verb="{verb}"}} {count}' for verb, count in sorted(self.commands.items())]
+        lines += ["# HELP omega_command_errors_total Commands that failed, by reason.",
+                  "# TYPE omega_command_errors_total counter"]
+        lines += [f'omega_command_errors_total{{reason="{kind}"}} {count}' for kind, count in self.errors.items()]
+
+        bounds = [f"{bound / 1e9:.9g}" for bound in EXPORT_BOUNDS]
+        for name, histogram, text in (("parse", self.parse, "Splitting the input into a command"),
+                                      ("dispatch", self.dispatch, "Running the handler of a command"),
+                                      ("render", self.render, "Joining the output text of a turn")):
+            metric = f"omega_{name}_seconds"
+            lines += [f"# HELP {metric} {text}.", f"# TYPE {metric} histogram"]
+            for bound, count in zip(bounds, histogram.cumulative(EXPORT_BOUNDS)):
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {count}')
+            lines += [f'{metric}_bucket{{le="+Inf"}} {histogram.count}',
+                      f"{metric}_sum {histogram.sum / 1e9:.9g}",
+                      f"{metric}_count {histogram.count}"]
+
+        lines += ["# HELP omega_sessions Game sessions with a connection.",
+                  "# TYPE omega_sessions gauge",
+                  f"omega_sessions {self.sessions}"]
+        return "\n".join(lines) + "\n"
+
+METRICS = Metrics()
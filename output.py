@@ -0,0 +1,99 @@
+# output.py
+
+import sys
+from time import perf_counter_ns
+
+from metrics import METRICS
+
+# The game never prints directly: it writes text lines and structured events to
+# the output sink of its session. A sink keeps what one turn produced and hands
+# it over in one piece on flush(), so a turn costs at most one write to the
+# terminal, the socket or the log.
+#
+# Events sent by the game (kind: data):
+#   location_described: location
+#   moved: source, target
+#   score_changed: points, score
+#   item_taken / item_dropped: item, location
+#   item_received: item, npc
+#   server_activated: item, location
+#   item_consumed: item
+#   suit_worn: item
+#   game_finished: outcome ('victory', 'defeat' or 'quit'), score
+#   state_restored: turns (undo and rewind put back an earlier state)
+
+class OutputSink:
+    # Interface of all sinks. Subclasses override what they need.
+    __slots__ = ()
+
+    def write(self, text: str = ""):
+        # One line of text for the player
+        pass
+
+    def event(self, kind: str, **data):
+        # A structured notification about a state change
+        pass
+
+    def flush(self):
+        # Delivers everything written since the last flush
+        return None
+
+class TextSink(OutputSink):
+    # Buffers the text lines of a turn. flush() joins them, writes them to the
+    # stream (if any) in one call and returns the text. Events are ignored.
+    __slots__ = ("lines", "stream")
+
+    def __init__(self, stream=None):
+        self.lines = []
+        self.stream = stream
+
+    def write(self, text: str = ""):
+        self.lines.append(text)
+
+    def flush(self) -> str:
+        if not self.lines:
+            return ""
+        if METRICS.enabled and next(METRICS.render_samples):
+            started = perf_counter_ns()
+            text = "".join(line + "\n" for line in self.lines)
+            METRICS.render.record(perf_counter_ns() - started)
+        else:
+            text = "".join(line + "\n" for line in self.lines)
+        self.lines.clear()
+        if self.stream is not None:
+            self.stream.write(text)
+            self.stream.flush()
+        return text
+
+class NullSink(OutputSink):
+    # Drops everything, for benchmarks and simulations
+    __slots__ = ()
+
+    def flush(self) -> str:
+        return ""
+
+class EventSink(OutputSink):
+    # Collects a turn as a list of (kind, data) events. Text lines become
+    # ('text', {'text': ...}) events so the order with the other events is kept.
+    # flush() returns the list and passes it to the consumer, if one is given.
+    __slots__ = ("events", "consumer")
+
+    def __init__(self, consumer=None):
+        self.events = []
+        self.consumer = consumer
+
+    def write(self, text: str = ""):
+        self.events.append(("text", {"text": text}))
+
+    def event(self, kind: str, **data):
+        self.events.append((kind, data))
+
+    def flush(self) -> list:
+        events = self.events
+        self.events = []
+        if events and self.consumer is not None:
+            self.consumer(events)
+        return events
+
+def terminal_sink() -> TextSink:
+    return TextSink(sys.stdout)
@@ -0,0 +1,95 @@
+# persistent.py
+
+# Immutable map from small non-negative ints (location ids) to values, with
+# structural sharing: set() returns a new map that shares every node with the
+# old one except the path to the changed key. It is a hash array mapped trie
+# where the key is its own hash: each level takes 5 bits of the key, and a
+# node stores only the children that exist, with a 32-bit bitmap saying which.
+# get and set visit at most 7 levels for 32-bit keys (one or two in practice),
+# so keeping the map of every turn costs a few small nodes per changed key.
+
+class _Node:
+    __slots__ = ("bitmap", "children") # children: _Node or (key, value) leaves, in bit order
+
+    def __init__(self, bitmap: int, children: tuple):
+        self.bitmap = bitmap
+        self.children = children
+
+def _pair(first: tuple, second: tuple, shift: int) -> _Node:
+    # A node holding two leaves whose keys agree on the bits below shift
+    first_bit = 1 << ((first[0] >> shift) & 31)
+    second_bit = 1 << ((second[0] >> shift) & 31)
+    if first_bit == second_bit:
+        return _Node(first_bit, (_pair(first, second, shift + 5),))
+    if first_bit < second_bit:
+        return _Node(first_bit | second_bit, (first, second))
+    return _Node(first_bit | second_bit, (second, first))
+
+def _set(node: _Node, shift: int, key: int, value) -> tuple:
+    # (new node, True if the key is new)
+    bit = 1 << ((key >> shift) & 31)
+    bitmap = node.bitmap
+    children = node.children
+    index = (bitmap & (bit - 1)).bit_count()
+    if not bitmap & bit:
+        return _Node(bitmap | bit, children[:index] + ((key, value),) + children[index:]), True
+
+    child = children[index]
+    if type(child) is _Node:
+        child, added = _set(child, shift + 5, key, value)
+    elif child[0] == key:
+        child, added = (key, value), False
+    else:
+        child, added = _pair(child, (key, value), shift + 5), True
+    return _Node(bitmap, children[:index] + (child,) + children[index + 1:]), added
+
+class PersistentMap:
+    __slots__ = ("root", "size")
+
+    def __init__(self, root: _Node = None, size: int = 0):
+        self.root = root
+        self.size = size
+
+    def get(self, key: int, default=None):
+        node = self.root
+        shift = 0
+        while node is not None:
+            bit = 1 << ((key >> shift) & 31)
+            bitmap = node.bitmap
+            if not bitmap & bit:
+                return default
+            child = node.children[(bitmap & (bit - 1)).bit_count()]
+            if type(child) is not _Node:
+                return child[1] if child[0] == key else default
+            node = child
+            shift += 5
+        return default
+
+    def set(self, key: int, value) -> "PersistentMap":
+        """A map with key set to value; this map is unchanged."""
+        if self.root is None:
+            return PersistentMap(_Node(1 << (key & 31), ((key, value),)), 1)
+        root, added = _set(self.root, 0, key, value)
+        return PersistentMap(root, self.size + added)
+
+    def items(self):
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            for child in stack.pop().children:
+                if type(child) is _Node:
+                    stack.append(child)
+                else:
+                    yield child
+
+    def __iter__(self):
+        return (key for key, _ in self.items())
+
+    def __contains__(self, key: int) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return self.size
+
+_MISSING = object()
+
+EMPTY_MAP = PersistentMap()
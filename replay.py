@@ -0,0 +1,103 @@
+# replay.py
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from classes import GameSession
+from output import TextSink, NullSink
+from data import WORLD
+from main import display_intro, display_location_info, handle_command
+
+class ReplayResult:
+    # The outcome of one replayed command script
+    __slots__ = ("score", "outcome", "turns", "visited", "output")
+
+    def __init__(self, score: int, outcome: str, turns: int, visited: list, output: str = None):
+        self.score = score
+        self.outcome = outcome # 'victory', 'defeat', 'quit' or 'unfinished'
+        self.turns = turns # Commands handled (empty lines are not turns)
+        self.visited = visited # Location names in the order of the first visit
+        self.output = output # Everything the game printed, if requested
+
+def replay(commands: list, keep_output: bool = False, world=WORLD) -> ReplayResult:
+    """
+    Plays a command script without a terminal, like play_game would with the
+    same input. Stops at the end of the game or of the script.
+    The game output is only collected when keep_output is set.
+    """
+    session = GameSession(world, output=TextSink() if keep_output else NullSink())
+    player = session.player
+
+    display_intro(session)
+    display_location_info(session)
+
+    visited = [player.current_location]
+    seen = set(visited)
+    turns = 0
+    outcome = "unfinished"
+
+    for command in commands:
+        command = command.strip()
+        if not command:
+            continue
+
+        turns += 1
+        running = handle_command(session, command)
+        if player.current_location not in seen:
+            seen.add(player.current_location)
+            visited.append(player.current_location)
+        if not running:
+            outcome = "quit"
+            break
+        if session.outcome is not None:
+            outcome = session.outcome
+            break
+
+    output = session.output.flush() if keep_output else None
+    visited_names = [world.location_names[location] for location in visited]
+    return ReplayResult(player.score, outcome, turns, visited_names, output)
+
+def replay_many(scripts: list, processes: int = None, chunksize: int = 64) -> list:
+    """Replays every script, spread over a pool of worker processes. Keeps the order."""
+    if processes == 1:
+        return [replay(commands) for commands in scripts]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(replay, scripts, chunksize=chunksize))
+
+def load_script(path: str) -> list:
+    with open(path, encoding="utf-8") as script:
+        return script.read().splitlines()
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay command scripts without a terminal.")
+    parser.add_argument("scripts", nargs="*", default=["walkthrough.txt"], help="files with one command per line")
+    parser.add_argument("--count", type=int, default=20_000, help="total number of replays")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="worker processes (1 = no pool)")
+    parser.add_argument("--chunksize", type=int, default=256)
+    parser.add_argument("--show", action="store_true", help="print the output of the first script and exit")
+    args = parser.parse_args()
+
+    scripts = [load_script(path) for path in args.scripts]
+    if args.show:
+        print(replay(scripts[0], keep_output=True).output, end="")
+        return
+
+    batch = [scripts[number % len(scripts)] for number in range(args.count)]
+    started = time.perf_counter()
+    results = replay_many(batch, args.processes, args.chunksize)
+    elapsed = time.perf_counter() - started
+
+    outcomes = {}
+    for result in results:
+        outcomes[result.outcome] = outcomes.get(result.outcome, 0) + 1
+    mean_score = sum(result.score for result in results) / len(results)
+    mean_turns = sum(result.turns for result in results) / len(results)
+
+    print(f"{len(results)} replays on {args.processes} processes in {elapsed:.2f}s "
+          f"({len(results) / elapsed:.0f} replays/s)")
+    print(f"Outcomes: {outcomes}, mean score {mean_score:.1f}, mean turns {mean_turns:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# routes.py
+
+import threading
+from array import array
+from collections import OrderedDict, deque
+
+from world import CompiledWorld, NO_EXIT
+
+# Usages of the items that 'swipe' accepts as key cards
+KEY_CARD_USAGES = ("key_blue", "key_red")
+
+class RouteTables:
+    # Shortest routes between the locations of a world, for the 'travel' command.
+    # Which doors a player can pass depends on the key cards they carry, and
+    # without the suit a route must not lead through a gas hazard room, so the
+    # rows are made per (key set, suit) combination. A key set is a bit mask over
+    # the key cards of the world.
+    #   rows[(key mask, suit, target)] -> array: next location on a shortest
+    #                                     route from each location to target,
+    #                                     NO_EXIT where target is unreachable
+    # A row is one breadth-first search backwards from its target, made the first
+    # time a player travels there and shared by all sessions; following it is
+    # O(route length). A row is as large as the world, so only the most recently
+    # used rows are kept, up to cache_bytes. Steps are the ones 'go' and 'swipe'
+    # take: a direction with a card reader is only passed with the key, and a card
+    # opens the first door of the location that takes it.
+    # Rows can be made in other threads (the server searches in a worker thread
+    # so that the other sessions keep playing); the lock guards the cache, not
+    # the search.
+    def __init__(self, world: CompiledWorld, cache_bytes: int = 64 << 20):
+        self.world = world
+        self.location_ids = {name.lower(): number for number, name in enumerate(world.location_names)}
+        keys = sorted({key for key in world.gate_keys
+                       if key != NO_EXIT and world.items[key].usage in KEY_CARD_USAGES})
+        self.key_bits = {world.items[key]: 1 << bit for bit, key in enumerate(keys)}
+        self.gas = bytes(action == "gas_hazard" for action in world.special_actions)
+        self.predecessors = {} # {key mask: [[locations with a step into location]]}
+        self.rows = OrderedDict() # {(key mask, suit, target): next hops}, least recently used first
+        self.max_rows = max(16, cache_bytes // (4 * world.location_count))
+        self.lock = threading.Lock()
+
+    def key_mask(self, inventory: list) -> int:
+        mask = 0
+        for item in inventory:
+            mask |= self.key_bits.get(item, 0)
+        return mask
+
+    def _key_doors(self, location: int, mask: int):
+        # (key item, target) of the doors at location the keys in mask open
+        world = self.world
+        count = world.location_count
+        opened = set()
+        for direction in range(len(world.directions)):
+            slot = direction * count + location
+            key = world.gate_keys[slot]
+            if key == NO_EXIT or key in opened:
+                continue
+            opened.add(key) # Swipe goes through the first door of a key only
+            item = world.items[key]
+            if mask & self.key_bits.get(item, 0) and world.gate_targets[slot] != NO_EXIT:
+                yield item, world.gate_targets[slot]
+
+    def _predecessors(self, mask: int) -> list:
+        predecessors = self.predecessors.get(mask)
+        if predecessors is not None:
+            return predecessors
+
+        world = self.world
+        count = world.location_count
+        exits = world.exits
+        gate_keys = world.gate_keys
+        predecessors = [[] for _ in range(count)]
+        for direction in range(len(world.directions)):
+            base = direction * count
+            for location in range(count):
+                target = exits[base + location]
+                if target != NO_EXIT and gate_keys[base + location] == NO_EXIT:
+                    predecessors[target].append(location)
+        if mask:
+            for location in range(count):
+                for _, target in self._key_doors(location, mask):
+                    predecessors[target].append(location)
+        self.predecessors[mask] = predecessors
+        return predecessors
+
+    def has_row(self, target: int, mask: int, suit: bool) -> bool:
+        return (mask, suit, target) in self.rows
+
+    def next_hops(self, target: int, mask: int, suit: bool) -> array:
+        key = (mask, suit, target)
+        rows = self.rows
+        with self.lock:
+            hops = rows.get(key)
+            if hops is not None:
+                rows.move_to_end(key)
+                return hops
+
+        predecessors = self._predecessors(mask)
+        gas = self.gas
+        hops = array("i", [NO_EXIT]) * self.world.location_count
+        hops[target] = target
+        queue = deque([target])
+        while queue:
+            location = queue.popleft()
+            if gas[location] and not suit and location != target:
+                continue # A route may start in the gas, but not lead through it
+            for previous in predecessors[location]:
+                if hops[previous] == NO_EXIT:
+                    hops[previous] = location
+                    queue.append(previous)
+
+        with self.lock:
+            rows[key] = hops
+            if len(rows) > self.max_rows:
+                rows.popitem(last=False)
+        return hops
+
+    def route(self, source: int, target: int, mask: int, suit: bool):
+        """Locations after source on a shortest route to target, or None if there is none."""
+        hops = self.next_hops(target, mask, suit)
+        if hops[source] == NO_EXIT:
+            return None
+        route = []
+        location = source
+        while location != target:
+            location = hops[location]
+            route.append(location)
+        return route
+
+    def step(self, location: int, target: int, mask: int) -> tuple:
+        # (verb, noun) of the command that moves from location to the neighbouring target
+        world = self.world
+        count = world.location_count
+        for direction in range(len(world.directions)):
+            slot = direction * count + location
+            if world.exits[slot] == target and world.gate_keys[slot] == NO_EXIT:
+                return "go", world.directions[direction]
+        for item, door_target in self._key_doors(location, mask):
+            if door_target == target:
+                return "swipe", item.name.lower()
+        raise ValueError(f"no step from location {location} to {target}")
+
+def route_tables(world: CompiledWorld) -> RouteTables:
+    """The RouteTables of a world, created on first use."""
+    if world.routes is None:
+        world.routes = RouteTables(world)
+    return world.routes
@@ -0,0 +1,230 @@
+# rules.py
+
+# Declarative game rules. A rule names the event it reacts to, the location
+# where it applies (None for everywhere), conditions on the session, and
+# actions that run in order when all conditions hold.
+#
+# Events fired by the game:
+#   enter           the player arrived in a location (after it was displayed)
+#   look            the player looked around with 'look' or 'explore' (after the location was displayed)
+#   item_acquired   the player took an item (item: the item)
+#   talk            the player talked in a location
+#   upload          the player uploaded an item (item: the item)
+#   use             the player used an item that has no use of its own (item: the item)
+#   server_activated the server was activated (item: the uploaded item)
+# Rules can also fire their own events with the 'trigger' action.
+#
+# Conditions (name, value):
+#   has_item / lacks_item   item name   the player carries / does not carry the item
+#   item            item name   the item of the event is this item
+#   server          bool    the server is / is not activated
+#   suit            bool    the player wears / does not wear the suit
+#   winning_score   bool    the score is / is not at least the max score
+# Actions (name, value):
+#   say             text    a message; {score}, {max_score} and {item} are filled in
+#   add_score       points
+#   give_item       item name   the character of the location hands over the item
+#   consume_item    -       the item of the event leaves the inventory
+#   activate_server -
+#   finish          outcome ('victory' or 'defeat')
+#   trigger         event   fires another event in the same location
+
+from classes import MAX_SCORE, Inventory, Item
+from output import NullSink
+
+class Rule:
+    # A rule as written in the game data, with location and item names
+    __slots__ = ("events", "location", "conditions", "actions")
+
+    def __init__(self, on, location: str = None, conditions: list = (), actions: list = ()):
+        self.events = (on,) if isinstance(on, str) else tuple(on) # One event or several
+        self.location = location
+        self.conditions = conditions
+        self.actions = actions
+
+# Conditions and actions: (session, value, location, item)
+
+def _has_item(session, item, location, event_item) -> bool:
+    return item in session.player.inventory
+
+def _lacks_item(session, item, location, event_item) -> bool:
+    return item not in session.player.inventory
+
+def _item(session, item, location, event_item) -> bool:
+    return event_item is item
+
+def _server(session, value, location, event_item) -> bool:
+    return session.server_activated == value
+
+def _suit(session, value, location, event_item) -> bool:
+    return session.player.has_worn_suit == value
+
+def _winning_score(session, value, location, event_item) -> bool:
+    player = session.player
+    return (player.score >= player.max_score) == value
+
+def _say(session, text, location, event_item):
+    session.output.write(text)
+
+def _say_formatted(session, text, location, event_item):
+    player = session.player
+    session.output.write(text.format(score=player.score, max_score=player.max_score,
+                                     item=event_item.name if event_item is not None else ""))
+
+def _add_score(session, points, location, event_item):
+    session.player.add_score(points)
+
+def _give_item(session, item, location, event_item):
+    session.player.inventory.append(item)
+    session.output.event("item_received", item=item.name, npc=session.world.npcs[location])
+
+def _consume_item(session, value, location, event_item):
+    session.player.inventory.remove(event_item)
+    session.output.event("item_consumed", item=event_item.name)
+
+def _activate_server(session, value, location, event_item):
+    session.server_activated = True
+    session.output.event("server_activated", item=event_item.name, location=session.world.location_names[location])
+    session.world.rules.fire(session, "server_activated", location, event_item)
+
+def _finish(session, outcome, location, event_item):
+    session.outcome = outcome
+    session.output.event("game_finished", outcome=outcome, score=session.player.score)
+
+def _trigger(session, event, location, event_item):
+    session.world.rules.fire(session, event, location, event_item)
+
+# name: (function, kind of value) with the kinds 'item', 'bool', 'text', 'int', 'str' and None
+CONDITIONS = {
+    "has_item": (_has_item, "item"),
+    "lacks_item": (_lacks_item, "item"),
+    "item": (_item, "item"),
+    "server": (_server, "bool"),
+    "suit": (_suit, "bool"),
+    "winning_score": (_winning_score, "bool"),
+}
+
+ACTIONS = {
+    "say": (_say, "text"),
+    "add_score": (_add_score, "int"),
+    "give_item": (_give_item, "item"),
+    "consume_item": (_consume_item, None),
+    "activate_server": (_activate_server, None),
+    "finish": (_finish, "str"),
+    "trigger": (_trigger, "str"),
+}
+
+class RuleEngine:
+    # The rules of a world indexed by (event, location id), with the rules that
+    # apply everywhere under (event, None). Firing an event only looks at the
+    # rules of that event and location, so the cost of a turn does not grow with
+    # the number of rules elsewhere. The conditions of all matching rules are
+    # checked before any of their actions run.
+    __slots__ = ("index",)
+
+    def __init__(self, index: dict):
+        self.index = index # {(event, location id or None): ((conditions, actions), ...)}
+
+    def has_rules(self, event: str, location: int) -> bool:
+        index = self.index
+        return (event, location) in index or (event, None) in index
+
+    def named_items(self) -> set:
+        """The items that conditions and actions name (has_item, give_item, ...)."""
+        return {value for rules in self.index.values() for conditions, actions in rules
+                for _, value in conditions + actions if isinstance(value, Item)}
+
+    def uses_action(self, event: str, name: str) -> bool:
+        """True if a rule of the event, in any location, has the action."""
+        function = ACTIONS[name][0]
+        return any(action is function for (rule_event, _), rules in self.index.items() if rule_event == event
+                   for _, actions in rules for action, _ in actions)
+
+    def fire(self, session, event: str, location: int, item=None) -> bool:
+        """Runs the rules of an event in a location. Returns True if any rule ran."""
+        index = self.index
+        rules = index.get((event, location), ())
+        anywhere = index.get((event, None))
+        if anywhere:
+            rules = rules + anywhere
+        if not rules:
+            return False
+
+        matching = [actions for conditions, actions in rules
+                    if all(condition(session, value, location, item) for condition, value in conditions)]
+        for actions in matching:
+            for action, value in actions:
+                action(session, value, location, item)
+        return bool(matching)
+
+class RuleProbe:
+    # Stands in for a GameSession to find out what the rules of an event do in a
+    # given state, without a game (the solver and the simulator use it). It is
+    # the session and its player at once; messages and events go nowhere.
+    __slots__ = ("world", "player", "output", "inventory", "score", "max_score", "has_worn_suit",
+                 "server_activated", "outcome")
+
+    def __init__(self, world, inventory=(), server_activated: bool = False, has_worn_suit: bool = False):
+        self.world = world
+        self.player = self
+        self.output = NullSink()
+        self.inventory = Inventory(inventory)
+        self.score = 0
+        self.max_score = MAX_SCORE
+        self.has_worn_suit = has_worn_suit
+        self.server_activated = server_activated
+        self.outcome = None
+
+    def add_score(self, points: int):
+        self.score += points
+
+def _resolve(kind: str, value, items_by_name: dict, where: str, errors: list):
+    # Checks the value of a condition or action, and turns item names into Items
+    if kind == "item":
+        if value not in items_by_name:
+            errors.append(f"{where} names unknown item '{value}'")
+        return items_by_name.get(value)
+    if kind == "bool" and not isinstance(value, bool):
+        errors.append(f"{where} needs True or False, not {value!r}")
+    elif kind == "int" and not isinstance(value, int):
+        errors.append(f"{where} needs a number, not {value!r}")
+    elif kind in ("text", "str") and not isinstance(value, str):
+        errors.append(f"{where} needs a text, not {value!r}")
+    return value
+
+def compile_rules(rules: list, location_ids: dict, items_by_name: dict, errors: list) -> RuleEngine:
+    """Builds the rule index of a world. Problems are added to errors."""
+    index = {}
+    for number, rule in enumerate(rules):
+        where = f"rule {number} ({', '.join(rule.events)} in {rule.location or 'any location'})"
+        location = None
+        if rule.location is not None:
+            location = location_ids.get(rule.location)
+            if location is None:
+                errors.append(f"{where} applies to unknown location '{rule.location}'")
+                continue
+
+        conditions = []
+        for name, *value in rule.conditions:
+            if name not in CONDITIONS:
+                errors.append(f"{where} has unknown condition '{name}'")
+                continue
+            function, kind = CONDITIONS[name]
+            conditions.append((function, _resolve(kind, value[0] if value else None, items_by_name,
+                                                  f"{where} condition '{name}'", errors)))
+
+        actions = []
+        for name, *value in rule.actions:
+            if name not in ACTIONS:
+                errors.append(f"{where} has unknown action '{name}'")
+                continue
+            function, kind = ACTIONS[name]
+            value = _resolve(kind, value[0] if value else None, items_by_name, f"{where} action '{name}'", errors)
+            if function is _say and isinstance(value, str) and "{" in value:
+                function = _say_formatted
+            actions.append((function, value))
+
+        compiled = (tuple(conditions), tuple(actions))
+        for event in rule.events:
+            index[(event, location)] = index.get((event, location), ()) + (compiled,)
+    return RuleEngine(index)
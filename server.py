@@ -0,0 +1,358 @@
+# server.py
+
+import argparse
+import asyncio
+import itertools
+import signal
+import time
+
+from classes import GameSession
+from output import TextSink
+from data import WORLD
+from journal import TOKEN_SIZE, Journal, JournalSink, new_resume_token
+from leaderboard import Leaderboard
+from metrics import METRICS
+from worldfile import load_world
+from main import MAX_HISTORY, display_intro, display_location_info, handle_command, parse_command
+from routes import route_tables
+from snapshot import SnapshotError, SnapshotStore, load_session, max_snapshot_size, save_session
+from world import NO_EXIT
+
+# Line protocol: the client sends one command per line, the server answers with
+# the game output followed by the prompt. When the game ends the server sends the
+# final messages and closes the connection.
+# With a journal, a player whose connection (or the server) went down can enter
+# "resume <token>" in a new connection to continue the game. The token is random
+# and only shown to the player of the session; session ids stay internal.
+# A session left without a connection for the idle timeout is parked: its
+# snapshot and token go to a SnapshotStore and the journal closes it, so it no
+# longer takes memory or space in every checkpoint. Resuming it brings it back.
+# Without a store, the idle session is closed for good.
+PROMPT = "> "
+ENCODING = "utf-8"
+
+def open_parking(path: str, world) -> SnapshotStore:
+    # Each slot holds the resume token and then the snapshot
+    return SnapshotStore(path, world, SnapshotStore.LENGTH.size + TOKEN_SIZE + max_snapshot_size(world))
+
+def raise_open_file_limit():
+    # Every session is a socket, so allow as many open files as the system permits
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+class GameServer:
+    # Hosts many independent game sessions in one process.
+    # handle_command only touches the in-memory session and writes to its sink,
+    # so it runs directly in the event loop between socket reads and writes.
+    # With a journal, every turn is journaled and made durable (by group commit)
+    # before the player sees its result, the sessions of the last run are
+    # recovered at start, and sessions whose connection is lost stay resumable.
+    # Finished games go into the leaderboard, labelled with shard and session id.
+    def __init__(self, world=WORLD, journal: Journal = None, leaderboard: Leaderboard = None, shard: int = 0,
+                 parking: SnapshotStore = None, idle_timeout: float = 1800.0, max_history: int = MAX_HISTORY):
+        self.world = world
+        self.journal = journal
+        self.leaderboard = leaderboard if leaderboard is not None else Leaderboard()
+        self.shard = shard
+        self.parking = parking # SnapshotStore (open_parking) of the parked sessions, or None
+        self.idle_timeout = idle_timeout # Seconds without a connection before a journaled session is parked
+        self.max_history = max_history # Turns each player can take back
+        self.sessions = {}
+        if journal is not None:
+            self.sessions.update(journal.recover(JournalSink))
+            journal.sessions = self.sessions
+            for session in self.sessions.values():
+                session.max_history = max_history # The history starts again from the recovered turn
+        # {resume token: session id}; the journal keeps the tokens with the sessions
+        self.resume_ids = {} if journal is None else {token: number for number, token in journal.tokens.items()}
+        parked = []
+        if journal is not None and parking is not None:
+            for session_id in parking.ids():
+                if session_id in self.sessions:
+                    parking.delete(session_id) # Parked, then resumed: the journal has the newer state
+                else:
+                    self.resume_ids[bytes(parking.get(session_id)[:TOKEN_SIZE]).decode("ascii")] = session_id
+                    parked.append(session_id)
+        self.connected = set() # Ids of the sessions that have a connection
+        # {session id: time.monotonic() when it lost its connection} of the journaled sessions without one
+        self.idle = dict.fromkeys(self.sessions, time.monotonic())
+        self.peak_sessions = 0
+        # New ids follow the recovered, parked and skipped ones (the records of
+        # skipped sessions stay until the next segment)
+        skipped = journal.skipped if journal is not None else {}
+        self.session_ids = itertools.count(max(itertools.chain(self.sessions, parked, skipped), default=0) + 1)
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        journal = self.journal
+        session = GameSession(self.world, output=TextSink() if journal is None else JournalSink(),
+                              max_history=self.max_history)
+        session_id = next(self.session_ids)
+        self.sessions[session_id] = session
+        self.connected.add(session_id)
+        METRICS.sessions = len(self.connected)
+        self.peak_sessions = max(self.peak_sessions, len(self.connected))
+        finished = False
+
+        try:
+            display_intro(session)
+            if journal is not None:
+                token = new_resume_token()
+                self.resume_ids[token] = session_id
+                session.output.write(f"If you lose the connection, enter 'resume {token}' to continue this game.")
+            display_location_info(session)
+            if journal is not None:
+                session.output.take_changes() # Part of the opening snapshot
+                journal.log_open(session_id, session, token)
+                await journal.commit()
+
+            running = True
+            while running and session.outcome is None:
+                await self.send(writer, session, PROMPT)
+                data = await reader.readline()
+                if not data:
+                    return
+
+                command = data.decode(ENCODING, "replace").strip()
+                if not command:
+                    continue
+
+                if journal is not None and command.startswith("resume "):
+                    resumed_id = self.resume(session_id, command[len("resume "):].strip())
+                    if resumed_id is None:
+                        session.output.write("❌ There is no game with that token to resume.")
+                        continue
+                    session_id = resumed_id
+                    session = self.sessions[session_id]
+                    session.output.flush()
+                    display_location_info(session)
+                    await self.record(session_id, session, command)
+                    continue
+
+                parsed = parse_command(command)
+                if parsed.verb == "travel" and parsed.noun:
+                    await self.prepare_travel(session, parsed.noun)
+                running = handle_command(session, command)
+                await self.record(session_id, session, command)
+
+            finished = True
+            self.leaderboard.add_session(session, f"{self.shard}/{session_id}")
+            session.output.write("\nGame over. Thank you for playing!")
+            await self.send(writer, session)
+        except (ConnectionError, ValueError):
+            # ValueError: the client sent a line longer than the stream limit
+            pass
+        finally:
+            self.connected.discard(session_id)
+            METRICS.sessions = len(self.connected)
+            if journal is None or finished:
+                del self.sessions[session_id]
+                if journal is not None:
+                    self.resume_ids.pop(journal.tokens.get(session_id), None)
+                    journal.log_close(session_id)
+            else:
+                self.idle[session_id] = time.monotonic()
+            writer.close()
+
+    def resume(self, session_id: int, token: str):
+        """Moves a connection from its new session to a recovered or abandoned one. Returns its id or None."""
+        resumed_id = self.resume_ids.get(token)
+        if resumed_id is None or resumed_id in self.connected:
+            return None
+        if resumed_id not in self.sessions and not self.unpark(resumed_id, token):
+            return None
+        del self.sessions[session_id]
+        self.connected.discard(session_id)
+        self.resume_ids.pop(self.journal.tokens.get(session_id), None)
+        self.journal.log_close(session_id)
+        self.connected.add(resumed_id)
+        self.idle.pop(resumed_id, None)
+        return resumed_id
+
+    def park_idle(self, before: float):
+        """Parks (or without a store, closes) the sessions that lost their connection before a time.monotonic()."""
+        journal = self.journal
+        for session_id, since in list(self.idle.items()):
+            if since > before:
+                continue
+            del self.idle[session_id]
+            session = self.sessions.pop(session_id)
+            token = journal.tokens.get(session_id)
+            if self.parking is not None and token is not None:
+                self.parking.put(session_id, token.encode("ascii") + save_session(session))
+            else:
+                self.resume_ids.pop(token, None)
+            journal.log_close(session_id)
+        if self.parking is not None:
+            self.parking.flush()
+
+    def unpark(self, session_id: int, token: str) -> bool:
+        # Brings a parked session back into the journal; False if it is not there (anymore)
+        data = self.parking.get(session_id) if self.parking is not None else None
+        session = None
+        if data is not None and bytes(data[:TOKEN_SIZE]).decode("ascii") == token:
+            try:
+                session = load_session(bytes(data[TOKEN_SIZE:]), self.world, JournalSink())
+            except SnapshotError:
+                pass # Parked for another world
+        if session is None:
+            self.resume_ids.pop(token, None)
+            return False
+        session.max_history = self.max_history
+        self.sessions[session_id] = session
+        self.journal.log_open(session_id, session, token)
+        self.parking.delete(session_id)
+        return True
+
+    async def prepare_travel(self, session: GameSession, noun: str):
+        # A route to a location no one travelled to lately takes a search over the
+        # whole world (a fraction of a second in a big one). It runs in a worker
+        # thread, so the other sessions keep playing, and the travel command
+        # then finds the route ready.
+        routes = route_tables(self.world)
+        target = routes.location_ids.get(noun)
+        if target is None:
+            return
+        player = session.player
+        mask = routes.key_mask(player.inventory)
+        if not routes.has_row(target, mask, player.has_worn_suit):
+            hops = await asyncio.to_thread(routes.next_hops, target, mask, player.has_worn_suit)
+            if hops[player.current_location] == NO_EXIT and not player.has_worn_suit:
+                # No route without the suit: travel checks for one with it to say so
+                await asyncio.to_thread(routes.next_hops, target, mask, True)
+
+    async def record(self, session_id: int, session: GameSession, command: str):
+        # Journals a turn and waits until it is on disk, so the player never sees a result that could be lost
+        if self.journal is not None:
+            changes = session.output.take_changes()
+            if any(kind == "state_restored" for kind, _ in changes):
+                # Undo and rewind jump back to an earlier state, so the new state is journaled whole
+                self.journal.log_open(session_id, session)
+            else:
+                self.journal.log_turn(session_id, command, changes)
+            await self.journal.commit()
+
+    async def send(self, writer: asyncio.StreamWriter, session: GameSession, prompt: str = ""):
+        # Sends everything the session printed since the last reply in one write
+        text = session.output.flush() + prompt
+        writer.write(text.encode(ENCODING))
+        await writer.drain()
+
+    async def handle_metrics(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # A minimal HTTP endpoint for Prometheus: every request gets the metrics text
+        try:
+            while (await reader.readline()).strip(): # Request line and headers
+                pass
+            body = METRICS.prometheus_text().encode(ENCODING)
+            writer.write(b"HTTP/1.0 200 OK\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                         b"Content-Length: %d\r\n\r\n%s" % (len(body), body))
+            await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def save_leaderboard(self, path: str, interval: float):
+        # Other processes merge the file, so it is kept current while the server runs
+        while True:
+            await asyncio.sleep(interval)
+            self.leaderboard.save(path)
+
+    async def park_idle_sessions(self):
+        while True:
+            await asyncio.sleep(self.idle_timeout / 2)
+            self.park_idle(time.monotonic() - self.idle_timeout)
+            await self.journal.commit()
+
+    async def serve(self, host: str, port: int, backlog: int = 4096, metrics_port: int = None,
+                    leaderboard_path: str = None, save_interval: float = 10.0):
+        server = await asyncio.start_server(self.handle_client, host, port, backlog=backlog)
+        addresses = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+        print(f"Project Omega server listening on {addresses}")
+        saver = None
+        parker = None
+        metrics_server = None
+        if self.journal is not None:
+            parker = asyncio.create_task(self.park_idle_sessions())
+        if leaderboard_path is not None:
+            saver = asyncio.create_task(self.save_leaderboard(leaderboard_path, save_interval))
+        if metrics_port is not None:
+            # Only on the loopback interface: the metrics are for a local agent to scrape
+            metrics_server = await asyncio.start_server(self.handle_metrics, "127.0.0.1", metrics_port)
+            print(f"Metrics on http://127.0.0.1:{metrics_port}/metrics")
+        loop = asyncio.get_running_loop()
+        stop = loop.create_future()
+        handled = []
+        for number in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(number, lambda: stop.done() or stop.set_result(None))
+            except (NotImplementedError, RuntimeError):
+                continue # Not available on Windows, where Ctrl+C still raises KeyboardInterrupt
+            handled.append(number)
+        try:
+            async with server:
+                serving = asyncio.create_task(server.serve_forever())
+                await asyncio.wait((serving, stop), return_when=asyncio.FIRST_COMPLETED)
+                serving.cancel()
+                await asyncio.gather(serving, return_exceptions=True)
+        finally:
+            for number in handled:
+                loop.remove_signal_handler(number)
+            # The caller saves the leaderboard a last time once the loop is done
+            for task in (saver, parker):
+                if task is not None:
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+            if metrics_server is not None:
+                metrics_server.close()
+                await metrics_server.wait_closed()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Project Omega as a multi-session TCP server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--backlog", type=int, default=4096)
+    parser.add_argument("--journal", metavar="DIRECTORY", help="journal the sessions to recover them after a crash")
+    parser.add_argument("--shard", type=int, default=0, help="journal shard number of this server process")
+    parser.add_argument("--park", metavar="FILE", help="park journaled sessions left idle in this snapshot store")
+    parser.add_argument("--idle-timeout", type=float, default=1800.0,
+                        help="seconds a journaled session stays without a connection before it is parked or closed")
+    parser.add_argument("--world", metavar="FILE", help="world file to play instead of the built-in world")
+    parser.add_argument("--leaderboard", metavar="FILE", help="keep the results of finished games in this file")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this local port")
+    parser.add_argument("--no-metrics", action="store_true", help="do not record metrics")
+    parser.add_argument("--max-history", type=int, default=MAX_HISTORY,
+                        help="turns each player can take back with undo and rewind (0 turns it off)")
+    args = parser.parse_args()
+
+    raise_open_file_limit()
+    METRICS.enabled = not args.no_metrics
+    world = load_world(args.world) if args.world else WORLD
+    journal = Journal(args.journal, args.shard, world) if args.journal else None
+    leaderboard = Leaderboard.load(args.leaderboard) if args.leaderboard else None
+    parking = open_parking(args.park, world) if args.park and journal is not None else None
+    game_server = GameServer(world, journal, leaderboard, args.shard, parking, args.idle_timeout, args.max_history)
+    if game_server.sessions:
+        print(f"Recovered {len(game_server.sessions)} sessions from the journal")
+    if journal is not None:
+        for session_id, reason in sorted(journal.skipped.items()):
+            print(f"Session {session_id} could not be recovered from the journal: {reason}")
+    try:
+        asyncio.run(game_server.serve(args.host, args.port, args.backlog, args.metrics_port, args.leaderboard))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if journal is not None:
+            journal.close()
+        if parking is not None:
+            parking.close()
+        if args.leaderboard:
+            game_server.leaderboard.save(args.leaderboard)
+    print(f"\nServer stopped. Peak concurrent sessions: {game_server.peak_sessions}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+# simulate.py
+# Monte Carlo simulation of many random players at once, to tune the scoring.
+# Needs NumPy (pip install numpy); the game itself does not.
+
+import argparse
+import time
+
+import numpy as np
+
+from classes import MAX_SCORE
+from data import WORLD
+from main import MOVE_POINTS, SWIPE_POINTS, WEAR_POINTS, take_points
+from rules import RuleProbe
+from world import NO_EXIT
+
+# Actions a simulated player can pick each turn
+ACTIONS = ("go", "take", "swipe", "upload", "wear", "talk")
+
+class Scoring:
+    # Points to try instead of the game's. None (the default) keeps the game's
+    # value: main.py's points for moving, swiping and wearing, MAX_SCORE, and
+    # the points the world's rules give where they give any (the gas, the
+    # upload, talking and the escape)
+    __slots__ = ("move", "swipe", "gas", "upload", "wear", "talk", "escape", "max_score")
+
+    def __init__(self, move: int = None, swipe: int = None, gas: int = None, upload: int = None, wear: int = None,
+                 talk: int = None, escape: int = None, max_score: int = None):
+        self.move = move # Every step through an open exit
+        self.swipe = swipe # Passing a locked door with a key card
+        self.gas = gas # Entering a location without the suit, where that costs points
+        self.upload = upload # Uploading at a server terminal
+        self.wear = wear # Putting on the suit
+        self.talk = talk # Receiving an item from a character
+        self.escape = escape # Ending the game at an exit
+        self.max_score = max_score # Score needed to win at the exit
+
+class SimulationResult:
+    # Per-agent outcome arrays of one simulation run
+    __slots__ = ("won", "finished", "score", "turns", "agent_steps", "elapsed")
+
+    def __init__(self, won, finished, score, turns, agent_steps: int, elapsed: float):
+        self.won = won
+        self.finished = finished # Reached the exit with the Antidote and the server on (won or lost)
+        self.score = score
+        self.turns = turns
+        self.agent_steps = agent_steps
+        self.elapsed = elapsed
+
+    def summary(self) -> str:
+        agents = len(self.score)
+        lines = [
+            f"{agents} agents: {self.won.mean():.1%} won, {(self.finished & ~self.won).mean():.1%} lost at the exit, "
+            f"{(~self.finished).mean():.1%} unfinished",
+            "Final score  p5/p25/p50/p75/p95: " + "/".join(
+                f"{value:.0f}" for value in np.percentile(self.score, [5, 25, 50, 75, 95])),
+        ]
+        if self.finished.any():
+            finished_turns = self.turns[self.finished]
+            lines.append("Turns to end p5/p25/p50/p75/p95: " + "/".join(
+                f"{value:.0f}" for value in np.percentile(finished_turns, [5, 25, 50, 75, 95])))
+        if self.won.any():
+            lines.append(f"Winning score mean: {self.score[self.won].mean():.1f}")
+        lines.append(f"{self.agent_steps} agent-steps in {self.elapsed:.2f}s "
+                     f"({self.agent_steps / max(self.elapsed, 1e-9) / 1e6:.2f}M agent-steps/s)")
+        return "\n".join(lines)
+
+class Simulator:
+    # Keeps N agents as NumPy arrays (location, score, item bitmasks, suit and
+    # server flags) and steps them all together with the game's movement,
+    # key card, gas hazard and win rules, taken from the compiled world: what
+    # entering, uploading and talking do in each location comes from running
+    # its rules on a RuleProbe.
+    # Simulated players never drop items, so the items a player has taken are
+    # simply gone from their start location for that player.
+    def __init__(self, world=WORLD, scoring: Scoring = None):
+        if len(world.items) > 63:
+            raise ValueError("The simulator keeps items in a 64-bit mask: at most 63 items are supported.")
+        scoring = scoring if scoring is not None else Scoring()
+        count = world.location_count
+        directions = len(world.directions)
+        rules = world.rules
+        items = world.items
+
+        def game(value, default):
+            return default if value is None else value
+
+        self.move = game(scoring.move, MOVE_POINTS)
+        self.swipe = game(scoring.swipe, SWIPE_POINTS)
+        self.wear = game(scoring.wear, WEAR_POINTS)
+        self.max_score = game(scoring.max_score, MAX_SCORE)
+
+        self.exits = np.array(world.exits, dtype=np.int64).reshape(directions, count)
+        self.gate_keys = np.array(world.gate_keys, dtype=np.int64).reshape(directions, count)
+        self.gate_targets = np.array(world.gate_targets, dtype=np.int64).reshape(directions, count)
+
+        # Open exits of every location, padded with NO_EXIT, for picking a random one
+        open_exits = [[target for _, target in world.location_exits(location)] for location in range(count)]
+        width = max(1, max(len(targets) for targets in open_exits))
+        self.exit_targets = np.full((count, width), NO_EXIT, dtype=np.int64)
+        for location, targets in enumerate(open_exits):
+            self.exit_targets[location, :len(targets)] = targets
+        self.exit_counts = np.array([len(targets) for targets in open_exits], dtype=np.int64)
+
+        def mask(selected) -> np.uint64:
+            bits = 0
+            for item in selected:
+                bits |= 1 << world.item_ids[item]
+            return np.uint64(bits)
+
+        def probe(event: str, location: int, inventory=(), server: bool = False, suit: bool = False, item=None):
+            # A probe after the rules of the event ran
+            result = RuleProbe(world, inventory, server, suit)
+            rules.fire(result, event, location, item)
+            return result
+
+        self.start_items = np.array([mask(location_items) for location_items in world.start_items],
+                                    dtype=np.uint64)
+        self.item_points = np.array([take_points(item) for item in items], dtype=np.int64)
+        self.upload_items = mask(item for item in items if item.usage == "upload")
+        self.wear_items = mask(item for item in items if item.usage == "wear")
+        upload_item = next((item for item in items if item.usage == "upload"), None)
+
+        # Per location: points of entering without the suit (the gas), of uploading
+        # (terminals), the item handed over by talking and its points, and the
+        # locations where entering ends the game, with what that needs
+        self.gas = np.zeros(count, dtype=np.int64)
+        self.terminal = np.zeros(count, dtype=bool)
+        self.upload = np.zeros(count, dtype=np.int64)
+        self.gifts = np.full(count, NO_EXIT, dtype=np.int64)
+        self.talk = np.zeros(count, dtype=np.int64)
+        self.escape = np.zeros(count, dtype=bool)
+        self.escape_points = np.zeros(count, dtype=np.int64)
+        self.escape_server = np.zeros(count, dtype=bool)
+        self.escape_items = np.zeros(count, dtype=np.uint64)
+        for location in range(count):
+            if rules.has_rules("enter", location):
+                self.gas[location] = probe("enter", location).score - probe("enter", location, suit=True).score
+                finished = probe("enter", location, items, True, True)
+                if finished.outcome is not None:
+                    self.escape[location] = True
+                    self.escape_points[location] = finished.score
+                    self.escape_server[location] = probe("enter", location, items, False, True).outcome is None
+                    self.escape_items[location] = mask(
+                        item for item in items
+                        if probe("enter", location, (other for other in items if other is not item), True,
+                                 True).outcome is None)
+            if upload_item is not None and rules.has_rules("upload", location):
+                uploaded = probe("upload", location, (upload_item,), item=upload_item)
+                if uploaded.server_activated:
+                    self.terminal[location] = True
+                    self.upload[location] = uploaded.score
+            if rules.has_rules("talk", location):
+                talked = probe("talk", location)
+                if talked.inventory:
+                    self.gifts[location] = world.item_ids[next(iter(talked.inventory))]
+                    self.talk[location] = talked.score
+
+        # Other values to try replace the game's where the rules give points
+        for value, points in ((scoring.gas, self.gas), (scoring.upload, self.upload), (scoring.talk, self.talk),
+                              (scoring.escape, self.escape_points)):
+            if value is not None:
+                points[points != 0] = value
+        self.start_location = world.start_location
+
+    def run(self, agents: int, max_turns: int = 500, weights: dict = None, seed: int = None) -> SimulationResult:
+        """Simulates agents players for up to max_turns turns each."""
+        rng = np.random.default_rng(seed)
+        weights = weights or {}
+        probabilities = np.array([weights.get(action, 1.0) for action in ACTIONS], dtype=np.float64)
+        probabilities /= probabilities.sum()
+        one = np.uint64(1)
+
+        location = np.full(agents, self.start_location, dtype=np.int64)
+        score = np.zeros(agents, dtype=np.int64)
+        carried = np.zeros(agents, dtype=np.uint64)
+        taken = np.zeros(agents, dtype=np.uint64) # Items gone from their start location
+        suit = np.zeros(agents, dtype=bool)
+        server = np.zeros(agents, dtype=bool)
+        finished = np.zeros(agents, dtype=bool)
+        won = np.zeros(agents, dtype=bool)
+        turns = np.zeros(agents, dtype=np.int64)
+        agent_steps = 0
+
+        started = time.perf_counter()
+        for _ in range(max_turns):
+            active = ~finished
+            active_count = int(active.sum())
+            if not active_count:
+                break
+            agent_steps += active_count
+            turns += active
+
+            action = rng.choice(len(ACTIONS), size=agents, p=probabilities)
+            moved = np.zeros(agents, dtype=bool)
+
+            # go: a random open exit of the current location
+            going = active & (action == 0) & (self.exit_counts[location] > 0)
+            pick = (rng.random(agents) * self.exit_counts[location]).astype(np.int64)
+            target = self.exit_targets[location, np.minimum(pick, self.exit_targets.shape[1] - 1)]
+            location = np.where(going, target, location)
+            score += np.where(going, self.move, 0)
+            moved |= going
+
+            # take: the first item still lying in the location
+            available = self.start_items[location] & ~taken
+            first = available & (~available + one)
+            taking = active & (action == 1) & (first != 0)
+            item = np.log2(np.where(taking, first, one).astype(np.float64)).astype(np.int64)
+            taken |= np.where(taking, first, 0).astype(np.uint64)
+            carried |= np.where(taking, first, 0).astype(np.uint64)
+            score += np.where(taking, self.item_points[item], 0)
+
+            # swipe: the first locked door here that a carried key card opens
+            swiping = active & (action == 2)
+            opened = np.full(agents, NO_EXIT, dtype=np.int64)
+            for direction in range(self.gate_keys.shape[0]):
+                key = self.gate_keys[direction, location]
+                gate_target = self.gate_targets[direction, location]
+                has_key = (key >= 0) & (((carried >> np.maximum(key, 0).astype(np.uint64)) & one) == one)
+                opens = swiping & (opened == NO_EXIT) & has_key & (gate_target != NO_EXIT)
+                opened = np.where(opens, gate_target, opened)
+            swiped = opened != NO_EXIT
+            location = np.where(swiped, opened, location)
+            score += np.where(swiped, self.swipe, 0)
+            moved |= swiped
+
+            # upload: a flash drive at a server terminal
+            drive = carried & self.upload_items
+            uploading = active & (action == 3) & self.terminal[location] & (drive != 0)
+            server |= uploading
+            carried &= ~np.where(uploading, drive & (~drive + one), 0).astype(np.uint64)
+            score += np.where(uploading, self.upload[location], 0)
+
+            # wear: the suit, once
+            worn = carried & self.wear_items
+            wearing = active & (action == 4) & (worn != 0) & ~suit
+            suit |= wearing
+            carried &= ~np.where(wearing, worn & (~worn + one), 0).astype(np.uint64)
+            score += np.where(wearing, self.wear, 0)
+
+            # talk: a character hands over an item if the player does not carry it
+            gift = self.gifts[location]
+            gift_bit = np.where(gift >= 0, one << np.maximum(gift, 0).astype(np.uint64), 0).astype(np.uint64)
+            talking = active & (action == 5) & (gift >= 0) & ((carried & gift_bit) == 0)
+            carried |= np.where(talking, gift_bit, 0).astype(np.uint64)
+            score += np.where(talking, self.talk[location], 0)
+
+            # Entering a gas hazard without the suit costs points
+            score += np.where(moved & ~suit, self.gas[location], 0)
+
+            # Win check, as the game rules do when the player enters an exit or takes an item there
+            needed = self.escape_items[location]
+            escaping = (active & (moved | taking) & self.escape[location] & (server | ~self.escape_server[location])
+                        & ((carried & needed) == needed))
+            score += np.where(escaping, self.escape_points[location], 0)
+            finished |= escaping
+            won |= escaping & (score >= self.max_score)
+
+        elapsed = time.perf_counter() - started
+        return SimulationResult(won, finished, score, turns, agent_steps, elapsed)
+
+def parse_weights(text: str) -> dict:
+    # "go=6,take=2" -> {'go': 6.0, 'take': 2.0}
+    weights = {}
+    for part in filter(None, text.split(",")):
+        action, _, value = part.partition("=")
+        if action not in ACTIONS:
+            raise argparse.ArgumentTypeError(f"unknown action '{action}', expected one of {', '.join(ACTIONS)}")
+        try:
+            weights[action] = float(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"the weight of '{action}' is not a number: '{value}'") from None
+    return weights
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate many random players to tune the scoring.")
+    parser.add_argument("--agents", type=int, default=100_000)
+    parser.add_argument("--turns", type=int, default=500, help="maximum turns per player")
+    parser.add_argument("--weights", type=parse_weights, default={}, help="action weights, e.g. go=6,take=2,swipe=2")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--move", type=int, help="points per move (default: the game's)")
+    parser.add_argument("--gas", type=int, help="points for entering gas without the suit (default: the game's)")
+    parser.add_argument("--escape", type=int, help="points for reaching the exit (default: the game's)")
+    args = parser.parse_args()
+
+    simulator = Simulator(scoring=Scoring(move=args.move, gas=args.gas, escape=args.escape))
+    result = simulator.run(args.agents, args.turns, args.weights, args.seed)
+    print(result.summary())
+
+if __name__ == "__main__":
+    main()
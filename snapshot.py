@@ -0,0 +1,185 @@
+# snapshot.py
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from classes import GameSession
+
+# Binary snapshot of a session (little-endian):
+#   header   magic 'PO', version u8, flags u8 (1 = server activated, 2 = suit worn),
+#            world checksum u32, location u32, score i32, turns u32,
+#            inventory count u16, override count u16
+#   inventory item ids u16, in pick-up order
+#   overrides: location u32, item count u16, item ids u16 (the session's item list there)
+# The max score is a game constant and is not stored.
+MAGIC = b"PO"
+VERSION = 2
+HEADER = struct.Struct("<2sBBIIiIHH")
+OVERRIDE = struct.Struct("<IH")
+SERVER_FLAG = 1
+SUIT_FLAG = 2
+
+class SnapshotError(ValueError):
+    # The snapshot is damaged, from another format version or from another world
+    pass
+
+def max_snapshot_size(world) -> int:
+    # Every item is listed once at most, and only locations that hold items now or
+    # held some at the start (at most two per item) are saved as overrides
+    items = len(world.items)
+    return HEADER.size + 2 * items + 2 * items * (OVERRIDE.size + 2)
+
+def save_session(session: GameSession) -> bytes:
+    """Serializes the player and the world delta of a session."""
+    world = session.world
+    player = session.player
+    item_ids = world.item_ids
+    flags = (SERVER_FLAG if session.server_activated else 0) | (SUIT_FLAG if player.has_worn_suit else 0)
+
+    inventory = array("H", [item_ids[item] for item in player.inventory])
+    # Locations whose items are back to the start state need no override
+    overrides = [(location, items) for location, items in session.item_overrides.items()
+                 if tuple(items) != world.start_items[location]]
+
+    parts = [HEADER.pack(MAGIC, VERSION, flags, world.checksum, player.current_location, player.score,
+                         session.turns, len(inventory), len(overrides)), _to_bytes(inventory)]
+    for location, items in overrides:
+        parts.append(OVERRIDE.pack(location, len(items)))
+        if items:
+            parts.append(_to_bytes(array("H", [item_ids[item] for item in items])))
+    return b"".join(parts)
+
+def _to_bytes(item_ids: array) -> bytes:
+    # Item ids are stored little-endian
+    if sys.byteorder == "big":
+        item_ids.byteswap()
+    return item_ids.tobytes()
+
+def load_session(data: bytes, world, output=None) -> GameSession:
+    """Rebuilds a session from save_session() bytes. Raises SnapshotError if they do not fit."""
+    try:
+        magic, version, flags, saved_checksum, location, score, turns, inventory_count, override_count = \
+            HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise SnapshotError("Not a session snapshot.")
+        if version != VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {version}.")
+        if saved_checksum != world.checksum:
+            raise SnapshotError("The snapshot was saved for a different world.")
+
+        if location >= world.location_count:
+            raise SnapshotError(f"Damaged snapshot: unknown location {location}.")
+
+        items = world.items
+        session = GameSession(world, location, output)
+        player = session.player
+        player.score = score
+        session.turns = turns
+        player.has_worn_suit = bool(flags & SUIT_FLAG)
+        session.server_activated = bool(flags & SERVER_FLAG)
+
+        offset = HEADER.size
+        for item_id in struct.unpack_from(f"<{inventory_count}H", data, offset):
+            player.inventory.append(items[item_id])
+        offset += 2 * inventory_count
+
+        for _ in range(override_count):
+            location, count = OVERRIDE.unpack_from(data, offset)
+            offset += OVERRIDE.size
+            if location >= world.location_count:
+                raise SnapshotError(f"Damaged snapshot: unknown location {location}.")
+            session.set_items(location, tuple(items[item_id]
+                                              for item_id in struct.unpack_from(f"<{count}H", data, offset)))
+            offset += 2 * count
+    except (struct.error, IndexError) as error:
+        raise SnapshotError(f"Damaged snapshot: {error}") from None
+    return session
+
+class SnapshotStore:
+    # Memory-mapped file of parked sessions. Session ids are numbers and every id
+    # owns a fixed-size slot at id * slot_size, so a lookup is one offset
+    # computation. A slot holds a u16 length (0 = empty) and the snapshot.
+    # The file grows (sparse where the OS supports it) as higher ids are stored.
+    LENGTH = struct.Struct("<H")
+
+    def __init__(self, path: str, world, slot_size: int = None):
+        self.world = world
+        self.slot_size = slot_size or self.LENGTH.size + max_snapshot_size(world)
+        self.file = open(path, "a+b")
+        self.size = os.fstat(self.file.fileno()).st_size
+        if self.size % self.slot_size:
+            raise SnapshotError(f"{path} does not hold slots of {self.slot_size} bytes.")
+        self.map = mmap.mmap(self.file.fileno(), self.size) if self.size else None
+
+    def _grow(self, needed: int):
+        size = max(needed, self.size * 2, 1 << 20)
+        size -= size % self.slot_size
+        size = max(size, needed)
+        if self.map is not None:
+            self.map.close()
+        self.file.truncate(size)
+        self.size = size
+        self.map = mmap.mmap(self.file.fileno(), size)
+
+    def _offset(self, session_id: int) -> int:
+        if session_id < 0:
+            raise ValueError(f"Session ids are not negative: {session_id}.")
+        return session_id * self.slot_size
+
+    def put(self, session_id: int, data: bytes):
+        if len(data) > self.slot_size - self.LENGTH.size:
+            raise SnapshotError(f"Snapshot of {len(data)} bytes does not fit a {self.slot_size}-byte slot.")
+        offset = self._offset(session_id)
+        if offset + self.slot_size > self.size:
+            self._grow(offset + self.slot_size)
+        self.map[offset + self.LENGTH.size:offset + self.LENGTH.size + len(data)] = data
+        self.LENGTH.pack_into(self.map, offset, len(data))
+
+    def get(self, session_id: int):
+        """Returns the snapshot bytes of a session, or None if there is none."""
+        offset = self._offset(session_id)
+        if offset + self.slot_size > self.size:
+            return None
+        length, = self.LENGTH.unpack_from(self.map, offset)
+        if not length:
+            return None
+        start = offset + self.LENGTH.size
+        return self.map[start:start + length]
+
+    def delete(self, session_id: int):
+        offset = self._offset(session_id)
+        if offset + self.slot_size <= self.size:
+            self.LENGTH.pack_into(self.map, offset, 0)
+
+    def ids(self):
+        """The ids of the sessions that have a snapshot, in order (reads every slot)."""
+        for offset in range(0, self.size, self.slot_size):
+            if self.LENGTH.unpack_from(self.map, offset)[0]:
+                yield offset // self.slot_size
+
+    def __contains__(self, session_id: int) -> bool:
+        return self.get(session_id) is not None
+
+    def save(self, session_id: int, session: GameSession):
+        self.put(session_id, save_session(session))
+
+    def load(self, session_id: int, output=None):
+        """Returns the parked session, or None if the id has no snapshot."""
+        data = self.get(session_id)
+        if data is None:
+            return None
+        return load_session(data, self.world, output)
+
+    def flush(self):
+        if self.map is not None:
+            self.map.flush()
+
+    def close(self):
+        if self.map is not None:
+            self.map.flush()
+            self.map.close()
+            self.map = None
+        self.file.close()
@@ -0,0 +1,464 @@
+# solver.py
+
+import argparse
+import time
+
+from classes import MAX_SCORE
+from data import WORLD
+from main import MOVE_POINTS, SWIPE_POINTS, WEAR_POINTS, item_reading, item_use, take_points
+from routes import KEY_CARD_USAGES
+from rules import RuleProbe
+from world import NO_EXIT
+
+# Dropping an item is only tried together with taking it back right away
+# ("drop x" + "take x" scores the item again): an item left behind somewhere
+# never helps to win, and leaving items around would multiply the number of
+# states by every place they could be left in.
+
+class StateCodec:
+    # Packs the part of a game that the rules depend on into one int:
+    #   location index | item slots | server flag | suit flag
+    # Each item that does more than give points when taken (a key, the suit, an
+    # item a rule names...) gets a slot of ITEM_BITS: a location index,
+    # IN_INVENTORY or NOWHERE (not in the game yet, like the card the guard
+    # holds, or used up). Items that only give points have no slot, the solver
+    # keeps them next to the score; so do the score itself.
+    def __init__(self, world, items: list):
+        self.world = world # CompiledWorld
+        self.items = items # Item ids with a slot, in slot order
+        self.slot_numbers = {item: number for number, item in enumerate(items)}
+
+        self.IN_INVENTORY = world.location_count
+        self.NOWHERE = self.IN_INVENTORY + 1
+        self.LOCATION_BITS = max(1, (world.location_count - 1).bit_length())
+        self.LOCATION_MASK = (1 << self.LOCATION_BITS) - 1
+        self.ITEM_BITS = self.NOWHERE.bit_length()
+        self.ITEM_MASK = (1 << self.ITEM_BITS) - 1
+        self.ITEMS_SHIFT = self.LOCATION_BITS
+        self.SERVER_SHIFT = self.ITEMS_SHIFT + self.ITEM_BITS * len(items)
+        self.SUIT_SHIFT = self.SERVER_SHIFT + 1
+
+        # Where every slotted item starts (before anyone moved it)
+        self.home = [self.NOWHERE] * len(items)
+        for location, location_items in enumerate(world.start_items):
+            for item in location_items:
+                number = self.slot_numbers.get(world.item_ids[item])
+                if number is not None:
+                    self.home[number] = location
+
+    def unpack(self, state: int) -> tuple:
+        # (location, slots, server activated, suit worn)
+        shift = self.ITEMS_SHIFT
+        bits = self.ITEM_BITS
+        mask = self.ITEM_MASK
+        slots = [(state >> (shift + number * bits)) & mask for number in range(len(self.items))]
+        return (state & self.LOCATION_MASK, slots, bool(state >> self.SERVER_SHIFT & 1),
+                bool(state >> self.SUIT_SHIFT & 1))
+
+    def pack(self, location_id: int, slots: list, server_activated: bool, has_worn_suit: bool) -> int:
+        state = location_id
+        for number, slot in enumerate(slots):
+            state |= slot << (self.ITEMS_SHIFT + number * self.ITEM_BITS)
+        return state | int(server_activated) << self.SERVER_SHIFT | int(has_worn_suit) << self.SUIT_SHIFT
+
+    def start(self) -> int:
+        return self.pack(self.world.start_location, self.home, False, False)
+
+class Solution:
+    # The result of a search: the shortest winning command list (None if there is none)
+    __slots__ = ("commands", "score", "states_explored", "states_memoized")
+
+    def __init__(self, commands: list, score: int, states_explored: int, states_memoized: int):
+        self.commands = commands
+        self.score = score
+        self.states_explored = states_explored
+        self.states_memoized = states_memoized
+
+class Solver:
+    # Dijkstra search (in number of commands) over packed game states for the
+    # fewest commands that win the game, and among those the highest score.
+    # The transitions of a state are worked out from the compiled world: the exit
+    # and door tables give the moves, the points of the commands come from
+    # main.py, and the game rules of the event (entering, taking, talking,
+    # uploading) run on a RuleProbe in the state. They are memoized per state.
+    #
+    # Commands that leave the state as it is and only give points (loops: using
+    # or reading an item, dropping and taking one again) are not searched. A
+    # search node is the state with the points of the best one and two command
+    # loops met on the way there; a win short of points repeats them where they
+    # were met, as few times as it takes. Nodes are expanded in order of moves,
+    # with the best score reached. A node reached again cannot lead to a shorter
+    # or better win, and is pruned, if an earlier expansion of it gets at least
+    # the same score in the same moves by repeating its loops. A bucket yields
+    # wins of different lengths, so wins are ranked by (total commands, -score),
+    # and the search stops once no remaining bucket can yield a win as short as
+    # the best one.
+    #
+    # Items that only give points when taken (bonus items) are not part of the
+    # state, or the number of states would double with each of them: the bonus
+    # items a path has taken (a bit mask) and the best one to drop and take again
+    # travel with its score. Of two paths to a state, the one with the higher
+    # score is kept, even if the other one could still take a bonus item the
+    # kept one has taken; in worlds with many bonus items the command count is
+    # then an upper bound rather than the minimum.
+    #
+    # Commands name items by their full names. The game picks the first carried
+    # item (or else the first one lying here) whose name contains the name
+    # typed, so a command is only used where no other such item is in the way.
+    def __init__(self, world=WORLD):
+        self.world = world
+        self.max_score = MAX_SCORE
+        items = world.items
+        names = [item.name.lower() for item in items]
+        self.names = names
+        self.points = [take_points(item) for item in items]
+        # {item id: ids of the other items whose names contain its name}
+        self.shadows = [tuple(world.item_ids[other] for other in world.item_index.matches(name)
+                              if other is not item) for item, name in zip(items, names)]
+
+        bonus = self.bonus_items()
+        self.codec = StateCodec(world, [number for number in range(len(items)) if number not in bonus])
+        self.bonus_bits = {item: 1 << bit for bit, item in enumerate(sorted(bonus))}
+        self.bonus_at = {} # {location: [bonus item ids lying there at the start, in order]}
+        for location, location_items in enumerate(world.start_items):
+            lying = [world.item_ids[item] for item in location_items if world.item_ids[item] in bonus]
+            if lying:
+                self.bonus_at[location] = lying
+
+        self.transitions = {} # {state: ((commands, next state, score delta, game finished), ...)}
+        self.acquired = {} # {state: (next state, score delta, game finished) of taking a bonus item, or None}
+        self.loops = {} # {state: {commands: most points} of the transitions that stay in the state}
+
+    def bonus_items(self) -> set:
+        # Ids of the items that only give points when taken: no command but take
+        # and drop does anything with them, no rule names them, and no item a
+        # command does something with has a name that contains theirs or that
+        # their name contains (so their names never stand in the way)
+        world = self.world
+        rules = world.rules
+        if rules.uses_action("item_acquired", "consume_item"):
+            return set() # Taking an item can make it disappear
+        named = rules.named_items()
+        bonus = set()
+        for number, item in enumerate(world.items):
+            if (item in named or item.usage in KEY_CARD_USAGES or item.usage in ("upload", "wear")
+                    or (item_reading(item) or (None, 0))[1]
+                    or (item_use(item) or (None, 0))[1]):
+                continue
+            bonus.add(number)
+        changed = True
+        while changed:
+            changed = False
+            for number in list(bonus):
+                if any(other not in bonus for other in self.shadows[number]) or any(
+                        number in self.shadows[other] for other in range(len(world.items)) if other not in bonus):
+                    bonus.discard(number)
+                    changed = True
+        return bonus
+
+    def expand(self, state: int) -> tuple:
+        """Returns the memoized transitions of a state, without the ones of bonus items."""
+        transitions = self.transitions.get(state)
+        if transitions is not None:
+            return transitions
+
+        world = self.world
+        codec = self.codec
+        items = world.items
+        names = self.names
+        location, slots, server, suit = codec.unpack(state)
+        carried = [codec.items[number] for number, slot in enumerate(slots) if slot == codec.IN_INVENTORY]
+        lying = [codec.items[number] for number, slot in enumerate(slots) if slot == location]
+        lying.sort(key=lambda item: world.start_items[location].index(items[item]))
+        slot_numbers = codec.slot_numbers
+        in_the_way = set(carried)
+
+        def clear(item: int, lying_before=()) -> bool:
+            # No other item that the item's name would pick is carried or lies before it
+            return not any(other in in_the_way or other in lying_before for other in self.shadows[item])
+
+        found = []
+
+        def play(commands: tuple, points: int, target: int, event: str = None, item: int = None,
+                 take: int = None, remove: int = None, wear: bool = False):
+            # Plays commands that give points and bring the player to target, where the
+            # event fires (with the item), on a probe of the state
+            probe = RuleProbe(world, (items[number] for number in carried), server, suit or wear)
+            new_slots = list(slots)
+            if take is not None:
+                probe.inventory.append(items[take])
+                new_slots[slot_numbers[take]] = codec.IN_INVENTORY
+            if remove is not None:
+                probe.inventory.remove(items[remove])
+            probe.add_score(points)
+            if event is not None:
+                world.rules.fire(probe, event, target, items[item] if item is not None else None)
+            for number, slot in enumerate(new_slots):
+                if items[codec.items[number]] in probe.inventory:
+                    if slot < codec.IN_INVENTORY:
+                        return # Also lying in a location, e.g. a rule gave a card that was dropped
+                    new_slots[number] = codec.IN_INVENTORY
+                elif slot == codec.IN_INVENTORY:
+                    new_slots[number] = codec.NOWHERE # Used up
+            next_state = codec.pack(target, new_slots, probe.server_activated, probe.has_worn_suit)
+            finished = probe.outcome is not None
+            if next_state != state or probe.score or finished: # Something happened
+                found.append((commands, next_state, probe.score, finished))
+
+        for direction, target in world.location_exits(location):
+            if world.gate(location, direction)[0] == NO_EXIT: # A door with a card reader only opens with swipe
+                play((f"go {world.directions[direction]}",), MOVE_POINTS, target, "enter")
+        if world.rules.has_rules("talk", location):
+            play(("talk",), 0, location, "talk")
+
+        for item in carried:
+            if not clear(item):
+                continue
+            name = names[item]
+            usage = items[item].usage
+            if usage in KEY_CARD_USAGES:
+                target = world.key_target(location, item)
+                if target != NO_EXIT:
+                    play((f"swipe {name}",), SWIPE_POINTS, target, "enter")
+            if usage == "upload" and world.rules.has_rules("upload", location):
+                play((f"upload {name}",), 0, location, "upload", item)
+            if usage == "wear" and not suit:
+                play((f"wear {name}",), WEAR_POINTS, location, remove=item, wear=True)
+            use = item_use(items[item])
+            if use is None and world.rules.has_rules("use", location):
+                play((f"use {name}",), 0, location, "use", item)
+            for verb, effect in (("use", use), ("read", item_reading(items[item]))):
+                if effect is not None and effect[1]:
+                    play((f"{verb} {name}",), effect[1], location)
+            if not any(other in lying for other in self.shadows[item]):
+                play((f"drop {name}", f"take {name}"), self.points[item], location, "item_acquired", item)
+
+        for position, item in enumerate(lying):
+            if clear(item, lying[:position]):
+                play((f"take {names[item]}",), self.points[item], location, "item_acquired", item, take=item)
+
+        # Commands that stay in the state and only give points (loops) are not
+        # transitions: the search inserts them where they pay off most
+        loops = self.loops[state] = {}
+        transitions = []
+        for commands, next_state, delta, finished in found:
+            if next_state != state or finished:
+                transitions.append((commands, next_state, delta, finished))
+            elif delta > loops.get(len(commands), (0,))[0]:
+                loops[len(commands)] = (delta, commands)
+        transitions = self.transitions[state] = tuple(transitions)
+        return transitions
+
+    def take_bonus(self, state: int, item: int):
+        # (next state, score delta, game finished) of taking a bonus item in a state,
+        # without its points; the same for every bonus item, as no rule names them
+        if state in self.acquired:
+            return self.acquired[state]
+        world = self.world
+        codec = self.codec
+        location, slots, server, suit = codec.unpack(state)
+        probe = RuleProbe(world, (world.items[codec.items[number]] for number, slot in enumerate(slots)
+                                  if slot == codec.IN_INVENTORY), server, suit)
+        world.rules.fire(probe, "item_acquired", location, world.items[item])
+        new_slots = list(slots)
+        effect = None
+        for number, slot in enumerate(new_slots):
+            if world.items[codec.items[number]] in probe.inventory:
+                if slot < codec.IN_INVENTORY:
+                    break
+                new_slots[number] = codec.IN_INVENTORY
+            elif slot == codec.IN_INVENTORY:
+                new_slots[number] = codec.NOWHERE
+        else:
+            effect = (codec.pack(location, new_slots, probe.server_activated, probe.has_worn_suit), probe.score,
+                      probe.outcome is not None)
+        self.acquired[state] = effect
+        return effect
+
+    def bonus_moves(self, state: int, taken: int, farm: int):
+        # (commands, next state, score delta, game finished, bonus items taken, farm item)
+        # of the bonus items: taking the ones lying here, and dropping and taking
+        # again the best one carried (farm, -1 for none) when that is not a loop
+        lying = self.bonus_at.get(state & self.codec.LOCATION_MASK)
+        if not lying and farm < 0:
+            return
+        effect = self.take_bonus(state, lying[0] if lying else farm)
+        if effect is None:
+            return
+        next_state, delta, finished = effect
+        names = self.names
+        points = self.points
+        shadows = self.shadows
+        bits = self.bonus_bits
+        if lying:
+            before = []
+            for item in lying:
+                bit = bits[item]
+                if taken & bit:
+                    continue
+                if not any(taken & bits[other] or other in before for other in shadows[item]):
+                    best = item if not shadows[item] and (farm < 0 or points[item] > points[farm]) else farm
+                    yield (f"take {names[item]}",), next_state, delta + points[item], finished, taken | bit, best
+                before.append(item)
+        if farm >= 0 and (next_state != state or finished):
+            name = names[farm]
+            yield (f"drop {name}", f"take {name}"), next_state, delta + points[farm], finished, taken, farm
+
+    def state_loops(self, state: int, farm: int) -> dict:
+        # {commands: (points, commands)} of the best loops in a state, with dropping
+        # and taking again the farm item
+        loops = self.loops[state]
+        if farm < 0:
+            return loops
+        effect = self.take_bonus(state, farm)
+        if effect is None or effect[0] != state or effect[2]:
+            return loops
+        points = effect[1] + self.points[farm]
+        if points <= loops.get(2, (0,))[0]:
+            return loops
+        name = self.names[farm]
+        return {**loops, 2: (points, (f"drop {name}", f"take {name}"))}
+
+    @staticmethod
+    def top_up(missing: int, one: int, two: int):
+        # (commands, points, repeats of the one command loop, repeats of the two
+        # command loop) that make up for missing points in the fewest commands,
+        # then with the most points; None if the loops cannot
+        if missing <= 0:
+            return 0, 0, 0, 0
+        best = None
+        for twos in range(-(-missing // two) + 1 if two else 1):
+            rest = missing - two * twos
+            ones = -(-rest // one) if rest > 0 and one else 0
+            if rest > one * ones:
+                continue
+            option = (ones + 2 * twos, one * ones + two * twos, ones, twos)
+            if best is None or (option[0], -option[1]) < (best[0], -best[1]):
+                best = option
+        return best
+
+    def solve(self, max_moves: int = 200) -> Solution:
+        start = (self.codec.start(), 0, 0) # (state, one command loop points, two command loop points)
+        # {moves: {node: (best score, bonus items taken, farm item, where to repeat the
+        #  one command loop, where to repeat the two command loop)}}, a place to
+        #  repeat a loop being (moves, node, loop commands)
+        buckets = {0: {start: (0, 0, -1, None, None)}}
+        # {node: [best score it was expanded with, [(loop commands, loop points, [best score - points *
+        #  (moves // commands) it was expanded with, for each moves % commands]), ...]]}
+        expanded = {}
+        parents = {} # {(moves, node): (previous moves, previous node, commands)}
+        explored = 0
+        # (total moves, -score, moves, node, commands, repeats, places) of the best win so far
+        best = None
+        unseen = float("-inf")
+
+        def dominated(node: tuple, moves: int, score: int) -> bool:
+            # True if an earlier expansion of the node has the score, or reaches it in moves by looping.
+            # From (earlier moves, earlier score), a loop gets to earlier score + points *
+            # ((moves - earlier moves) // commands) = (earlier score - points * (earlier
+            # moves // commands)) + points * (moves // commands), less points if the
+            # remainder of moves is smaller than the one of the earlier moves.
+            record = expanded.get(node)
+            if record is None:
+                return False
+            if score <= record[0]:
+                return True
+            for commands, points, best in record[1]:
+                remainder = moves % commands
+                reachable = max(value - points * (remainder < earlier) for earlier, value in enumerate(best))
+                if score <= reachable + points * (moves // commands):
+                    return True
+            return False
+
+        def remember(node: tuple, moves: int, score: int):
+            record = expanded.get(node)
+            if record is None:
+                record = expanded[node] = [score, [(commands, points, [unseen] * commands)
+                                                   for commands, points in ((1, node[1]), (2, node[2])) if points]]
+            record[0] = max(record[0], score)
+            for commands, points, best in record[1]:
+                remainder = moves % commands
+                best[remainder] = max(best[remainder], score - points * (moves // commands))
+
+        for moves in range(max_moves + 1):
+            if best is not None and best[0] < moves + 2:
+                break # A win from this bucket on takes at least moves + 1 commands, and not fewer than the best
+            bucket = buckets.pop(moves, None)
+            if not bucket:
+                continue
+
+            for node, (score, taken, farm, one_place, two_place) in bucket.items():
+                if dominated(node, moves, score):
+                    continue
+                state, one, two = node
+                transitions = self.expand(state)
+                remember(node, moves, score)
+                explored += 1
+
+                loops = self.state_loops(state, farm)
+                if loops.get(1, (0,))[0] > one:
+                    one, one_commands = loops[1]
+                    one_place = (moves, node, one_commands)
+                if loops.get(2, (0,))[0] > two:
+                    two, two_commands = loops[2]
+                    two_place = (moves, node, two_commands)
+
+                for commands, next_state, delta, finished, next_taken, next_farm in (
+                        *((*transition, taken, farm) for transition in transitions),
+                        *self.bonus_moves(state, taken, farm)):
+                    new_score = score + delta
+                    next_moves = moves + len(commands)
+                    if finished:
+                        # A defeat ends the game as well
+                        extra = self.top_up(self.max_score - new_score, one, two)
+                        if extra is None:
+                            continue
+                        win = (next_moves + extra[0], -new_score - extra[1], moves, node, commands, extra[2:],
+                               (one_place, two_place))
+                        if best is None or win[:2] < best[:2]:
+                            best = win
+                        continue
+                    next_node = (next_state, one, two)
+                    if next_moves > max_moves or dominated(next_node, next_moves, new_score):
+                        continue
+                    pending = buckets.setdefault(next_moves, {})
+                    if next_node not in pending or new_score > pending[next_node][0]:
+                        pending[next_node] = (new_score, next_taken, next_farm, one_place, two_place)
+                        parents[(next_moves, next_node)] = (moves, node, commands)
+
+        if best is None:
+            return Solution(None, None, explored, len(self.transitions))
+        _, negative_score, moves, node, commands, repeats, places = best
+        route = [((moves, node), commands)] # (place, commands played from it), back from the win
+        while (moves, node) in parents:
+            moves, node, commands = parents[(moves, node)]
+            route.append(((moves, node), commands))
+        path = []
+        for place, commands in reversed(route):
+            for times, loop in zip(repeats, places):
+                if loop is not None and loop[:2] == place:
+                    path.extend(loop[2] * times)
+            path.extend(commands)
+        return Solution(path, -negative_score, explored, len(self.transitions))
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the shortest winning command list.")
+    parser.add_argument("--max-moves", type=int, default=200)
+    args = parser.parse_args()
+
+    solver = Solver()
+    started = time.perf_counter()
+    solution = solver.solve(args.max_moves)
+    elapsed = time.perf_counter() - started
+
+    if solution.commands is None:
+        print(f"No win within {args.max_moves} moves.")
+    else:
+        print(f"Win in {len(solution.commands)} moves with {solution.score}/{solver.max_score} points:")
+        for number, command in enumerate(solution.commands, 1):
+            print(f"{number:>4}. {command}")
+    print(f"States explored: {solution.states_explored}, memoized states: {solution.states_memoized}, "
+          f"time: {elapsed:.2f}s")
+
+if __name__ == "__main__":
+    main()
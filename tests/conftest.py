@@ -0,0 +1,20 @@
+# Helpers shared by the tests: playing commands on a new session, and the walkthrough script
+
+import os
+
+from classes import GameSession
+from data import WORLD
+from main import handle_command
+from output import TextSink
+
+WALKTHROUGH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "walkthrough.txt")
+
+def walkthrough() -> list:
+    with open(WALKTHROUGH, encoding="utf-8") as script:
+        return [line.strip() for line in script if line.strip()]
+
+def play(*commands: str) -> GameSession:
+    session = GameSession(WORLD, output=TextSink())
+    for text in commands:
+        handle_command(session, text)
+    return session
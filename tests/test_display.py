@@ -0,0 +1,32 @@
+# The location text: exits behind card readers and the shared cache of the lines
+
+from conftest import play
+from data import GAME_RULES, WORLD
+from main import location_lines
+from worldfile import load_world, write_world
+
+def test_card_reader_exits_are_shown_locked():
+    session = play("go east", "go east", "go north")
+    text = session.output.flush()
+    assert "--- You are in: Ventilation Access ---" in text
+    assert "You can go: south, east (locked)" in text
+    assert "('" not in text # Not the (direction, target) pairs
+
+def test_going_through_a_locked_exit():
+    text = play("go east", "go east", "go north", "go east").output.flush()
+    assert text.endswith("❌ The passage east is locked. You need the Blue Key Card.\n")
+    text = play("go east", "take blue key card", "go east", "go north", "go east").output.flush()
+    assert text.endswith("Hint: The door is locked by a card reader. Try to 'swipe Blue Key Card' to open it.\n")
+
+def test_lines_do_not_keep_locations_of_a_world_file(tmp_path):
+    path = str(tmp_path / "game.db")
+    write_world(path, WORLD, GAME_RULES)
+    world = load_world(path, cache_size=1)
+    location = WORLD.location_ids["Ventilation Access"]
+    lines = location_lines(world, location)
+    assert lines == location_lines(WORLD, location)
+    world.locations[world.start_location] # Drops Ventilation Access from the world
+    assert location not in world.locations.cache
+    loads = world.locations.loads
+    assert location_lines(world, location) is lines # Still cached, without loading it again
+    assert world.locations.loads == loads
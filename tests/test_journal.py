@@ -0,0 +1,161 @@
+# Journal: recovering sessions identical to the live ones
+
+import os
+import time
+
+import pytest
+
+from classes import GameSession
+from conftest import walkthrough
+from data import ALL_ITEMS, GAME_RULES, GAME_WORLD, WORLD
+from journal import PAYLOAD, RECORD, Journal, JournalSink
+from main import handle_command
+from rules import Rule
+from server import GameServer, open_parking
+from snapshot import save_session
+from world import compile_world
+
+def play(journal: Journal, session_id: int, commands: list, world=WORLD) -> GameSession:
+    # A live session whose turns are journaled like the server does
+    session = GameSession(world, output=JournalSink())
+    journal.log_open(session_id, session)
+    return play_turns(journal, session_id, commands, session)
+
+def play_turns(journal: Journal, session_id: int, commands: list, session: GameSession) -> GameSession:
+    for command in commands:
+        handle_command(session, command)
+        session.output.flush()
+        journal.log_turn(session_id, command, session.output.take_changes())
+    journal.sync()
+    return session
+
+def recovered(directory: str, world=WORLD) -> dict:
+    journal = Journal(directory, world=world)
+    sessions = journal.recover()
+    journal.close()
+    return sessions
+
+def test_recovers_live_sessions(tmp_path):
+    journal = Journal(str(tmp_path))
+    live = {number: play(journal, number, walkthrough()[:number * 5]) for number in range(1, 6)}
+    journal.close()
+    sessions = recovered(str(tmp_path))
+    assert {number: save_session(session) for number, session in sessions.items()} == \
+           {number: save_session(session) for number, session in live.items()}
+
+@pytest.mark.parametrize("upload_actions", [
+    [("consume_item",), ("say", "The terminal ate {item}.")], # Consumes without activating the server
+    [("activate_server",), ("add_score", 15)], # Activates the server, the item stays in the inventory
+])
+def test_consuming_and_activating_are_journaled_separately(tmp_path, upload_actions):
+    rules = [rule for rule in GAME_RULES if rule.events != ("upload",)]
+    world = compile_world(GAME_WORLD, ALL_ITEMS, "Reception Area", rules + [Rule("upload", "Server Room",
+                                                                                 actions=upload_actions)])
+    commands = walkthrough()
+    commands = commands[:commands.index("upload flash drive") + 1]
+    journal = Journal(str(tmp_path), world=world)
+    live = play(journal, 1, commands, world)
+    journal.close()
+    assert save_session(recovered(str(tmp_path), world)[1]) == save_session(live)
+
+@pytest.mark.parametrize("kept", [1, RECORD.size, RECORD.size + PAYLOAD.size + 1, -1])
+def test_recovers_after_a_cut_off_record(tmp_path, kept):
+    # The crash cut the last record after `kept` bytes (-1: all but its last byte)
+    commands = walkthrough()[:12]
+    journal = Journal(str(tmp_path))
+    live = play(journal, 1, commands[:-1])
+    before = save_session(live)
+    end = os.path.getsize(journal.path(journal.segment))
+    play_turns(journal, 1, commands[-1:], live)
+    journal.close()
+    path = journal.path(journal.segment)
+    size = os.path.getsize(path)
+    with open(path, "r+b") as file:
+        file.truncate(end + kept if kept > 0 else size + kept)
+
+    journal = Journal(str(tmp_path))
+    session = journal.recover(JournalSink)[1]
+    assert save_session(session) == before
+    # New records go after the last complete one and are recovered too
+    play_turns(journal, 1, commands[-1:], session)
+    journal.close()
+    assert save_session(recovered(str(tmp_path))[1]) == save_session(session)
+
+def test_sessions_of_another_world_are_skipped(tmp_path):
+    journal = Journal(str(tmp_path))
+    play(journal, 1, walkthrough()[:5])
+    journal.close()
+    other = compile_world(GAME_WORLD, ALL_ITEMS, "Cloakroom", GAME_RULES)
+    journal = Journal(str(tmp_path), world=other)
+    assert journal.recover() == {}
+    assert list(journal.skipped) == [1]
+    assert journal.tokens == {}
+    journal.close()
+
+def test_a_session_with_a_turn_that_does_not_apply_is_skipped(tmp_path):
+    journal = Journal(str(tmp_path))
+    play(journal, 1, walkthrough()[:5])
+    live = play(journal, 2, walkthrough()[:8])
+    # A drop of an item session 1 does not carry
+    journal.log_turn(1, "drop antidote", [("item_dropped", {"item": "Antidote", "location": "Reception Area"})])
+    journal.close()
+
+    journal = Journal(str(tmp_path))
+    server = GameServer(WORLD, journal)
+    assert list(server.sessions) == [2]
+    assert save_session(server.sessions[2]) == save_session(live)
+    assert list(journal.skipped) == [1]
+    assert next(server.session_ids) == 3
+    journal.close()
+
+def test_idle_sessions_are_parked_and_resumed(tmp_path):
+    journal = Journal(str(tmp_path / "journal"))
+    live = play(journal, 1, walkthrough()[:10])
+    token = journal.tokens[1]
+    journal.close()
+
+    journal = Journal(str(tmp_path / "journal"))
+    parking = open_parking(str(tmp_path / "parked.db"), WORLD)
+    server = GameServer(WORLD, journal, parking=parking, idle_timeout=60)
+    server.park_idle(time.monotonic())
+    journal.sync()
+    assert server.sessions == {}
+    assert list(parking.ids()) == [1]
+    assert recovered(str(tmp_path / "journal")) == {} # Checkpoints leave it out
+
+    # A restart finds the parked session by its token
+    journal.close()
+    parking.close()
+    journal = Journal(str(tmp_path / "journal"))
+    parking = open_parking(str(tmp_path / "parked.db"), WORLD)
+    server = GameServer(WORLD, journal, parking=parking)
+    server.sessions[2] = GameSession(WORLD, output=JournalSink())
+    server.connected.add(2)
+    assert server.resume(2, token) == 1
+    assert save_session(server.sessions[1]) == save_session(live)
+    assert list(parking.ids()) == []
+    journal.close()
+    parking.close()
+    assert save_session(recovered(str(tmp_path / "journal"))[1]) == save_session(live)
+
+def test_idle_sessions_are_closed_without_a_store(tmp_path):
+    journal = Journal(str(tmp_path))
+    play(journal, 1, walkthrough()[:10])
+    token = journal.tokens[1]
+    journal.close()
+
+    journal = Journal(str(tmp_path))
+    server = GameServer(WORLD, journal)
+    server.park_idle(time.monotonic() - 60) # Not idle long enough
+    assert list(server.sessions) == [1]
+    server.park_idle(time.monotonic())
+    assert server.sessions == {} and token not in server.resume_ids
+    journal.close()
+    assert recovered(str(tmp_path)) == {}
+
+def test_failed_undo_is_not_counted_on_recovery(tmp_path):
+    journal = Journal(str(tmp_path))
+    live = play(journal, 1, ["go east", "undo", "Rewind 5", "take blue key card"])
+    journal.close()
+    assert live.turns == 2
+    assert save_session(recovered(str(tmp_path))[1]) == save_session(live)
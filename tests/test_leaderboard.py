@@ -0,0 +1,56 @@
+# Leaderboard file of one-command runs and of the server
+
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+
+import pytest
+
+from classes import GameSession
+from data import WORLD
+from leaderboard import Leaderboard
+from main import record_result
+from output import NullSink
+
+RUNS = 8
+RESULTS_PER_RUN = 25
+
+def record_results(state_directory: str, run: int):
+    for number in range(RESULTS_PER_RUN):
+        record_result(GameSession(WORLD, output=NullSink()), state_directory, f"{run}-{number}")
+
+def test_concurrent_runs_keep_every_result(tmp_path):
+    context = multiprocessing.get_context("fork")
+    runs = [context.Process(target=record_results, args=(str(tmp_path), run)) for run in range(RUNS)]
+    for run in runs:
+        run.start()
+    for run in runs:
+        run.join()
+    board = Leaderboard.load(str(tmp_path / "leaderboard.json"))
+    assert board.outcomes["quit"] == RUNS * RESULTS_PER_RUN
+
+def test_damaged_file_is_set_aside(tmp_path):
+    path = tmp_path / "leaderboard.json"
+    path.write_text('{"size": 100}', encoding="utf-8")
+    record_result(GameSession(WORLD, output=NullSink()), str(tmp_path), "after")
+    assert (tmp_path / "leaderboard.json.damaged").read_text(encoding="utf-8") == '{"size": 100}'
+    assert Leaderboard.load(str(path)).ranking() == [("after", "quit", 0, 0)]
+
+@pytest.mark.skipif(sys.platform == "win32", reason="SIGTERM cannot be handled on Windows")
+def test_server_saves_on_sigterm(tmp_path):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    path = str(tmp_path / "leaderboard.json")
+    server = subprocess.Popen([sys.executable, "server.py", "--port", "0", "--leaderboard", path,
+                               "--journal", str(tmp_path / "journal")],
+                              cwd=root, stdout=subprocess.PIPE, text=True)
+    try:
+        assert "listening" in server.stdout.readline()
+        server.send_signal(signal.SIGTERM)
+        output, _ = server.communicate(timeout=10)
+    finally:
+        server.kill()
+    assert server.returncode == 0
+    assert "Server stopped." in output
+    assert os.path.exists(path) # Saved after the loop stopped
@@ -0,0 +1,76 @@
+# Latency histogram buckets and quantiles, and the Prometheus export
+
+import pytest
+
+from metrics import EXPORT_BOUNDS, LatencyHistogram, Metrics
+
+def bucket(value: int) -> int:
+    histogram = LatencyHistogram()
+    histogram.record(value)
+    return histogram.counts.index(1)
+
+@pytest.mark.parametrize("value", [0, 1, 31, 32, 33, 34, 63, 64, 1000, 123456789, 2 ** 40 + 1, 2 ** 64 - 1])
+def test_bucket_bounds_hold_the_value(value):
+    index = bucket(value)
+    upper = LatencyHistogram.upper_bound(index)
+    assert upper >= value
+    assert index == 0 or LatencyHistogram.upper_bound(index - 1) < value
+    assert upper - value <= max(value // 16, 1) # At most 1/16 wider than the values in it
+
+def test_buckets_are_exact_below_32_and_ordered():
+    assert [bucket(value) for value in range(32)] == list(range(32))
+    bounds = [LatencyHistogram.upper_bound(index) for index in range(LatencyHistogram.BUCKETS)]
+    assert bounds == sorted(set(bounds))
+    assert bounds[-1] == 2 ** 64 - 1
+
+def test_quantiles():
+    histogram = LatencyHistogram()
+    assert histogram.quantile(0.5) == 0
+    for value in range(1, 101):
+        histogram.record(value)
+    assert histogram.count == 100 and histogram.sum == 5050
+    assert histogram.quantile(0.1) == 10
+    assert histogram.quantile(0.5) == 51 # 50 shares the bucket 50-51
+    assert histogram.quantile(0.99) == 99 # 98-99
+    assert histogram.quantile(1.0) == 103 # 100-103
+    assert histogram.quantile(0.0) == 1
+
+def test_cumulative_counts():
+    histogram = LatencyHistogram()
+    for value in (5, 1000, 1023, 1024, 5000):
+        histogram.record(value)
+    # 1000 and 1023 share the bucket 992-1023, 1024 is in 1024-1087
+    assert histogram.cumulative([4, 5, 1023, 1024, 1087, 10 ** 6]) == [0, 1, 3, 3, 4, 5]
+
+def test_prometheus_text():
+    metrics = Metrics()
+    metrics.commands["go"] += 3
+    metrics.commands["take"] += 1
+    metrics.count_error("missing_noun")
+    metrics.parse.record(1500)
+    metrics.parse.record(3_000_000)
+    metrics.sessions = 2
+    lines = metrics.prometheus_text().splitlines()
+
+    assert 'omega_commands_total{verb="go"} 3' in lines
+    assert 'omega_commands_total{verb="take"} 1' in lines
+    assert 'omega_command_errors_total{reason="missing_noun"} 1' in lines
+    assert 'omega_command_errors_total{reason="unknown_command"} 0' in lines
+    assert lines[-1] == "omega_sessions 2"
+    assert "# TYPE omega_parse_seconds histogram" in lines
+
+    buckets = [line for line in lines if line.startswith("omega_parse_seconds_bucket")]
+    assert len(buckets) == len(EXPORT_BOUNDS) + 1
+    assert buckets[0] == 'omega_parse_seconds_bucket{le="1.024e-06"} 0'
+    assert 'omega_parse_seconds_bucket{le="2.048e-06"} 1' in buckets
+    assert 'omega_parse_seconds_bucket{le="0.004194304"} 2' in buckets
+    assert buckets[-1] == 'omega_parse_seconds_bucket{le="+Inf"} 2'
+    assert "omega_parse_seconds_sum 0.0030015" in lines
+    assert "omega_parse_seconds_count 2" in lines
+    assert "omega_dispatch_seconds_count 0" in lines
+
+def test_disabled_metrics_count_nothing():
+    metrics = Metrics()
+    metrics.enabled = False
+    metrics.count_error("unknown_command")
+    assert metrics.errors["unknown_command"] == 0
@@ -0,0 +1,55 @@
+# Command parsing: synonyms, typo correction and item names
+
+import pytest
+
+from classes import GameSession
+from conftest import play
+from data import WORLD
+from fuzzy import edit_distance
+from main import handle_command, normalized_words
+from output import TextSink
+
+@pytest.mark.parametrize("text", ["take blue key card", "tkae blue card", "take blue crad", "take blu card",
+                                  "take blue card", "pick up the blue card", "grab card"])
+def test_take_blue_card_in_cloakroom(text):
+    session = play("go east", text)
+    assert [item.name for item in session.player.inventory] == ["Blue Key Card"]
+
+def test_misspelled_name_of_missing_item_is_not_taken():
+    session = play("go east", "take red crad")
+    assert not session.player.inventory
+
+@pytest.mark.parametrize("text, words, corrected", [
+    ("n", ("go", "north"), False),
+    ("west", ("go", "west"), False),
+    ("go n", ("go", "north"), False),
+    ("go nroth", ("go", "north"), True),
+    ("look at the manual", ("examine", "manual"), False),
+    ("go to server room", ("travel", "server", "room"), False),
+    ("invetory", ("inventory",), True),
+    ("tak wire", ("tak", "wire"), False), # As close to take as to talk
+])
+def test_normalized_words(text, words, corrected):
+    assert normalized_words(text) == (words, corrected)
+
+@pytest.mark.parametrize("text", ["rest", "test", "best", "eat", "last", "past", "fast", "bask", "back",
+                                  "undp", "rewnid 2", "quiet", "exti"])
+def test_words_close_to_a_direction_or_undo_are_unknown(text):
+    session = GameSession(WORLD, output=TextSink(), max_history=10)
+    for command in ("go east", text):
+        handle_command(session, command)
+    assert session.world.location_names[session.player.current_location] == "Cloakroom"
+    assert session.turns == 2 and len(session.history) == 3
+    assert "Unknown command" in session.output.flush()
+
+def test_correction_is_shown():
+    session = play("tkae blue card")
+    assert session.output.flush().startswith("(take blue card)")
+
+@pytest.mark.parametrize("first, second, distance", [
+    ("take", "take", 0), ("tkae", "take", 1), ("tke", "take", 1), ("takes", "take", 1), ("tale", "take", 1),
+    ("ca", "abc", 3), ("kitten", "sitting", 3),
+])
+def test_edit_distance(first, second, distance):
+    assert edit_distance(first, second, 5) == distance
+    assert edit_distance(first, second, 1) == min(distance, 2)
@@ -0,0 +1,77 @@
+# PersistentMap against a dict, and the undo/rewind history built on it
+
+import random
+
+import pytest
+
+from classes import GameSession
+from conftest import walkthrough
+from data import WORLD
+from main import handle_command
+from output import NullSink, TextSink
+from persistent import EMPTY_MAP
+from snapshot import save_session
+
+@pytest.mark.parametrize("keys", [
+    range(64), # One or two levels
+    range(0, 1 << 20, 32), # Same low bits: deep paths
+    range(0, 1 << 31, 1 << 25), # Largest keys
+])
+def test_matches_a_dict_and_keeps_old_versions(keys):
+    rng = random.Random(3)
+    keys = list(keys)
+    current, expected = EMPTY_MAP, {}
+    versions = [(current, {})] # Every 100th map, with a copy of the dict at that point
+    for step in range(1, 2_001):
+        key = rng.choice(keys)
+        current = current.set(key, step)
+        expected[key] = step
+        if step % 100 == 0:
+            versions.append((current, dict(expected)))
+
+    for persistent, expected in versions:
+        assert len(persistent) == len(expected)
+        assert dict(persistent.items()) == expected
+        assert all(persistent.get(key) == expected.get(key) for key in keys)
+        assert all((key in persistent) == (key in expected) for key in keys)
+    assert EMPTY_MAP.get(0, "missing") == "missing" and len(EMPTY_MAP) == 0
+
+@pytest.mark.parametrize("command, turns", [("undo", 1), ("rewind 1", 1), ("rewind 7", 7), ("rewind 25", 25)])
+def test_going_back_restores_an_earlier_turn(command, turns):
+    commands = walkthrough()[:25]
+    session = GameSession(WORLD, output=NullSink(), max_history=25)
+    states = [save_session(session)]
+    for text in commands:
+        handle_command(session, text)
+        states.append(save_session(session))
+    handle_command(session, command)
+    assert save_session(session) == states[-1 - turns]
+    # The history continues from there
+    handle_command(session, commands[len(commands) - turns])
+    assert save_session(session) == states[-turns]
+
+def test_history_keeps_the_last_max_history_turns():
+    session = GameSession(WORLD, output=TextSink(), max_history=5)
+    for text in walkthrough()[:12]:
+        handle_command(session, text)
+    assert len(session.history) == 6
+    session.output.flush()
+    handle_command(session, "rewind 6")
+    assert "You can only go back 5 turns." in session.output.flush()
+    handle_command(session, "rewind 5")
+    assert session.turns == 7
+
+@pytest.mark.parametrize("max_history, command, message", [
+    (0, "undo", "Turns cannot be taken back in this game."),
+    (10, "rewind 3", "You can only go back 2 turns."),
+    (10, "rewind 0", "'0' is not a number of turns."),
+    (10, "rewind", "Rewind how many turns?"),
+])
+def test_failed_undo_is_not_a_turn(max_history, command, message):
+    session = GameSession(WORLD, output=TextSink(), max_history=max_history)
+    for text in ("go east", "take blue key card"):
+        handle_command(session, text)
+    session.output.flush()
+    handle_command(session, command)
+    assert message in session.output.flush()
+    assert session.turns == 2
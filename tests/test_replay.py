@@ -0,0 +1,34 @@
+# Replaying command scripts: the fields of ReplayResult
+
+from conftest import walkthrough
+from replay import replay, replay_many
+
+def test_walkthrough_wins():
+    commands = walkthrough()
+    result = replay(commands + ["look"]) # Commands after the end are not played
+    assert (result.score, result.outcome, result.turns) == (155, "victory", len(commands))
+    assert result.visited[:4] == ["Reception Area", "Cloakroom", "D-4 Corridor", "Ventilation Access"]
+    assert result.visited[-1] == "Emergency Exit"
+    assert len(result.visited) == len(set(result.visited)) # Each location once, at its first visit
+    assert result.output is None
+
+def test_unfinished_script():
+    result = replay(walkthrough()[:3])
+    assert (result.score, result.outcome, result.turns) == (7, "unfinished", 3)
+    assert result.visited == ["Reception Area", "Cloakroom", "D-4 Corridor"]
+
+def test_quit_stops_and_empty_lines_are_not_turns():
+    result = replay(["", "go east", "  ", "quit", "go east"], keep_output=True)
+    assert (result.score, result.outcome, result.turns) == (1, "quit", 2)
+    assert result.visited == ["Reception Area", "Cloakroom"]
+    assert "--- You are in: Reception Area ---" in result.output
+    assert result.output.endswith("Quitting the game...\n")
+
+def test_defeat():
+    result = replay([command for command in walkthrough() if not command.startswith("wear")])
+    assert result.outcome == "defeat"
+    assert result.score < 155
+
+def test_replay_many_keeps_the_order():
+    scripts = [walkthrough()[:3], ["quit"], walkthrough()]
+    assert [result.outcome for result in replay_many(scripts, processes=1)] == ["unfinished", "quit", "victory"]
@@ -0,0 +1,27 @@
+# Route tables of the travel command
+
+from classes import GameSession
+from data import WORLD
+from main import handle_command
+from output import TextSink
+from routes import RouteTables
+from world import compile_world
+from worldgen import generate_world
+
+def test_travel_walks_the_shortest_route():
+    session = GameSession(WORLD, output=TextSink())
+    handle_command(session, "travel cafeteria")
+    assert WORLD.location_names[session.player.current_location] == "Cafeteria"
+    assert session.turns == 1
+
+def test_rows_are_bounded_least_recently_used_first():
+    world = compile_world(*generate_world(400))
+    routes = RouteTables(world, cache_bytes=16 * 4 * world.location_count)
+    assert routes.max_rows == 16
+    first = routes.next_hops(0, 0, False)
+    for target in range(1, 40):
+        routes.next_hops(target, 0, False)
+        routes.next_hops(0, 0, False) # Kept as the most recently used
+    assert len(routes.rows) == 16
+    assert routes.next_hops(0, 0, False) is first
+    assert not routes.has_row(1, 0, False)
@@ -0,0 +1,35 @@
+# Game rules as the player meets them
+
+from conftest import play
+from main import handle_command
+
+TO_GAS_ROOM = ["go east", "take blue key card", "go east", "go north", "swipe blue key card", "talk", "go east",
+               "go north", "take flash drive", "go south", "go west", "go south", "upload flash drive",
+               "take wire", "take server manual", "go north", "go east", "go east", "go south", "swipe red key card"]
+
+def test_gas_costs_points_on_entering_and_on_every_look():
+    session = play(*TO_GAS_ROOM)
+    arrived = session.player.score
+    handle_command(session, "look")
+    assert session.player.score == arrived - 5
+    handle_command(session, "explore")
+    assert session.player.score == arrived - 10
+
+def test_no_gas_penalty_with_the_suit():
+    session = play(*TO_GAS_ROOM, "go south", "take hazmat suit", "wear hazmat suit", "go north")
+    arrived = session.player.score
+    handle_command(session, "look")
+    assert session.player.score == arrived
+
+def test_wire_only_connects_at_the_server_terminal():
+    session = play(*TO_GAS_ROOM[:14])
+    session.output.flush()
+    score = session.player.score
+    handle_command(session, "use wire")
+    assert session.output.flush().startswith("You connect the Wire to the server.")
+    assert session.player.score == score + 1
+    handle_command(session, "go north")
+    session.output.flush()
+    handle_command(session, "use wire")
+    assert session.output.flush() == "❌ Cannot use 'Wire' here in this way.\n"
+    assert session.player.score == score + 2 # The step only
@@ -0,0 +1,35 @@
+# Simulator: points and places taken from the world's rules
+
+import argparse
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from data import WORLD
+from simulate import Scoring, Simulator, parse_weights
+
+def test_points_come_from_the_rules():
+    simulator = Simulator()
+    names = WORLD.location_names
+    gas_rooms = [location for location, action in enumerate(WORLD.special_actions) if action == "gas_hazard"]
+    assert list(np.nonzero(simulator.gas)[0]) == gas_rooms
+    assert set(simulator.gas[gas_rooms]) == {-5}
+    assert [names[location] for location in np.nonzero(simulator.terminal)[0]] == ["Server Room"]
+    guard = WORLD.location_ids["C-2 Laboratory"]
+    assert WORLD.items[simulator.gifts[guard]].name == "Red Key Card" and simulator.talk[guard] == 5
+
+    exit_ = WORLD.location_ids["Emergency Exit"]
+    assert list(np.nonzero(simulator.escape)[0]) == [exit_]
+    assert simulator.escape_points[exit_] == 50 and simulator.escape_server[exit_]
+    assert simulator.escape_items[exit_] == 1 << WORLD.item_ids[WORLD.items_by_name["Antidote"]]
+
+def test_other_points_replace_the_rules_ones():
+    simulator = Simulator(scoring=Scoring(gas=-1, escape=10))
+    assert set(simulator.gas[simulator.gas != 0]) == {-1}
+    assert simulator.escape_points[WORLD.location_ids["Emergency Exit"]] == 10
+
+@pytest.mark.parametrize("text", ["go=x", "fly=1"])
+def test_bad_weights_are_argument_errors(text):
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_weights(text)
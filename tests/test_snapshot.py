@@ -0,0 +1,86 @@
+# Snapshots: round trips, and data from another world
+
+import copy
+
+import pytest
+
+from classes import GameSession
+from conftest import walkthrough
+from data import ALL_ITEMS, GAME_RULES, GAME_WORLD, WORLD
+from main import handle_command
+from output import NullSink
+from snapshot import SnapshotError, SnapshotStore, load_session, save_session
+from world import compile_world
+
+@pytest.mark.parametrize("turns", [0, 5, 20, 60])
+def test_round_trip(turns):
+    session = GameSession(WORLD, output=NullSink())
+    for command in walkthrough()[:turns]:
+        handle_command(session, command)
+    data = save_session(session)
+    loaded = load_session(data, WORLD, NullSink())
+    assert save_session(loaded) == data
+    assert loaded.player.current_location == session.player.current_location
+    assert list(loaded.player.inventory) == list(session.player.inventory)
+    assert (loaded.player.score, loaded.server_activated) == (session.player.score, session.server_activated)
+
+def test_truncated_snapshot_is_rejected():
+    session = GameSession(WORLD, output=NullSink())
+    for command in walkthrough()[:20]:
+        handle_command(session, command)
+    data = save_session(session)
+    with pytest.raises(SnapshotError):
+        load_session(data[:-1], WORLD, NullSink())
+
+def edited_world(edit):
+    # The built-in world with edit(locations, items) applied to a copy of its data
+    locations, items = copy.deepcopy((GAME_WORLD, ALL_ITEMS))
+    edit(locations, items)
+    return compile_world(locations, items, "Reception Area", GAME_RULES)
+
+def move_blue_card(locations, items):
+    card = items["Blue Key Card"]
+    locations["Cloakroom"].items = tuple(item for item in locations["Cloakroom"].items if item is not card)
+    locations["Cafeteria"].items = (*locations["Cafeteria"].items, card)
+
+def swap_cloakroom_exits(locations, items):
+    exits = locations["Cloakroom"].exits
+    exits["east"], exits["west"] = exits["west"], exits["east"]
+
+@pytest.mark.parametrize("edit", [move_blue_card, swap_cloakroom_exits])
+def test_snapshot_of_an_edited_world_is_rejected(edit):
+    session = GameSession(WORLD, output=NullSink())
+    handle_command(session, "go east")
+    data = save_session(session)
+    with pytest.raises(SnapshotError):
+        load_session(data, edited_world(edit), NullSink())
+
+def test_same_data_gives_the_same_checksum():
+    assert edited_world(lambda locations, items: None).checksum == WORLD.checksum
+
+def test_store_keeps_sessions_by_id(tmp_path):
+    session = GameSession(WORLD, output=NullSink())
+    for command in walkthrough()[:20]:
+        handle_command(session, command)
+    path = str(tmp_path / "parked.db")
+    store = SnapshotStore(path, WORLD)
+    store.save(3, session)
+    store.put(1000, b"x")
+    store.delete(1000)
+    store.close()
+
+    store = SnapshotStore(path, WORLD)
+    assert list(store.ids()) == [3]
+    assert save_session(store.load(3, NullSink())) == save_session(session)
+    assert store.load(4) is None
+    store.close()
+
+@pytest.mark.parametrize("operation", [lambda store: store.put(-1, b"x"), lambda store: store.get(-1),
+                                       lambda store: store.delete(-1)])
+def test_store_rejects_negative_ids(tmp_path, operation):
+    store = SnapshotStore(str(tmp_path / "parked.db"), WORLD)
+    store.put(0, b"x")
+    with pytest.raises(ValueError):
+        operation(store)
+    assert store.get(0) == b"x"
+    store.close()
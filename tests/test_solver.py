@@ -0,0 +1,34 @@
+# Solver: the shortest win, replayed on a real session
+
+from classes import GameSession
+from data import WORLD
+from main import handle_command
+from output import NullSink
+from solver import Solver
+from world import compile_world
+from worldgen import generate_world
+
+def test_solution_wins_with_the_reported_score():
+    solver = Solver()
+    solution = solver.solve()
+    assert len(solution.commands) == 33
+
+    session = GameSession(WORLD, output=NullSink())
+    for command in solution.commands:
+        assert session.outcome is None
+        handle_command(session, command)
+    assert session.outcome == "victory"
+    assert session.player.score == solution.score >= solver.max_score
+
+def test_solution_of_a_generated_world_wins():
+    world = compile_world(*generate_world(400, 1))
+    solver = Solver(world)
+    solution = solver.solve()
+    assert solution.commands is not None
+
+    session = GameSession(world, output=NullSink())
+    for command in solution.commands:
+        assert session.outcome is None
+        handle_command(session, command)
+    assert session.outcome == "victory"
+    assert session.player.score == solution.score >= solver.max_score
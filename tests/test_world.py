@@ -0,0 +1,60 @@
+# Compiling a world: every name an exit, a door, an item or a rule uses must exist
+
+import copy
+
+import pytest
+
+from classes import Item
+from data import ALL_ITEMS, GAME_RULES, GAME_WORLD
+from rules import Rule
+from world import WorldError, compile_world
+
+def compiled(edit, start: str = "Reception Area", rules=GAME_RULES):
+    # The built-in world with edit(locations, items) applied to a copy of its data
+    locations, items = copy.deepcopy((GAME_WORLD, ALL_ITEMS))
+    edit(locations, items)
+    return compile_world(locations, items, start, rules)
+
+def dangling_exit(locations, items):
+    locations["Cloakroom"].exits["north"] = "Broom Closet"
+
+def unknown_key(locations, items):
+    locations["Cafeteria"].required_key = {"north": "Green Key Card"}
+
+def dangling_locked_exit(locations, items):
+    locations["Cafeteria"].exits_with_key = {"north": "Broom Closet"}
+
+def unlisted_item(locations, items):
+    locations["Cloakroom"].items += (Item("Umbrella", "Wet."),)
+
+def copied_item(locations, items):
+    # An item with the name of one in the table, but not that item
+    locations["Cloakroom"].items += (Item("Wire", "Another wire."),)
+
+@pytest.mark.parametrize("edit, message", [
+    (dangling_exit, "'Cloakroom' exit north leads to unknown location 'Broom Closet'"),
+    (unknown_key, "'Cafeteria' door north needs unknown item 'Green Key Card'"),
+    (dangling_locked_exit, "'Cafeteria' locked exit north leads to unknown location 'Broom Closet'"),
+    (unlisted_item, "'Cloakroom' holds item 'Umbrella' that is not in the item table"),
+    (copied_item, "'Cloakroom' holds item 'Wire' that is not in the item table"),
+])
+def test_unknown_names_are_rejected(edit, message):
+    with pytest.raises(WorldError, match=message):
+        compiled(edit)
+
+def test_every_problem_is_reported_at_once():
+    def edit(locations, items):
+        dangling_exit(locations, items)
+        unknown_key(locations, items)
+    rules = GAME_RULES + [Rule("talk", "Broom Closet"), Rule("enter", None, conditions=[("has_item", "Mop")])]
+    with pytest.raises(WorldError) as error:
+        compiled(edit, "Lobby", rules)
+    message = str(error.value)
+    for part in ("start location 'Lobby' does not exist", "exit north leads to unknown location 'Broom Closet'",
+                 "door north needs unknown item 'Green Key Card'", "applies to unknown location 'Broom Closet'",
+                 "names unknown item 'Mop'"):
+        assert part in message
+
+def test_built_in_world_compiles():
+    world = compiled(lambda locations, items: None)
+    assert world.location_names[world.start_location] == "Reception Area"
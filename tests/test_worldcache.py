@@ -0,0 +1,44 @@
+# The cache of the built-in world and its rebuild when data.py changes
+
+import os
+import shutil
+
+import worldcache
+from data import WORLD
+from worldcache import cache_path, cached_world
+
+def cache_files(directory) -> list:
+    return sorted(name for name in os.listdir(directory) if name.endswith(".marshal"))
+
+def test_cache_is_built_then_read(tmp_path):
+    assert cached_world(str(tmp_path)) is WORLD # Built from data.py
+    assert cache_files(tmp_path) == [os.path.basename(cache_path(str(tmp_path)))]
+    world = cached_world(str(tmp_path))
+    assert world is not WORLD # Read from the cache
+    assert world.checksum == WORLD.checksum
+    assert world.location_names == WORLD.location_names
+    assert world.rules.index.keys() == WORLD.rules.index.keys()
+
+def test_changed_data_rebuilds_the_cache(tmp_path, monkeypatch):
+    directory = str(tmp_path / "cache")
+    data = tmp_path / "data.py"
+    shutil.copy(worldcache.DATA_PATH, data)
+    monkeypatch.setattr(worldcache, "DATA_PATH", str(data))
+    cached_world(directory)
+    old = cache_files(directory)
+
+    with open(data, "a") as source:
+        source.write("\n# An edit\n")
+    assert cache_path(directory) != os.path.join(directory, old[0])
+    assert cached_world(directory) is WORLD # The old cache is not used
+    new = cache_files(directory)
+    assert len(new) == 1 and new != old # and is replaced
+    assert cached_world(directory) is not WORLD
+
+def test_damaged_cache_is_rebuilt(tmp_path):
+    directory = str(tmp_path)
+    cached_world(directory)
+    with open(cache_path(directory), "wb") as cache:
+        cache.write(b"\x00garbage")
+    assert cached_world(directory) is WORLD
+    assert cached_world(directory) is not WORLD
@@ -0,0 +1,76 @@
+# World files: a round trip, damaged files, and the locations kept in memory
+
+import json
+import shutil
+import sqlite3
+from array import array
+
+import pytest
+
+from classes import GameSession
+from conftest import walkthrough
+from data import GAME_RULES, WORLD
+from main import handle_command
+from output import NullSink
+from worldfile import _to_bytes, load_world, write_world
+from world import WorldError
+
+@pytest.fixture(scope="module")
+def world_file(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("world") / "game.db")
+    write_world(path, WORLD, GAME_RULES)
+    return path
+
+def test_round_trip_plays_the_same(world_file):
+    world = load_world(world_file)
+    assert world.checksum == WORLD.checksum
+    session = GameSession(world, output=NullSink())
+    for command in walkthrough():
+        handle_command(session, command)
+    assert session.outcome == "victory"
+
+def test_least_recently_used_locations_are_dropped(world_file):
+    world = load_world(world_file, cache_size=3)
+    locations = world.locations
+    names = [locations[location].name for location in (0, 1, 2, 0, 3)]
+    assert names[0] == names[3] == world.location_names[0]
+    assert locations.loads == 4 # The second visit of 0 was cached
+    assert list(locations.cache) == [2, 0, 3] # 1 was the least recently used
+    locations[1]
+    assert locations.loads == 5 and list(locations.cache) == [0, 3, 1]
+    with pytest.raises(IndexError):
+        locations[world.location_count]
+
+def edited(world_file: str, tmp_path, sql: str, *parameters) -> str:
+    # A copy of the world file changed by one SQL statement
+    path = str(tmp_path / "edited.db")
+    shutil.copy(world_file, path)
+    connection = sqlite3.connect(path)
+    connection.execute(sql, parameters)
+    connection.commit()
+    connection.close()
+    return path
+
+@pytest.mark.parametrize("sql, parameters, message", [
+    ("UPDATE meta SET value = '99' WHERE key = 'version'", (), "unsupported world file version 99"),
+    ("DELETE FROM meta WHERE key = 'directions'", (), "not a valid world file"),
+    ("UPDATE location_items SET item = 999 WHERE rowid = 1", (), "not a valid world file"),
+    ("DELETE FROM adjacency WHERE name = 'exits'", (), "the exits array does not match"),
+    ("UPDATE adjacency SET data = ? WHERE name = 'gate_keys'", (_to_bytes(WORLD.gate_keys[:-1]),),
+     "the gate_keys array does not match"),
+    ("UPDATE adjacency SET data = ? WHERE name = 'exits'",
+     (_to_bytes(WORLD.exits[:-1] + array("i", [WORLD.location_count])),),
+     "the exits array refers to unknown ids"),
+    ("UPDATE meta SET value = '-1' WHERE key = 'start_location'", (), "unknown start location -1"),
+    ("UPDATE rules SET location = 'Broom Closet' WHERE id = 1", (), "invalid rules"),
+    ("UPDATE rules SET actions = ? WHERE id = 1", (json.dumps([["add_score", "many"]]),), "invalid rules"),
+])
+def test_damaged_files_are_rejected(world_file, tmp_path, sql, parameters, message):
+    with pytest.raises(WorldError, match=message):
+        load_world(edited(world_file, tmp_path, sql, *parameters))
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / "notes.db"
+    path.write_bytes(b"not a database at all" * 100)
+    with pytest.raises(WorldError, match="not a world file"):
+        load_world(str(path))
@@ -0,0 +1,159 @@
+# world.py
+
+import zlib
+from array import array
+
+from item_index import ItemIndex
+from rules import RuleEngine, compile_rules
+
+# Order of the direction rows in the adjacency array. Directions that appear in
+# the data but not here are added after these.
+DIRECTIONS = ("north", "south", "east", "west")
+
+NO_EXIT = -1
+
+class WorldError(ValueError):
+    # The world data is inconsistent (e.g. an exit leads to a location that does not exist)
+    pass
+
+class CompiledWorld:
+    # Integer-indexed form of the game world. Locations, directions and items are
+    # numbered; the game rules work on these numbers and use names only for display.
+    #   exits[direction * location_count + location]      -> target location or NO_EXIT
+    #   gate_keys[direction * location_count + location]  -> item id of the key or NO_EXIT
+    #   gate_targets[direction * location_count + location] -> location opened by the key or NO_EXIT
+    # locations only serves the descriptions: a list of Location objects, or a
+    # worldfile.LazyLocations that creates them when they are first displayed.
+    def __init__(self, locations, location_names: list, items: list, directions: tuple, exits: array,
+                 gate_keys: array, gate_targets: array, start_location: int, start_items: list,
+                 npcs: list, special_actions: list, rules: RuleEngine = None):
+        self.locations = locations # Location objects by id, for descriptions
+        self.location_names = location_names
+        self.location_ids = {name: number for number, name in enumerate(location_names)}
+        self.location_count = len(location_names)
+
+        self.items = items
+        self.item_ids = {item: number for number, item in enumerate(items)}
+        self.items_by_name = {item.name: item for item in items}
+        self.item_index = ItemIndex(items)
+
+        self.directions = directions
+        self.direction_ids = {name: number for number, name in enumerate(directions)}
+        self.exits = exits
+        self.gate_keys = gate_keys
+        self.gate_targets = gate_targets
+        self.start_location = start_location
+
+        self.start_items = start_items # Tuples of Items
+        self.npcs = npcs
+        self.special_actions = special_actions
+        self.rules = rules if rules is not None else RuleEngine({})
+        self.routes = None # routes.RouteTables, made when a player first travels
+
+        self._checksum = None
+
+    @property
+    def checksum(self) -> int:
+        # CRC32 of everything saved sessions are relative to, to recognize data
+        # saved for this world: the location and item names, the exits and doors,
+        # the start location and the items lying in each location at the start
+        # (snapshots store item changes against those). Made on first use.
+        if self._checksum is None:
+            names = "\n".join(self.location_names) + "\0" + "\n".join(item.name for item in self.items)
+            checksum = zlib.crc32(names.encode("utf-8"))
+            for adjacency in (self.exits, self.gate_keys, self.gate_targets):
+                checksum = zlib.crc32(adjacency.tobytes(), checksum)
+            item_ids = self.item_ids
+            start = array("i", [self.start_location])
+            for items in self.start_items:
+                start.append(len(items))
+                start.extend(item_ids[item] for item in items)
+            self._checksum = zlib.crc32(start.tobytes(), checksum)
+        return self._checksum
+
+    def exit(self, location: int, direction: int) -> int:
+        return self.exits[direction * self.location_count + location]
+
+    def gate(self, location: int, direction: int) -> tuple:
+        # (key item id, target location) of a locked door, NO_EXIT where there is none
+        slot = direction * self.location_count + location
+        return self.gate_keys[slot], self.gate_targets[slot]
+
+    def key_target(self, location: int, key: int) -> int:
+        # Where swiping the key item in a location leads: through the first door that
+        # takes it (NO_EXIT if that door leads nowhere, or if no door takes it)
+        count = self.location_count
+        for direction in range(len(self.directions)):
+            slot = direction * count + location
+            if self.gate_keys[slot] == key:
+                return self.gate_targets[slot]
+        return NO_EXIT
+
+    def location_exits(self, location: int) -> list:
+        # [(direction id, target location)] of the open exits of a location
+        count = self.location_count
+        exits = self.exits
+        return [(direction, exits[direction * count + location]) for direction in range(len(self.directions))
+                if exits[direction * count + location] != NO_EXIT]
+
+def compile_world(world: dict, items: dict, start_location_name: str, rules: list = ()) -> CompiledWorld:
+    """
+    Builds the integer-indexed form of a {name: Location} world, a {name: Item}
+    item table and the game rules (rules.Rule). Raises WorldError if an exit, a key,
+    the start location or something a rule refers to is unknown.
+    """
+    locations = list(world.values())
+    location_ids = {location.name: number for number, location in enumerate(locations)}
+    item_list = list(items.values())
+    item_ids = {item.name: number for number, item in enumerate(item_list)}
+
+    directions = list(DIRECTIONS)
+    for location in locations:
+        for table in (location.exits, location.required_key or {}, location.exits_with_key or {}):
+            for direction in table:
+                if direction not in directions:
+                    directions.append(direction)
+    direction_ids = {name: number for number, name in enumerate(directions)}
+
+    errors = []
+    if start_location_name not in location_ids:
+        errors.append(f"start location '{start_location_name}' does not exist")
+
+    count = len(locations)
+    size = len(directions) * count
+    exits = array("i", [NO_EXIT]) * size
+    gate_keys = array("i", [NO_EXIT]) * size
+    gate_targets = array("i", [NO_EXIT]) * size
+
+    for number, location in enumerate(locations):
+        for direction, target in location.exits.items():
+            if target not in location_ids:
+                errors.append(f"'{location.name}' exit {direction} leads to unknown location '{target}'")
+                continue
+            exits[direction_ids[direction] * count + number] = location_ids[target]
+
+        for direction, key_name in (location.required_key or {}).items():
+            if key_name not in item_ids:
+                errors.append(f"'{location.name}' door {direction} needs unknown item '{key_name}'")
+                continue
+            gate_keys[direction_ids[direction] * count + number] = item_ids[key_name]
+
+        for direction, target in (location.exits_with_key or {}).items():
+            if target not in location_ids:
+                errors.append(f"'{location.name}' locked exit {direction} leads to unknown location '{target}'")
+                continue
+            gate_targets[direction_ids[direction] * count + number] = location_ids[target]
+
+        for item in location.items:
+            if items.get(item.name) is not item:
+                errors.append(f"'{location.name}' holds item '{item.name}' that is not in the item table")
+
+    rule_engine = compile_rules(rules, location_ids, items, errors)
+
+    if errors:
+        raise WorldError("Invalid world: " + "; ".join(errors))
+
+    return CompiledWorld(locations, [location.name for location in locations], item_list, tuple(directions),
+                         exits, gate_keys, gate_targets, location_ids[start_location_name],
+                         [tuple(location.items) for location in locations], [location.npc for location in locations],
+                         [location.special_action for location in locations], rule_engine)
@@ -0,0 +1,97 @@
+# worldcache.py
+
+import marshal
+import os
+import zlib
+from array import array
+
+from classes import Item, Location
+from rules import Rule, compile_rules
+from world import CompiledWorld, WorldError
+
+# The built-in world, compiled once and kept in a marshal file, so a process
+# that only plays one command does not have to import data.py and compile the
+# world again. The file name holds the cache format version and the CRC32 of
+# data.py: when data.py changes, the cache is rebuilt on the next start.
+# marshal is built into the interpreter, so reading the cache imports nothing.
+VERSION = 1
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data.py")
+
+def default_cache_directory() -> str:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "project-omega")
+
+def cache_path(directory: str) -> str:
+    with open(DATA_PATH, "rb") as source:
+        checksum = zlib.crc32(source.read())
+    return os.path.join(directory, f"world-{VERSION}-{checksum:08x}.marshal")
+
+def dump_world(world: CompiledWorld, rules: list) -> bytes:
+    """Plain-data form of a compiled world and its rules (rules.Rule)."""
+    item_ids = world.item_ids
+    return marshal.dumps((
+        VERSION,
+        world.directions,
+        [(item.name, item.description, item.usage, item.points) for item in world.items],
+        [(location.name, location.description, location.exits, [item_ids[item] for item in location.items],
+          location.npc, location.required_key, location.exits_with_key, location.special_action)
+         for location in world.locations],
+        world.exits.tobytes(), world.gate_keys.tobytes(), world.gate_targets.tobytes(),
+        world.start_location,
+        [(rule.events, rule.location, [tuple(condition) for condition in rule.conditions],
+          [tuple(action) for action in rule.actions]) for rule in rules],
+    ))
+
+def _array(data: bytes) -> array:
+    values = array("i")
+    values.frombytes(data)
+    return values
+
+def undump_world(data: bytes) -> CompiledWorld:
+    (version, directions, item_rows, location_rows, exits, gate_keys, gate_targets,
+     start_location, rule_rows) = marshal.loads(data)
+    if version != VERSION:
+        raise WorldError(f"Unsupported world cache version {version}.")
+
+    items = [Item(*row) for row in item_rows]
+    locations = [Location(name, description, exits_, [items[number] for number in item_numbers], npc,
+                          required_key, exits_with_key, special_action)
+                 for (name, description, exits_, item_numbers, npc, required_key, exits_with_key, special_action)
+                 in location_rows]
+    world = CompiledWorld(locations, [location.name for location in locations], items, directions,
+                          _array(exits), _array(gate_keys), _array(gate_targets), start_location,
+                          [tuple(location.items) for location in locations], [location.npc for location in locations],
+                          [location.special_action for location in locations])
+    errors = []
+    world.rules = compile_rules([Rule(*row) for row in rule_rows], world.location_ids, world.items_by_name, errors)
+    if errors:
+        raise WorldError("Invalid world cache: " + "; ".join(errors))
+    return world
+
+def cached_world(directory: str = None) -> CompiledWorld:
+    """
+    Returns the built-in world from the cache in directory, and builds the cache
+    from data.py first if it is missing or out of date. Without a usable cache
+    directory the world comes from data.py directly.
+    """
+    directory = directory or default_cache_directory()
+    path = cache_path(directory)
+    try:
+        with open(path, "rb") as cache:
+            return undump_world(cache.read())
+    except (OSError, ValueError, EOFError, TypeError):
+        pass # Missing, out of date or damaged: rebuilt below
+
+    from data import WORLD, GAME_RULES
+    try:
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.startswith("world-") and name.endswith(".marshal"):
+                os.remove(os.path.join(directory, name))
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as cache:
+            cache.write(dump_world(WORLD, GAME_RULES))
+        os.replace(temporary, path)
+    except OSError:
+        pass # Read-only or no home directory: play without the cache
+    return WORLD
@@ -0,0 +1,203 @@
+# worldfile.py
+
+import argparse
+import json
+import sqlite3
+import sys
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+
+from classes import Item, Location
+from rules import Rule, compile_rules
+from world import CompiledWorld, WorldError, NO_EXIT
+
+# A world file is an SQLite database:
+#   meta            key/value: version, directions (JSON list), start_location (id)
+#   items           id, name, description, usage, points
+#   locations       id, name, description, npc, special_action, and the exits,
+#                   required_key and exits_with_key of the Location (JSON, in
+#                   the order they are shown)
+#   location_items  location, position, item: the items lying in a location at the start
+#   adjacency       name ('exits', 'gate_keys', 'gate_targets'), data: the int32
+#                   arrays of CompiledWorld, little-endian, ready to load as they are
+#   rules           id, events, location, conditions, actions (JSON, see rules.py)
+# Loading reads the arrays and the location names only. Location objects, with
+# their descriptions, are created when a player first sees the location.
+VERSION = 1
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, description TEXT NOT NULL,
+                    usage TEXT, points INTEGER NOT NULL);
+CREATE TABLE locations (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE, description TEXT NOT NULL,
+                        npc TEXT, special_action TEXT, exits TEXT NOT NULL, required_key TEXT,
+                        exits_with_key TEXT);
+CREATE TABLE location_items (location INTEGER NOT NULL, position INTEGER NOT NULL, item INTEGER NOT NULL,
+                             PRIMARY KEY (location, position));
+CREATE TABLE adjacency (name TEXT PRIMARY KEY, data BLOB NOT NULL);
+CREATE TABLE rules (id INTEGER PRIMARY KEY, events TEXT NOT NULL, location TEXT,
+                    conditions TEXT NOT NULL, actions TEXT NOT NULL);
+"""
+
+def _to_bytes(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array("i", values)
+        values.byteswap()
+    return values.tobytes()
+
+def _from_bytes(data: bytes) -> array:
+    values = array("i")
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+def _json_or_null(value):
+    return json.dumps(value) if value else None
+
+def write_world(path: str, world: CompiledWorld, rules: list):
+    """Writes a compiled world and its rules (rules.Rule) to a new world file."""
+    connection = sqlite3.connect(path)
+    try:
+        connection.executescript(SCHEMA)
+        connection.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("version", str(VERSION)),
+            ("directions", json.dumps(list(world.directions))),
+            ("start_location", str(world.start_location)),
+        ])
+        connection.executemany("INSERT INTO items VALUES (?, ?, ?, ?, ?)",
+                               ((number, item.name, item.description, item.usage, item.points)
+                                for number, item in enumerate(world.items)))
+        connection.executemany("INSERT INTO locations VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                               ((number, location.name, location.description, location.npc,
+                                 location.special_action, json.dumps(location.exits),
+                                 _json_or_null(location.required_key), _json_or_null(location.exits_with_key))
+                                for number, location in enumerate(world.locations)))
+        connection.executemany("INSERT INTO location_items VALUES (?, ?, ?)",
+                               ((location, position, world.item_ids[item])
+                                for location, items in enumerate(world.start_items)
+                                for position, item in enumerate(items)))
+        connection.executemany("INSERT INTO adjacency VALUES (?, ?)", [
+            ("exits", _to_bytes(world.exits)),
+            ("gate_keys", _to_bytes(world.gate_keys)),
+            ("gate_targets", _to_bytes(world.gate_targets)),
+        ])
+        connection.executemany("INSERT INTO rules (events, location, conditions, actions) VALUES (?, ?, ?, ?)",
+                               ((json.dumps(rule.events), rule.location, json.dumps(list(rule.conditions)),
+                                 json.dumps(list(rule.actions))) for rule in rules))
+        connection.commit()
+    finally:
+        connection.close()
+
+class LazyLocations:
+    # The Location objects of a world file by id. A location is read from the
+    # file the first time it is asked for; at most cache_size of them stay in
+    # memory, the least recently used are dropped (and read again if needed).
+    def __init__(self, connection: sqlite3.Connection, cache_size: int = 4096):
+        self.connection = connection
+        self.cache_size = cache_size
+        self.cache = OrderedDict() # {location id: Location}
+        self.world = None # Set by load_world, for the start items
+        self.loads = 0
+
+    def __len__(self) -> int:
+        return self.world.location_count
+
+    def __getitem__(self, location_id: int) -> Location:
+        cache = self.cache
+        location = cache.get(location_id)
+        if location is not None:
+            cache.move_to_end(location_id)
+            return location
+
+        location = self._load(location_id)
+        cache[location_id] = location
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return location
+
+    def _load(self, location_id: int) -> Location:
+        world = self.world
+        if not 0 <= location_id < world.location_count:
+            raise IndexError(f"no location {location_id}")
+        self.loads += 1
+        name, description, npc, special_action, exits, required_key, exits_with_key = self.connection.execute(
+            "SELECT name, description, npc, special_action, exits, required_key, exits_with_key "
+            "FROM locations WHERE id = ?", (location_id,)).fetchone()
+        return Location(name, description, json.loads(exits), list(world.start_items[location_id]), npc,
+                        json.loads(required_key) if required_key else None,
+                        json.loads(exits_with_key) if exits_with_key else None, special_action)
+
+def load_world(path: str, cache_size: int = 4096) -> CompiledWorld:
+    """Opens a world file. Raises WorldError if it is not a valid world file."""
+    try:
+        connection = sqlite3.connect(Path(path).absolute().as_uri() + "?mode=ro", uri=True, check_same_thread=False)
+        meta = dict(connection.execute("SELECT key, value FROM meta"))
+    except sqlite3.Error as error:
+        raise WorldError(f"{path}: not a world file ({error})") from None
+    if meta.get("version") != str(VERSION):
+        raise WorldError(f"{path}: unsupported world file version {meta.get('version')}")
+
+    try:
+        directions = tuple(json.loads(meta["directions"]))
+
+        items = [Item(name, description, usage, points) for name, description, usage, points
+                 in connection.execute("SELECT name, description, usage, points FROM items ORDER BY id")]
+        location_names = [name for name, in connection.execute("SELECT name FROM locations ORDER BY id")]
+        count = len(location_names)
+
+        npcs = [None] * count
+        special_actions = [None] * count
+        for location, npc, special_action in connection.execute(
+                "SELECT id, npc, special_action FROM locations WHERE npc IS NOT NULL OR special_action IS NOT NULL"):
+            npcs[location] = npc
+            special_actions[location] = special_action
+
+        start_items = [()] * count
+        for location, item in connection.execute(
+                "SELECT location, item FROM location_items ORDER BY location, position"):
+            start_items[location] += (items[item],)
+
+        adjacency = {name: _from_bytes(data) for name, data in connection.execute("SELECT name, data FROM adjacency")}
+        rules = [Rule(json.loads(events), location, [tuple(condition) for condition in json.loads(conditions)],
+                      [tuple(action) for action in json.loads(actions)])
+                 for events, location, conditions, actions
+                 in connection.execute("SELECT events, location, conditions, actions FROM rules ORDER BY id")]
+        start_location = int(meta["start_location"])
+    except (sqlite3.Error, KeyError, ValueError, IndexError) as error:
+        raise WorldError(f"{path}: not a valid world file ({error})") from None
+
+    size = len(directions) * count
+    for name in ("exits", "gate_keys", "gate_targets"):
+        values = adjacency.get(name)
+        if values is None or len(values) != size:
+            raise WorldError(f"{path}: the {name} array does not match {count} locations")
+        if size and not (NO_EXIT <= min(values) and max(values) < (len(items) if name == "gate_keys" else count)):
+            raise WorldError(f"{path}: the {name} array refers to unknown ids")
+    if not 0 <= start_location < count:
+        raise WorldError(f"{path}: unknown start location {start_location}")
+
+    locations = LazyLocations(connection, cache_size)
+    world = CompiledWorld(locations, location_names, items, directions, adjacency["exits"],
+                          adjacency["gate_keys"], adjacency["gate_targets"], start_location,
+                          start_items, npcs, special_actions)
+    locations.world = world
+
+    errors = []
+    world.rules = compile_rules(rules, world.location_ids, world.items_by_name, errors)
+    if errors:
+        raise WorldError(f"{path}: invalid rules: " + "; ".join(errors))
+    return world
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the built-in game world to a world file.")
+    parser.add_argument("path")
+    args = parser.parse_args()
+
+    from data import WORLD, GAME_RULES
+    write_world(args.path, WORLD, GAME_RULES)
+    print(f"Wrote {WORLD.location_count} locations and {len(WORLD.items)} items to {args.path}")
+
+if __name__ == "__main__":
+    main()
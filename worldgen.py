@@ -0,0 +1,116 @@
+# worldgen.py
+# Procedural facility maps of any size, for testing the game on big worlds.
+
+import argparse
+import math
+import os
+import random
+import time
+
+from classes import Item, Location
+from data import GAME_RULES, gas_hazard_rule
+from world import compile_world
+from worldfile import write_world
+
+ROOM_KINDS = ("Corridor", "Laboratory", "Storage", "Office", "Archive", "Workshop", "Cold Room",
+              "Control Room", "Washroom", "Lounge", "Pump Room", "Server Closet")
+ROOM_MOODS = ("Dim emergency lights flicker.", "The air smells of disinfectant.", "Papers are scattered everywhere.",
+              "A ventilation fan hums somewhere.", "Water drips from a broken pipe.", "Everything is covered in dust.",
+              "Alarm lights blink red.", "It is eerily quiet.")
+FILLER_ITEMS = ("Lab Notebook", "Broken Beaker", "Access Log", "Fuse", "Coffee Mug", "Toolbox", "Sample Vial")
+
+# Rooms with the same names as in the built-in game, so its rules apply to them
+SPECIAL_RULE_ROOMS = ("Server Room", "C-2 Laboratory", "Emergency Exit")
+
+def generate_world(rooms: int, seed: int = 0, gas_share: float = 0.05, extra_links: float = 0.3) -> tuple:
+    """
+    Returns ({name: Location}, {name: Item}, start location name, rules) (the
+    arguments of compile_world) of a random facility with the given number of
+    rooms, laid out on a grid. Every room is reachable from the start; the
+    Emergency Exit is behind a door that needs the Red Key Card, which the guard
+    in the C-2 Laboratory hands out.
+    """
+    if rooms < 8:
+        raise ValueError("A generated world needs at least 8 rooms.")
+    rng = random.Random(seed)
+    grid = rooms - 1 # Rooms on the grid; the last room is the Emergency Exit
+    width = max(2, math.isqrt(grid))
+
+    names = ["Reception Area"] + [f"{rng.choice(ROOM_KINDS)} {number}" for number in range(1, grid)]
+    specials = rng.sample(range(1, grid - 1), 5)
+    names[specials[0]] = "Server Room"
+    names[specials[1]] = "C-2 Laboratory"
+    names.append("Emergency Exit")
+
+    # Every row is linked to the row above at one column at least, and at random ones
+    rows = (grid + width - 1) // width
+    first_links = [rng.randrange(min(width, grid - row * width)) for row in range(rows)]
+
+    exits = [{} for _ in range(rooms)]
+    for number in range(grid):
+        row, column = divmod(number, width)
+        if column + 1 < width and number + 1 < grid:
+            exits[number]["east"] = names[number + 1]
+            exits[number + 1]["west"] = names[number]
+        if row:
+            if column == first_links[row] or rng.random() < extra_links:
+                exits[number]["north"] = names[number - width]
+                exits[number - width]["south"] = names[number]
+    exits[grid] = {"west": names[grid - 1]}
+
+    items = {}
+    placed = {} # {room: [items lying there]}
+
+    def add_item(item: Item, room: int):
+        items[item.name] = item
+        placed.setdefault(room, []).append(item)
+
+    items["Red Key Card"] = Item("Red Key Card", "Opens the Emergency Exit door.", usage="key_red", points=5)
+    add_item(Item("Flash Drive with Code", "Contains data to reactivate the server.", usage="upload", points=10),
+             specials[2])
+    add_item(Item("Antidote", "Salvation from the gas. Essential for winning.", usage="antidote", points=20),
+             specials[3])
+    add_item(Item("Hazmat Suit", "Protects against biohazard.", usage="wear", points=10), specials[4])
+    for number in range(min(grid // 50, 2000)):
+        name = f"{FILLER_ITEMS[number % len(FILLER_ITEMS)]} {number + 1}"
+        add_item(Item(name, "Nothing special.", points=1), rng.randrange(1, grid))
+
+    gas_rooms = set(rng.sample(range(1, grid), int((grid - 1) * gas_share)))
+    gas_rooms.difference_update(specials[:2])
+
+    special_actions = {number: "gas_hazard" for number in gas_rooms}
+    special_actions[specials[0]] = "server_terminal"
+
+    world = {}
+    for number, name in enumerate(names):
+        description = f"{rng.choice(ROOM_MOODS)} Sector {number // width}-{number % width}."
+        at_exit_door = number == grid - 1 # The last grid room has the door to the Emergency Exit
+        world[name] = Location(name, description, exits[number], placed.get(number),
+                               npc="Injured Guard" if number == specials[1] else None,
+                               required_key={"east": "Red Key Card"} if at_exit_door else None,
+                               exits_with_key={"east": "Emergency Exit"} if at_exit_door else None,
+                               special_action=special_actions.get(number))
+
+    rules = [gas_hazard_rule(names[number]) for number in sorted(gas_rooms)]
+    # There is no Wire here, so the rule of using it at the terminal is left out
+    rules += [rule for rule in GAME_RULES if rule.location in SPECIAL_RULE_ROOMS and "use" not in rule.events]
+    return world, items, "Reception Area", rules
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a random facility and write it to a world file.")
+    parser.add_argument("path")
+    parser.add_argument("--rooms", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    world, items, start, rules = generate_world(args.rooms, args.seed)
+    compiled = compile_world(world, items, start, rules)
+    if os.path.exists(args.path):
+        os.remove(args.path)
+    write_world(args.path, compiled, rules)
+    print(f"Wrote {compiled.location_count} rooms, {len(items)} items and {len(rules)} rules to {args.path} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()